@@ -0,0 +1,93 @@
+import re
+import unicodedata
+from functools import lru_cache
+from .config import BM25_STOPWORDS, BM25_STEMMER
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Runs of letters, digits and underscores in any script; everything else separates tokens.
+TOKEN_PATTERN = re.compile(r"\w+")
+
+ENGLISH_STOPWORDS = frozenset(
+    """
+    a about above after again against all am an and any are as at be because been
+    before being below between both but by can could did do does doing down during
+    each few for from further had has have having he her here hers herself him
+    himself his how i if in into is it its itself just me more most my myself no nor
+    not now of off on once only or other our ours ourselves out over own same she
+    should so some such than that the their theirs them themselves then there these
+    they this those through to too under until up very was we were what when where
+    which while who whom why will with would you your yours yourself yourselves
+    s t d ll m re ve
+    """.split()
+)
+
+STOPWORD_LISTS = {"none": frozenset(), "english": ENGLISH_STOPWORDS}
+
+
+@lru_cache(maxsize=65536)
+def light_stem(token):
+    """
+    Harman's "S" stemmer: conflates English plurals (policies -> policy,
+    licenses -> license, documents -> document) and nothing else, so it rarely
+    merges unrelated words. Tokens are short and repeat a lot, hence the cache.
+    """
+    if len(token) <= 3 or not token.endswith("s"):
+        return token
+    if token.endswith("ies") and not token.endswith(("eies", "aies")):
+        return token[:-3] + "y"
+    if token.endswith("es") and not token.endswith(("aes", "ees", "oes")):
+        return token[:-1]
+    if not token.endswith(("us", "ss")):
+        return token[:-1]
+    return token
+
+
+STEMMERS = {"none": None, "light": light_stem}
+
+
+class Analyzer:
+    """
+    Turns text into BM25 terms: Unicode NFKC normalization, regex word splitting,
+    case folding, then optional stopword removal and stemming. The same analyzer
+    must be used for chunks and queries, so `signature` is persisted with stored
+    term counts to detect counts produced by different settings.
+    """
+
+    def __init__(self, stopwords=BM25_STOPWORDS, stemmer=BM25_STEMMER):
+        if stopwords not in STOPWORD_LISTS:
+            logger.warning(f"Unknown BM25 stopword list '{stopwords}'; using 'none'.")
+            stopwords = "none"
+        if stemmer not in STEMMERS:
+            logger.warning(f"Unknown BM25 stemmer '{stemmer}'; using 'none'.")
+            stemmer = "none"
+        self.stopwords = STOPWORD_LISTS[stopwords]
+        self.stem = STEMMERS[stemmer]
+        self.signature = f"w+|nfkc|casefold|stopwords={stopwords}|stemmer={stemmer}"
+
+    def analyze(self, text, surface_forms=None):
+        """
+        Returns the list of terms for `text`, in order. Given a `surface_forms`
+        dict, also counts in it the words that stemming changed, as {term:
+        {word: count}}, so a term can be shown as the word it came from.
+        """
+        text = unicodedata.normalize("NFKC", text).casefold()
+        tokens = [token for token in TOKEN_PATTERN.findall(text) if token not in self.stopwords]
+        if self.stem is None:
+            return tokens
+        terms = [self.stem(token) for token in tokens]
+        if surface_forms is not None:
+            for token, term in zip(tokens, terms):
+                if token != term:
+                    words = surface_forms.setdefault(term, {})
+                    words[token] = words.get(token, 0) + 1
+        return terms
+
+
+DEFAULT_ANALYZER = Analyzer()
+
+
+def analyze(text):
+    """Analyzes `text` with the analyzer configured for the app."""
+    return DEFAULT_ANALYZER.analyze(text)
@@ -0,0 +1,139 @@
+import hashlib
+import threading
+import numpy as np
+from .cache import LRUCache
+from .config import (
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    OLLAMA_LLM_NAME,
+)
+from .embedding_cache import text_hash
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Differently phrased questions remembered per (corpus, context, history); the oldest
+# is forgotten beyond this
+MAX_QUESTIONS_PER_CONTEXT = 8
+
+
+def corpus_version(file_hashes):
+    """
+    Identifies a set of documents by content: SHA-256 of their distinct file
+    hashes, sorted, so sessions that loaded the same files share a version.
+    None for no files.
+    """
+    if not file_hashes:
+        return None
+    return hashlib.sha256("\n".join(sorted(set(file_hashes))).encode("utf-8")).hexdigest()
+
+
+def context_chunk_ids(documents):
+    """Content ids (SHA-256 of the text) of the chunks sent to the LLM, in prompt order."""
+    return tuple(text_hash(doc.page_content) for doc in documents)
+
+
+class SemanticAnswerCache:
+    """
+    Cache of generated answers for near-duplicate questions. Answers are grouped
+    by (LLM name, corpus version, context chunk ids, chat history); within a group,
+    a question is answered from the cache if its embedding has at least
+    `similarity_threshold` cosine similarity to a cached question's. Requiring the
+    exact same context and history means a cached answer is one the LLM was given
+    the same prompt material for; only the wording of the question differs.
+
+    Groups are evicted least recently used once `max_entries` is exceeded, and
+    invalidate() drops every answer about a corpus version (called when no session
+    uses the corpus any more, see CorpusRegistry).
+    """
+
+    def __init__(
+        self,
+        max_entries=ANSWER_CACHE_SIZE,
+        similarity_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        model_name=OLLAMA_LLM_NAME,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self._groups = LRUCache(max_entries)
+        self._lock = threading.Lock()  # Serializes updates of a group's question list
+
+    @property
+    def enabled(self):
+        return self._groups.max_entries > 0
+
+    def _key(self, version, context_ids, conversation_history):
+        return (self.model_name, version, tuple(context_ids), text_hash(conversation_history or ""))
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, version, context_ids, query_embedding, conversation_history=""):
+        """
+        Returns the cached answer to the most similar question asked about the same
+        corpus version, context and history, or None if none is similar enough.
+        """
+        if not self.enabled or version is None:
+            return None
+        questions = self._groups.get(self._key(version, context_ids, conversation_history))
+        answer, similarity = None, None
+        if questions:
+            similarities = np.stack([vector for vector, _ in questions]) @ self._unit(query_embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                answer, similarity = questions[best][1], float(similarities[best])
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if answer is not None:
+            logger.info(f"Answer served from cache (question similarity {similarity:.3f}).")
+        return answer
+
+    def store(self, version, context_ids, query_embedding, answer, conversation_history=""):
+        """Caches `answer` to the question with embedding `query_embedding`."""
+        if not self.enabled or version is None or not answer or not answer.strip():
+            return
+        key = self._key(version, context_ids, conversation_history)
+        with self._lock:
+            questions = self._groups.get(key) or ()
+            questions = questions[-(MAX_QUESTIONS_PER_CONTEXT - 1) :] + (
+                (self._unit(query_embedding), answer),
+            )
+            self._groups.put(key, questions)
+        logger.debug(f"Cached answer for corpus version {version[:12]}.")
+
+    def invalidate(self, version):
+        """Drops every cached answer about corpus `version`; returns how many groups were dropped."""
+        if version is None:
+            return 0
+        removed = self._groups.discard_if(lambda key: key[1] == version)
+        if removed:
+            logger.info(f"Invalidated {removed} cached answer group(s) for corpus version {version[:12]}.")
+        return removed
+
+    def clear(self):
+        self._groups.clear()
+
+    def stats(self):
+        """Lookup counters since creation plus the current number of answer groups."""
+        with self._lock:
+            total = self.hits + self.misses
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": len(self._groups),
+        }
+
+
+# Shared by all sessions, like the models, so a question answered in one session is
+# answered from memory in another that loaded the same documents.
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe, bounded in-process cache. The least recently used entry is
+    evicted once `max_entries` is exceeded, and entries older than `ttl_seconds`
+    (if set) are treated as missing. Keeps hit/miss/eviction counters so callers
+    can report how much work the cache saves.
+    """
+
+    def __init__(self, max_entries, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, stored_at), oldest first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return _MISSING
+        value, stored_at = entry
+        if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get(self, key, default=None):
+        """Returns the cached value for `key` (refreshing its recency), or `default`."""
+        with self._lock:
+            value = self._get_locked(key)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys):
+        """Returns {key: value} for the keys that are cached; each key counts as a hit or miss."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._get_locked(key)
+                if value is not _MISSING:
+                    found[key] = value
+        return found
+
+    def put(self, key, value):
+        """Stores `value` under `key`, evicting the least recently used entries if full."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard_if(self, predicate):
+        """Removes the entries whose key satisfies `predicate`; returns how many were removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters since creation plus the current number of entries."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
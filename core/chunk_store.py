@@ -0,0 +1,128 @@
+import sys
+import numpy as np
+from langchain_core.documents import Document as LangchainDocument
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class TextSpan:
+    """
+    A page or chunk of a ChunkStore. Reads like a LangChain Document
+    (page_content, metadata), but its text is sliced from the store's buffer on
+    each access instead of being kept, so a chunk costs a few dozen bytes until it
+    is actually read, e.g. by the re-ranker or for the LLM's context.
+    """
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def page_content(self):
+        return self.store.text_of(self.index)
+
+    @property
+    def metadata(self):
+        return self.store.metadata_of(self.index)
+
+    def to_document(self):
+        return LangchainDocument(page_content=self.page_content, metadata=self.metadata)
+
+    def __repr__(self):
+        return f"TextSpan(index={self.index}, page_content={self.page_content[:40]!r})"
+
+
+class ChunkStore:
+    """
+    The text of one file, held once in a single buffer, with its pages and chunks
+    as (page, start, end) spans of it (`pages` and `chunks`, lists of TextSpan).
+    A chunk's metadata is its page's plus its "start_index" in the page, as the
+    text splitter sets it. A chunk that isn't an exact span of a page with the
+    page's metadata keeps its own text and metadata, so nothing is lost.
+    """
+
+    def __init__(self, raw_documents, chunks):
+        page_texts = [doc.page_content for doc in raw_documents]
+        self.text = "".join(page_texts)
+        self._page_metadata = [doc.metadata for doc in raw_documents]
+        page_starts = np.zeros(len(page_texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in page_texts], out=page_starts[1:])
+        self._page_starts = page_starts
+
+        count = len(page_texts) + len(chunks)
+        self._pages = np.empty(count, dtype=np.int32)  # Page of each span
+        self._starts = np.empty(count, dtype=np.int64)  # Offsets into self.text
+        self._ends = np.empty(count, dtype=np.int64)
+        self._pages[: len(page_texts)] = np.arange(len(page_texts))
+        self._starts[: len(page_texts)] = page_starts[:-1]
+        self._ends[: len(page_texts)] = page_starts[1:]
+        self._own = {}  # span index -> (text, metadata) of chunks that aren't spans of a page
+
+        page = 0
+        for index, chunk in enumerate(chunks, start=len(page_texts)):
+            text, metadata = chunk.page_content, chunk.metadata
+            start = metadata.get("start_index")
+            for candidate in range(page, len(page_texts)) if isinstance(start, int) else ():
+                if (
+                    page_texts[candidate][start : start + len(text)] == text
+                    and metadata == {**self._page_metadata[candidate], "start_index": start}
+                ):
+                    page = candidate  # Chunks come in page order; later ones start here
+                    self._pages[index] = candidate
+                    self._starts[index] = page_starts[candidate] + start
+                    self._ends[index] = page_starts[candidate] + start + len(text)
+                    break
+            else:
+                self._pages[index] = -1
+                self._starts[index] = self._ends[index] = -1
+                self._own[index] = (text, dict(metadata))
+        if self._own:
+            logger.debug(f"{len(self._own)} of {len(chunks)} chunks are not spans of their page; kept as text.")
+
+        self.pages = [TextSpan(self, index) for index in range(len(page_texts))]
+        self.chunks = [TextSpan(self, index) for index in range(len(page_texts), count)]
+
+    def text_of(self, index):
+        if index in self._own:
+            return self._own[index][0]
+        return self.text[self._starts[index] : self._ends[index]]
+
+    def metadata_of(self, index):
+        if index in self._own:
+            return dict(self._own[index][1])
+        page = int(self._pages[index])
+        metadata = dict(self._page_metadata[page])
+        if index >= len(self.pages):
+            metadata["start_index"] = int(self._starts[index] - self._page_starts[page])
+        return metadata
+
+    def memory_bytes(self):
+        """Approximate bytes held: the text buffer, span arrays, spans and page metadata."""
+        return (
+            sys.getsizeof(self.text)
+            + self._page_starts.nbytes
+            + self._pages.nbytes
+            + self._starts.nbytes
+            + self._ends.nbytes
+            + sum(len(text) for text, _ in self._own.values())
+            + sys.getsizeof(TextSpan(self, 0)) * (len(self.pages) + len(self.chunks))
+            + sum(sys.getsizeof(metadata) for metadata in self._page_metadata)
+        )
+
+
+def text_memory_bytes(documents):
+    """
+    Approximate bytes of text held by `documents`. The buffer of a ChunkStore
+    counts once, however many of its spans are given.
+    """
+    stores = {}
+    total = 0
+    for doc in documents:
+        if isinstance(doc, TextSpan):
+            stores[id(doc.store)] = doc.store
+        else:
+            total += len(doc.page_content)
+    return total + sum(store.memory_bytes() for store in stores.values())
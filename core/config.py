@@ -9,6 +9,59 @@ K_BM25 = 5  # Number of results for BM25 search
 K_RRF_PARAM = 60  # Constant for Reciprocal Rank Fusion (RRF)
 TOP_K_FOR_RERANKER = 10  # Number of docs from hybrid search to pass to reranker
 FINAL_TOP_N_FOR_CONTEXT = 3  # Number of docs reranker should return for LLM context
+# Token budgets of the answer prompt: context documents and chat history. Chunks are
+# packed best-ranked first until CONTEXT_MAX_TOKENS is reached; history keeps the most
+# recent turns that fit in HISTORY_MAX_TOKENS
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "1500"))
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "500"))
+# Hugging Face tokenizer used to count prompt tokens (e.g. the LLM's own,
+# "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B"); empty estimates CHARS_PER_TOKEN
+CONTEXT_TOKENIZER_NAME = os.getenv("CONTEXT_TOKENIZER_NAME", "")
+CHARS_PER_TOKEN = 4  # Rough average for English text
+# Per-retriever time limits; a retriever that misses its limit contributes no results
+SEMANTIC_SEARCH_TIMEOUT_SECONDS = float(
+    os.getenv("SEMANTIC_SEARCH_TIMEOUT_SECONDS", "10")
+)
+BM25_SEARCH_TIMEOUT_SECONDS = float(os.getenv("BM25_SEARCH_TIMEOUT_SECONDS", "5"))
+# Cascade re-ranking: candidates whose RRF score is below this fraction of the
+# FINAL_TOP_N_FOR_CONTEXT-th candidate's are not sent to the re-ranker (0 disables)
+RERANK_CASCADE_SCORE_RATIO = float(os.getenv("RERANK_CASCADE_SCORE_RATIO", "0"))
+# Fraction of pruned queries that also re-rank the pruned candidates to measure recall
+RERANK_CASCADE_AUDIT_RATE = float(os.getenv("RERANK_CASCADE_AUDIT_RATE", "0"))
+# Fraction of tombstoned (deleted) rows at which the vector store is compacted
+VECTOR_STORE_COMPACTION_RATIO = float(
+    os.getenv("VECTOR_STORE_COMPACTION_RATIO", "0.25")
+)
+# Fraction of deleted or not-yet-merged postings at which the BM25 index is compacted
+BM25_COMPACTION_RATIO = float(os.getenv("BM25_COMPACTION_RATIO", "0.25"))
+# BM25 text analysis, applied identically to chunks and queries: "english" or "none" / "light" or "none"
+BM25_STOPWORDS = os.getenv("BM25_STOPWORDS", "english")
+BM25_STEMMER = os.getenv("BM25_STEMMER", "light")
+
+# Embedding requests during indexing: chunks per request, concurrent requests, retries per batch
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_MAX_WORKERS = int(os.getenv("EMBEDDING_MAX_WORKERS", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+EMBEDDING_RETRY_BACKOFF_SECONDS = 1.0  # Doubled after every failed attempt
+# Worker processes used to parse uploaded files in parallel
+INGEST_MAX_WORKERS = int(
+    os.getenv("INGEST_MAX_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+# Map-reduce summarization: characters of document text per LLM prompt (keep well
+# inside the model's context window), concurrent LLM requests, and how many
+# per-file summaries are kept in memory
+SUMMARY_CHUNK_GROUP_CHARS = int(os.getenv("SUMMARY_CHUNK_GROUP_CHARS", "6000"))
+SUMMARY_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "2"))
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "256"))
+# Keywords are ranked locally from the BM25 term statistics; set KEYWORDS_LLM_REFINEMENT
+# to "true" to have the LLM pick and tidy up the final list from the top candidates
+KEYWORDS_TOP_N = int(os.getenv("KEYWORDS_TOP_N", "10"))
+KEYWORDS_LLM_CANDIDATES = int(os.getenv("KEYWORDS_LLM_CANDIDATES", "30"))
+KEYWORDS_LLM_REFINEMENT = os.getenv("KEYWORDS_LLM_REFINEMENT", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
 
 # Prompt Templates
 PROMPT_TEMPLATE = """
@@ -36,6 +89,17 @@ Document:
 Summary:
 """
 
+# Used to merge partial summaries when the documents don't fit in one prompt
+SUMMARY_REDUCE_PROMPT_TEMPLATE = """
+You are an expert research assistant. The following are summaries of consecutive parts of a larger body of documents.
+Combine them into one concise summary of the whole. Focus on the main points and key takeaways. The summary should be approximately 3-5 sentences long.
+
+Partial summaries:
+{document_text}
+
+Summary:
+"""
+
 KEYWORD_EXTRACTION_PROMPT_TEMPLATE = """
 You are an expert research assistant. Analyze the following document and extract the top 5-10 most relevant keywords or key phrases.
 Present them as a comma-separated list.
@@ -46,6 +110,17 @@ Document:
 Keywords:
 """
 
+KEYWORD_REFINEMENT_PROMPT_TEMPLATE = """
+You are an expert research assistant. The following terms were ranked as the most distinctive words in a collection of documents, most important first.
+Some are word stems. From them, choose the 5-10 most relevant keywords or key phrases for the collection, correcting spelling to natural forms and combining terms into phrases where they clearly belong together.
+Present them as a comma-separated list.
+
+Candidate terms:
+{candidate_keywords}
+
+Keywords:
+"""
+
 # Model Names
 OLLAMA_EMBEDDING_MODEL_NAME = os.getenv(
     "OLLAMA_EMBEDDING_MODEL_NAME", "deepseek-r1:1.5b"
@@ -54,8 +129,50 @@ OLLAMA_LLM_NAME = os.getenv("OLLAMA_LLM_NAME", "deepseek-r1:1.5b")
 RERANKER_MODEL_NAME = os.getenv(
     "RERANKER_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2"
 )
+# "torch" runs the CrossEncoder with PyTorch; "onnx" runs the int8 model exported by
+# scripts/export_reranker_onnx.py, falling back to "torch" if it isn't there
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "torch").lower()
+RERANKER_ONNX_MODEL_DIR = os.getenv("RERANKER_ONNX_MODEL_DIR", "models/reranker-onnx")
+# Re-ranking requests from all sessions are coalesced into shared forward passes
+RERANKER_BATCH_WINDOW_MS = float(os.getenv("RERANKER_BATCH_WINDOW_MS", "5"))
+RERANKER_MAX_BATCH_PAIRS = int(os.getenv("RERANKER_MAX_BATCH_PAIRS", "128"))
 
 # Paths and URLs
 PDF_STORAGE_PATH = os.getenv("PDF_STORAGE_PATH", "document_store/pdfs/")
+# Persisted per-file indexes (embeddings, chunks, BM25 stats), reused across restarts and sessions
+INDEX_STORAGE_PATH = os.getenv("INDEX_STORAGE_PATH", "document_store/indexes/")
+# On-disk cache of chunk embeddings keyed by (model, SHA-256 of chunk text)
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", "document_store/embedding_cache.sqlite3"
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(
+    os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000")
+)  # Least recently used entries are evicted beyond this
+# On-disk cache of parsed documents (page texts and metadata) keyed by file content hash
+# and parser version, so re-uploaded files skip parsing; the least recently used files
+# are evicted beyond PARSE_CACHE_MAX_MB (0 disables the cache)
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", "document_store/parse_cache/")
+PARSE_CACHE_MAX_MB = float(os.getenv("PARSE_CACHE_MAX_MB", "512"))
+# In-memory cache of query embeddings, shared by all sessions
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(
+    os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600")
+)
+# In-memory cache of cross-encoder scores per (query, chunk), shared by all sessions
+RERANKER_SCORE_CACHE_SIZE = int(os.getenv("RERANKER_SCORE_CACHE_SIZE", "50000"))
+# In-memory cache of generated answers, shared by all sessions. An answer is reused when
+# the corpus, context chunks and chat history are the same and the question embedding
+# has at least this cosine similarity to the cached question's (size 0 disables). Off by
+# default: a safe threshold depends on the embedding model, and with a general-purpose
+# LLM as embedder, questions asking different things can score above 0.95
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "0"))
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(
+    os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95")
+)
+# Approximate memory all sessions' documents and chats may use. Beyond it, the documents
+# of sessions idle for SESSION_IDLE_SECONDS are unloaded, oldest first, and reloaded from
+# the persisted indexes on their next run (0 disables)
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", "2048"))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "900"))
 # Fetch Ollama base URL from environment variable, with a default
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
@@ -0,0 +1,192 @@
+import math
+import threading
+from .config import (
+    CONTEXT_MAX_TOKENS,
+    HISTORY_MAX_TOKENS,
+    CONTEXT_TOKENIZER_NAME,
+    CHARS_PER_TOKEN,
+)
+from .summarization import THINK_BLOCK_PATTERN
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+CONTEXT_SEPARATOR = "\n\n"
+
+
+class TokenCounter:
+    """
+    Counts tokens with the Hugging Face tokenizer `tokenizer_name`, or estimates
+    them as one per CHARS_PER_TOKEN characters if no name is given. The tokenizer
+    is loaded on first use; if it can't be loaded, the estimate is used instead.
+    """
+
+    def __init__(self, tokenizer_name=CONTEXT_TOKENIZER_NAME):
+        self.tokenizer_name = tokenizer_name
+        self._tokenizer = None
+        self._loaded = not tokenizer_name
+        self._lock = threading.Lock()
+
+    def _get_tokenizer(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        from transformers import AutoTokenizer
+
+                        self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+                        logger.info(f"Counting prompt tokens with tokenizer '{self.tokenizer_name}'.")
+                    except Exception as e:
+                        logger.warning(
+                            f"Could not load tokenizer '{self.tokenizer_name}'; estimating tokens from characters instead. Details: {e}"
+                        )
+                    self._loaded = True
+        return self._tokenizer
+
+    def count(self, text):
+        if not text:
+            return 0
+        tokenizer = self._get_tokenizer()
+        if tokenizer is None:
+            return math.ceil(len(text) / CHARS_PER_TOKEN)
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    def truncate(self, text, max_tokens):
+        """Returns the longest prefix of `text`, cut at a space where possible, within `max_tokens`."""
+        tokens = self.count(text)
+        while tokens > max_tokens:
+            cut = int(len(text) * max(max_tokens, 0) / tokens)  # Shrinks on every pass
+            if cut <= 0:
+                return ""
+            space = text.rfind(" ", 0, cut)
+            text = text[: space if space > cut // 2 else cut].rstrip()
+            tokens = self.count(text)
+        return text
+
+
+# Shared by all sessions so the tokenizer is loaded once
+token_counter = TokenCounter()
+
+
+def _source_key(doc):
+    """Chunks with the same key were split from the same text (a file, or a page of a PDF)."""
+    return (doc.metadata.get("source"), doc.metadata.get("page"))
+
+
+def _span(doc):
+    """(start, end) character offsets of a chunk in its source text, or None if unknown."""
+    start = doc.metadata.get("start_index")
+    if not isinstance(start, int) or start < 0:
+        return None
+    return start, start + len(doc.page_content)
+
+
+def _uncovered(start, end, covered):
+    """The parts of [start, end) outside the `covered` (start, end) intervals."""
+    pieces = []
+    position = start
+    for covered_start, covered_end in sorted(covered):
+        if covered_end <= position:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > position:
+            pieces.append((position, covered_start))
+        position = max(position, covered_end)
+    if position < end:
+        pieces.append((position, end))
+    return pieces
+
+
+def build_context(documents, max_tokens=CONTEXT_MAX_TOKENS, counter=None):
+    """
+    Assembles the document context of the answer prompt from `documents`, which
+    are ordered best first. Text a better-ranked chunk of the same source already
+    contributed (the overlap between neighbouring chunks) is left out, and chunks
+    are added in rank order while they fit in `max_tokens`; a best chunk that is
+    larger than the whole budget is truncated. Pieces that continue each other in
+    their source are merged into one passage, so the model reads them as one text.
+    """
+    counter = counter or token_counter
+    covered = {}  # source key -> (start, end) spans already in the context
+    passages = []  # [rank, source key, start, end, text]
+    used_tokens = 0
+    removed_chars = 0
+    included = 0
+    for rank, doc in enumerate(documents):
+        key = _source_key(doc)
+        span = _span(doc)
+        if span is None:
+            pieces = [(None, None, doc.page_content)]
+        else:
+            pieces = [
+                (start, end, doc.page_content[start - span[0] : end - span[0]])
+                for start, end in _uncovered(*span, covered.get(key, []))
+            ]
+            removed_chars += len(doc.page_content) - sum(end - start for start, end, _ in pieces)
+        pieces = [piece for piece in pieces if piece[2].strip()]
+        if not pieces:
+            continue
+
+        tokens = sum(counter.count(text) for _, _, text in pieces)
+        if used_tokens + tokens > max_tokens:
+            if passages:
+                continue
+            start, _, text = pieces[0]
+            text = counter.truncate(text, max_tokens)
+            if not text:
+                continue
+            pieces = [(start, None if start is None else start + len(text), text)]
+            tokens = counter.count(text)
+            logger.warning(
+                f"Best context chunk exceeds the budget of {max_tokens} tokens; it was truncated."
+            )
+        for start, end, text in pieces:
+            passages.append([rank, key, start, end, text])
+            if start is not None:
+                covered.setdefault(key, []).append((start, end))
+        used_tokens += tokens
+        included += 1
+
+    merged = []
+    located = sorted(
+        (passage for passage in passages if passage[2] is not None),
+        key=lambda passage: (str(passage[1]), passage[2]),
+    )
+    for passage in located:
+        previous = merged[-1] if merged else None
+        if previous and previous[1] == passage[1] and previous[3] == passage[2]:
+            previous[0] = min(previous[0], passage[0])
+            previous[3] = passage[3]
+            previous[4] += passage[4]
+        else:
+            merged.append(passage)
+    merged.extend(passage for passage in passages if passage[2] is None)
+    merged.sort(key=lambda passage: (passage[0], passage[2] or 0))
+
+    logger.info(
+        f"Context: {included} of {len(documents)} chunks in {len(merged)} passage(s), "
+        f"~{used_tokens} of {max_tokens} tokens; {removed_chars} overlapping characters removed."
+    )
+    return CONTEXT_SEPARATOR.join(passage[4] for passage in merged)
+
+
+def select_recent_history(history_lines, max_tokens=HISTORY_MAX_TOKENS, counter=None):
+    """
+    Joins the most recent chat history lines that fit in `max_tokens`, dropping
+    the model's <think> reasoning from past answers first.
+    """
+    counter = counter or token_counter
+    selected = []
+    used_tokens = 0
+    for line in reversed(history_lines):
+        line = THINK_BLOCK_PATTERN.sub("", line)
+        tokens = counter.count(line)
+        if used_tokens + tokens > max_tokens:
+            logger.debug(
+                f"Chat history trimmed to the last {len(selected)} of {len(history_lines)} messages."
+            )
+            break
+        selected.append(line)
+        used_tokens += tokens
+    return "\n".join(reversed(selected))
@@ -0,0 +1,216 @@
+import threading
+import weakref
+from .answer_cache import answer_cache
+from .vector_store import NumpyVectorStore
+from .search_pipeline import IncrementalBM25
+from .chunk_store import text_memory_bytes
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class Corpus:
+    """
+    The searchable indexes of one set of files: a vector store and a BM25 index
+    over their chunks, and each file's documents by content hash. A corpus is
+    shared by every session that loaded the same files (see CorpusRegistry), so
+    it is only changed while a single session holds it.
+    """
+
+    def __init__(self, embedding):
+        self.vector_db = NumpyVectorStore(embedding)
+        self.bm25_index = IncrementalBM25()
+        # file hash -> {"file_hash", "raw_documents", "chunks", "chunk_ids", "surface_forms"}
+        self.files = {}
+        self._memory_bytes = None  # Computed on first use after the files change
+
+    def add_file(self, file_hash, raw_documents, chunks, chunk_ids, bm25_term_freqs, surface_forms=None):
+        """
+        Records a file whose chunks were added to the vector store under
+        `chunk_ids` and adds them to the BM25 index under the same ids, with the
+        words behind its stemmed BM25 terms (`surface_forms`, see
+        Analyzer.analyze). The file is recorded even if the BM25 index rejects it.
+        Returns its record.
+        """
+        record = {
+            "file_hash": file_hash,
+            "raw_documents": raw_documents,
+            "chunks": chunks,
+            "chunk_ids": list(chunk_ids),
+            "surface_forms": surface_forms or {},
+        }
+        self.files[file_hash] = record
+        self._memory_bytes = None
+        if chunk_ids:
+            self.bm25_index.add_documents(chunks, bm25_term_freqs, chunk_ids)
+        return record
+
+    def surface_forms(self):
+        """The words behind stemmed BM25 terms, counted over all files: {term: {word: count}}."""
+        merged = {}
+        for record in self.files.values():
+            for term, words in record["surface_forms"].items():
+                counts = merged.setdefault(term, {})
+                for word, count in words.items():
+                    counts[word] = counts.get(word, 0) + count
+        return merged
+
+    def remove_file(self, file_hash):
+        """Tombstones a file's chunks in both indexes; chunks of other files are left untouched."""
+        record = self.files.pop(file_hash, None)
+        self._memory_bytes = None
+        if record is not None and record["chunk_ids"]:
+            self.vector_db.delete(record["chunk_ids"])
+            self.bm25_index.delete(record["chunk_ids"])
+        return record
+
+    def memory_bytes(self):
+        """
+        Approximate bytes held by the corpus: {"text": the files' text (see
+        chunk_store), "embeddings": the vector matrix, "bm25": the BM25 index}.
+        Chunk objects are shared by both indexes, so their text counts once.
+        Measuring walks every chunk, so the result is kept until add_file() or
+        remove_file() changes the files; the memory manager asks on every run.
+        """
+        if self._memory_bytes is None:
+            text = text_memory_bytes(
+                doc for record in self.files.values() for doc in (*record["raw_documents"], *record["chunks"])
+            )
+            self._memory_bytes = {
+                "text": text,
+                "embeddings": self.vector_db.memory_bytes(),
+                "bm25": self.bm25_index.memory_bytes(),
+            }
+        return dict(self._memory_bytes)
+
+    def copy(self, file_hashes=None):
+        """
+        Returns a new corpus with the given files (all by default), built from
+        this one's stored vectors and BM25 term counts, so nothing is re-embedded
+        or re-analyzed. Documents and file records are shared, not copied, and so
+        are vectors mapped from index segments.
+        """
+        clone = Corpus(self.vector_db.embedding)
+        for file_hash in self.files if file_hashes is None else file_hashes:
+            record = self.files[file_hash]
+            chunk_ids = record["chunk_ids"]
+            if chunk_ids:
+                clone.vector_db.add_embeddings(
+                    record["chunks"], self.vector_db.get_vectors(chunk_ids), ids=chunk_ids
+                )
+                try:
+                    term_freqs = self.bm25_index.term_frequencies(chunk_ids)
+                except KeyError:
+                    logger.warning(f"File {file_hash[:12]} has no BM25 entries; copied for semantic search only.")
+                else:
+                    clone.bm25_index.add_documents(record["chunks"], term_freqs, chunk_ids)
+            clone.files[file_hash] = record
+        return clone
+
+
+class CorpusHandle:
+    """
+    A session's reference to a registered corpus. The reference is released by
+    release(), or when the session's state is garbage collected after the
+    session ends.
+    """
+
+    def __init__(self, registry, version, corpus):
+        self.version = version
+        self.corpus = corpus
+        self._finalizer = weakref.finalize(self, registry._release, version, corpus)
+
+    @property
+    def alive(self):
+        return self._finalizer.alive
+
+    def release(self):
+        self._finalizer()  # Runs at most once
+
+
+class CorpusRegistry:
+    """
+    Process-wide registry of corpora by version (the content hash of their file
+    set, see answer_cache.corpus_version), with the number of sessions using
+    each. A session loading files that another session has already indexed gets
+    a handle on the same corpus instead of building its own copy. A corpus is
+    evicted, and the answers cached about it invalidated, when its last handle is
+    released.
+    """
+
+    def __init__(self):
+        self._entries = {}  # version -> [corpus, number of handles]
+        # Reentrant: a handle's finalizer may run during garbage collection while held
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def acquire(self, version):
+        """Returns a handle on the corpus registered for `version`, or None if there is none."""
+        with self._lock:
+            entry = self._entries.get(version)
+            if entry is None:
+                return None
+            entry[1] += 1
+            return CorpusHandle(self, version, entry[0])
+
+    def register(self, version, corpus):
+        """
+        Registers `corpus` as the corpus of `version` and returns a handle on it.
+        If another session registered the same version first, the handle is on
+        that corpus instead, and `corpus` can be dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(version)
+            if entry is None:
+                entry = self._entries[version] = [corpus, 0]
+                logger.info(
+                    f"Registered corpus {version[:12]} ({len(corpus.files)} file(s), {len(corpus.vector_db)} chunks); {len(self._entries)} corpora in memory."
+                )
+            elif entry[0] is not corpus:
+                logger.info(f"Corpus {version[:12]} was already registered; sharing it.")
+            entry[1] += 1
+            return CorpusHandle(self, version, entry[0])
+
+    def detach(self, handle):
+        """
+        If `handle` is the only reference to its corpus, unregisters the corpus so
+        its holder can change it in place, and returns True. The handle no longer
+        counts as a reference either way if True is returned.
+        """
+        with self._lock:
+            entry = self._entries.get(handle.version)
+            if entry is None or entry[0] is not handle.corpus or entry[1] != 1 or not handle.alive:
+                return False
+            del self._entries[handle.version]
+            handle._finalizer.detach()
+            return True
+
+    def _release(self, version, corpus):
+        with self._lock:
+            entry = self._entries.get(version)
+            if entry is None or entry[0] is not corpus:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self._entries[version]
+            remaining = len(self._entries)
+        logger.info(f"Evicted corpus {version[:12]}: no session uses it; {remaining} corpora in memory.")
+        answer_cache.invalidate(version)
+
+    def stats(self):
+        """Registered corpora, the handles on them, and the chunks they hold."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "corpora": len(entries),
+            "handles": sum(references for _, references in entries),
+            "chunks": sum(len(corpus.vector_db) for corpus, _ in entries),
+        }
+
+
+# Shared by all sessions, like the models
+corpus_registry = CorpusRegistry()
@@ -1,4 +1,8 @@
+import hashlib
+import json
 import os
+import tempfile
+import threading
 import streamlit as st
 from langchain_community.document_loaders import PDFPlumberLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -7,41 +11,102 @@ import docx
 from docx.opc.exceptions import PackageNotFoundError as DocxPackageNotFoundError # Import specific exception
 import pdfplumber
 from .config import PDF_STORAGE_PATH
+from .index_store import HASH_BLOCK_SIZE
 from .logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# {uploaded filename: SHA-256} in the upload directory; uploads are stored as <SHA-256><extension>
+UPLOAD_MANIFEST_FILE = "manifest.json"
+_manifest_lock = threading.Lock()  # Sessions save uploads concurrently
 
-def save_uploaded_file(uploaded_file):
+
+def read_upload_manifest(storage_path=PDF_STORAGE_PATH):
+    """Returns the {uploaded filename: SHA-256} manifest of the upload store ({} if there is none)."""
+    try:
+        with open(os.path.join(storage_path, UPLOAD_MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Upload manifest is unreadable; starting a new one. Details: {e}")
+        return {}
+
+
+def _record_upload(filename, file_hash, storage_path):
+    """Maps `filename` to its latest content in the manifest; written atomically."""
+    with _manifest_lock:
+        manifest = read_upload_manifest(storage_path)
+        if manifest.get(filename) == file_hash:
+            return
+        manifest[filename] = file_hash
+        fd, tmp_path = tempfile.mkstemp(prefix=".manifest-", dir=storage_path)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, os.path.join(storage_path, UPLOAD_MANIFEST_FILE))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def save_uploaded_file(uploaded_file, storage_path=PDF_STORAGE_PATH):
     """
-    Save the uploaded file to disk and return the file path.
+    Saves the uploaded file to disk under its content hash and returns
+    (file path, SHA-256 hex digest), or (None, None) on failure. The upload is
+    streamed in fixed-size blocks while it is hashed; content that is already
+    stored is not stored again, and the same filename with different content
+    never overwrites an earlier file. The manifest maps each filename to the hash
+    of its latest upload.
     """
-    file_path = os.path.join(PDF_STORAGE_PATH, uploaded_file.name)
+    tmp_path = None
     try:
-        with open(file_path, "wb") as file:
-            file.write(uploaded_file.getbuffer())
-        logger.info(f"File '{uploaded_file.name}' saved to '{file_path}'.")
-        return file_path
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(prefix=".upload-", dir=storage_path)
+        with os.fdopen(fd, "wb") as file:
+            uploaded_file.seek(0)
+            for block in iter(lambda: uploaded_file.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+                file.write(block)
+        file_hash = digest.hexdigest()
+        # The extension is kept: it selects the loader
+        extension = os.path.splitext(uploaded_file.name)[1].lower()
+        file_path = os.path.join(storage_path, f"{file_hash}{extension}")
+        if os.path.exists(file_path):
+            logger.info(f"File '{uploaded_file.name}' is already stored as '{file_path}'.")
+        else:
+            os.replace(tmp_path, file_path)
+            tmp_path = None
+            logger.info(f"File '{uploaded_file.name}' saved to '{file_path}'.")
+        _record_upload(uploaded_file.name, file_hash, storage_path)
+        return file_path, file_hash
     except IOError as e:
         user_message = f"Failed to save uploaded file '{uploaded_file.name}'. An I/O error occurred: {e.strerror}."
         logger.error(f"{user_message} Please check permissions and disk space.")
         st.error(user_message)
-        return None
+        return None, None
     except Exception as e:
         user_message = (
             f"An unexpected error occurred while saving '{uploaded_file.name}'."
         )
         logger.exception(f"{user_message} Details: {e}")
         st.error(f"{user_message} Check logs for details.")
-        return None
+        return None, None
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
 
 
-def load_document(file_path):
+def load_document(file_path, file_name=None, file_hash=None):
     """
     Load documents from PDF, DOCX, or TXT files.
+    `file_name` is the name the file was uploaded as, used in messages. Given the
+    file's content hash, it is the "source" of every page: parsed pages are cached
+    and indexed by content, so they never carry the name of one upload.
     """
     file_extension = os.path.splitext(file_path)[1].lower()
-    file_name = os.path.basename(file_path)
+    file_name = file_name or os.path.basename(file_path)
+    source = file_hash or file_name
 
     try:
         if file_extension == ".pdf":
@@ -49,6 +114,9 @@ def load_document(file_path):
                 logger.debug(f"Loading PDF: {file_name}")
                 document_loader = PDFPlumberLoader(file_path)
                 docs = document_loader.load()
+                if file_hash:
+                    for doc in docs:
+                        doc.metadata["source"] = file_hash  # Instead of the stored file's path
                 logger.info(
                     f"Successfully loaded PDF: {file_name}, {len(docs)} pages/documents."
                 )
@@ -79,7 +147,7 @@ def load_document(file_path):
                 logger.info(f"Successfully loaded DOCX: {file_name}")
                 return [
                     LangchainDocument(
-                        page_content=full_text, metadata={"source": file_name}
+                        page_content=full_text, metadata={"source": source}
                     )
                 ]
             except DocxPackageNotFoundError as e: # Use the imported alias
@@ -106,7 +174,7 @@ def load_document(file_path):
                 logger.info(f"Successfully loaded TXT: {file_name}")
                 return [
                     LangchainDocument(
-                        page_content=full_text, metadata={"source": file_name}
+                        page_content=full_text, metadata={"source": source}
                     )
                 ]
             except UnicodeDecodeError as unicode_err:
@@ -176,9 +244,14 @@ def chunk_documents(raw_documents):
         return []
 
 
-def index_documents(document_chunks):
+def index_documents(document_chunks, embeddings=None, embedding_blocks=None):
     """
-    Add document chunks to the in-memory vector store.
+    Add document chunks with their embeddings to the in-memory vector store.
+    Chunks are embedded beforehand, during ingestion (see core/ingestion.py), or
+    restored from a persisted index. `embeddings` is one row per chunk;
+    `embedding_blocks` gives them instead as one matrix per consecutive run of
+    chunks (e.g. per file), added separately so mapped segment matrices aren't copied.
+    Returns the ids assigned to the chunks, or an empty list if nothing was indexed.
     Note: This function modifies st.session_state directly.
     """
     if not document_chunks:
@@ -186,14 +259,29 @@ def index_documents(document_chunks):
         st.warning(
             "No document chunks available to index. This may happen if the document was empty or text extraction failed."
         )  # User feedback fine
-        return
+        return []
     logger.info(f"Indexing {len(document_chunks)} document chunks.")
+    chunk_ids = []
     try:
-        st.session_state.DOCUMENT_VECTOR_DB.add_documents(document_chunks)
+        vector_db = st.session_state.DOCUMENT_VECTOR_DB
+        if embedding_blocks is None:
+            embedding_blocks = [embeddings if embeddings is not None else []]
+        if sum(len(block) for block in embedding_blocks) != len(document_chunks):
+            raise ValueError(
+                f"Got {len(document_chunks)} chunks but {sum(len(block) for block in embedding_blocks)} embeddings."
+            )
+        offset = 0
+        for block in embedding_blocks:
+            chunk_ids += vector_db.add_embeddings(document_chunks[offset : offset + len(block)], block)
+            offset += len(block)
         st.session_state.document_processed = True
         logger.info("Document chunks indexed successfully into vector store.")
+        return chunk_ids
     except Exception as e:
         user_message = "An error occurred while indexing document chunks."
         logger.exception(f"{user_message} Details: {e}")
         st.error(f"{user_message} Check logs for details.")
+        if chunk_ids:
+            vector_db.delete(chunk_ids)  # Blocks added before the failure
         st.session_state.document_processed = False
+        return []
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from .cache import LRUCache
+from .config import (
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+)
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# SQLite caps the number of host parameters per statement; stay well below it.
+SQLITE_BATCH_SIZE = 500
+
+
+def text_hash(text):
+    """SHA-256 hex digest of a chunk's text, the content half of the cache key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_query(text):
+    """
+    Collapses whitespace, so trivial variants of a question share a cache entry.
+    Case is kept: embedding models may tell "US" from "us".
+    """
+    return " ".join(text.split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that caches document vectors on disk in SQLite, keyed by
+    (model name, SHA-256 of the text). Only texts that are not cached are sent to
+    the underlying model, so re-uploading known content costs no Ollama calls.
+    The least recently used entries are evicted once `max_entries` is exceeded.
+
+    Query embeddings are kept in a small in-memory LRU with a TTL instead, keyed
+    like documents by (model name, SHA-256 of the text), of the query with its
+    whitespace collapsed by normalize_query(). They are stored unit-length, as cosine search uses
+    them. The model is shared by all sessions through st.cache_resource, so a
+    question asked again, in any session, skips the Ollama round trip.
+    """
+
+    def __init__(
+        self,
+        underlying,
+        model_name,
+        cache_path=EMBEDDING_CACHE_PATH,
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+        query_cache_size=QUERY_EMBEDDING_CACHE_SIZE,
+        query_cache_ttl_seconds=QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self.query_cache = LRUCache(query_cache_size, ttl_seconds=query_cache_ttl_seconds)
+
+    def _connect(self):
+        """Opens (and if needed creates) the cache database; returns None if unavailable."""
+        try:
+            cache_dir = os.path.dirname(self.cache_path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            conn = sqlite3.connect(self.cache_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+            )
+            conn.commit()
+            logger.info(f"Embedding cache opened at '{self.cache_path}'.")
+            return conn
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(
+                f"Embedding cache unavailable at '{self.cache_path}'; embeddings will not be cached. Details: {e}"
+            )
+            return None
+
+    def _lookup(self, hashes):
+        """Returns {text_hash: vector} for the hashes present in the cache and refreshes their recency."""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(hashes), SQLITE_BATCH_SIZE):
+                batch = hashes[start : start + SQLITE_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *batch],
+                ).fetchall()
+                for hash_value, blob in rows:
+                    found[hash_value] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, self.model_name, hash_value) for hash_value in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, hashed_vectors):
+        """Inserts {text_hash: vector} entries and evicts least recently used rows over the limit."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                [
+                    (self.model_name, hash_value, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for hash_value, vector in hashed_vectors.items()
+                ],
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+                logger.info(f"Embedding cache evicted {overflow} least recently used entries.")
+            self._conn.commit()
+
+    def embed_documents(self, texts):
+        """Embeds texts, serving cached vectors and sending only cache misses to the model."""
+        if self._conn is None:
+            return self.underlying.embed_documents(texts)
+
+        hashes = [text_hash(text) for text in texts]
+        try:
+            cached = self._lookup(list(dict.fromkeys(hashes)))
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache lookup failed; embedding without cache. Details: {e}")
+            return self.underlying.embed_documents(texts)
+
+        # Embed each distinct missing text once, even if it repeats within the batch
+        missing = {}
+        for hash_value, text in zip(hashes, texts):
+            if hash_value not in cached and hash_value not in missing:
+                missing[hash_value] = text
+        miss_count = sum(1 for hash_value in hashes if hash_value not in cached)
+        with self._lock:
+            self.hits += len(texts) - miss_count
+            self.misses += miss_count
+
+        if missing:
+            new_vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            try:
+                self._store(computed)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to write embeddings to cache. Details: {e}")
+            cached.update(computed)
+
+        logger.debug(
+            f"Embedding cache: {len(texts) - miss_count} of {len(texts)} texts served from cache."
+        )
+        return [list(cached[hash_value]) for hash_value in hashes]
+
+    def embed_query(self, text):
+        """
+        Embeds a query as a unit-length vector, serving repeats (up to whitespace)
+        from the in-memory query cache. A miss embeds the query exactly as it is
+        keyed, with its whitespace collapsed.
+        """
+        query = normalize_query(text)
+        key = (self.model_name, text_hash(query))
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = np.asarray(self.underlying.embed_query(query), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector = vector / norm
+            vector = tuple(vector.tolist())
+            self.query_cache.put(key, vector)
+        else:
+            logger.debug("Query embedding served from cache.")
+        return list(vector)
+
+    def stats(self):
+        """
+        Document cache hit/miss counters for this process plus the current number of
+        cached entries; query cache counters are under "query_cache".
+        """
+        entries = 0
+        if self._conn is not None:
+            with self._lock:
+                (entries,) = self._conn.execute(
+                    "SELECT COUNT(*) FROM embeddings WHERE model = ?", (self.model_name,)
+                ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+            "query_cache": self.query_cache.stats(),
+        }
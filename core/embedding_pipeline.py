@@ -0,0 +1,37 @@
+import time
+from .config import (
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RETRY_BACKOFF_SECONDS,
+)
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def embed_batch_with_retry(
+    embedding_model,
+    batch,
+    batch_number=0,
+    max_retries=EMBEDDING_MAX_RETRIES,
+    backoff_seconds=EMBEDDING_RETRY_BACKOFF_SECONDS,
+):
+    """
+    Embeds one batch, retrying with exponential backoff. Ollama occasionally drops
+    or times out requests under load; a retry is far cheaper than failing the upload.
+    """
+    attempt = 0
+    while True:
+        try:
+            return embedding_model.embed_documents(batch)
+        except Exception as e:
+            attempt += 1
+            if attempt > max_retries:
+                logger.error(
+                    f"Embedding batch {batch_number} failed after {max_retries} retries. Details: {e}"
+                )
+                raise
+            delay = backoff_seconds * (2 ** (attempt - 1))
+            logger.warning(
+                f"Embedding batch {batch_number} failed (attempt {attempt}/{max_retries + 1}); retrying in {delay:.1f}s. Details: {e}"
+            )
+            time.sleep(delay)
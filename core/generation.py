@@ -1,25 +1,28 @@
+import time
 import streamlit as st
 from langchain_core.prompts import ChatPromptTemplate
 from .config import (
     PROMPT_TEMPLATE,
     SUMMARIZATION_PROMPT_TEMPLATE,
     KEYWORD_EXTRACTION_PROMPT_TEMPLATE,
+    KEYWORD_REFINEMENT_PROMPT_TEMPLATE,
 )
+from .context_builder import build_context
 from .logger_config import get_logger
 
 logger = get_logger(__name__)
 
 
-def generate_answer(
-    language_model, user_query, context_documents, conversation_history=""
-):
+def _prepare_answer_inputs(user_query, context_documents, conversation_history):
     """
-    Generate an answer based on the user query, context documents, and conversation history.
+    Validates the question and context for answer generation. Returns (prompt
+    inputs, None), or (None, message) when there is nothing to send to the model
+    and `message` should be shown instead of an answer.
     """
     if not user_query or not user_query.strip():
         logger.warning("generate_answer called with empty user_query.")
         # User-facing warning is handled by returning the string, which rag_deep.py will show.
-        return "Your question is empty. Please type a question to get an answer."
+        return None, "Your question is empty. Please type a question to get an answer."
 
     if (
         not context_documents
@@ -27,28 +30,42 @@ def generate_answer(
         or len(context_documents) == 0
     ):
         logger.warning("generate_answer called with no context documents.")
-        return "I couldn't find relevant information in the document to answer your query. Please try rephrasing your question or ensure the document contains the relevant topics."
+        return None, "I couldn't find relevant information in the document to answer your query. Please try rephrasing your question or ensure the document contains the relevant topics."
 
     logger.info(f"Generating answer for query: '{user_query[:50]}...'")
+    # Overlap between chunks removed, best chunks first, within CONTEXT_MAX_TOKENS
+    context_text = build_context(context_documents)
+    if not context_text.strip():
+        logger.warning(
+            "Context text for answer generation is empty after joining docs."
+        )
+        return None, "The relevant sections found in the document appear to be empty. Cannot generate an answer."
+
+    logger.debug(f"Context for prompt: {context_text[:100]}...")
+    return {
+        "user_query": user_query,
+        "document_context": context_text,
+        "conversation_history": conversation_history,
+    }, None
+
+
+def generate_answer(
+    language_model, user_query, context_documents, conversation_history=""
+):
+    """
+    Generate an answer based on the user query, context documents, and conversation history.
+    """
     try:
-        context_text = "\n\n".join([doc.page_content for doc in context_documents])
-        if not context_text.strip():
-            logger.warning(
-                "Context text for answer generation is empty after joining docs."
-            )
-            return "The relevant sections found in the document appear to be empty. Cannot generate an answer."
+        prompt_inputs, message = _prepare_answer_inputs(
+            user_query, context_documents, conversation_history
+        )
+        if message:
+            return message
 
-        logger.debug(f"Context for prompt: {context_text[:100]}...")
         conversation_prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
         response_chain = conversation_prompt | language_model
 
-        response = response_chain.invoke(
-            {
-                "user_query": user_query,
-                "document_context": context_text,
-                "conversation_history": conversation_history,
-            }
-        )
+        response = response_chain.invoke(prompt_inputs)
 
         if not response or not response.strip():
             logger.warning("AI model returned an empty response for answer generation.")
@@ -69,6 +86,71 @@ def generate_answer(
         return f"{user_message} Please try again later or rephrase your question. (Details: {e})"
 
 
+def stream_answer(
+    language_model,
+    user_query,
+    context_documents,
+    conversation_history="",
+    on_complete=None,
+):
+    """
+    Streaming version of generate_answer: yields the answer piece by piece as the
+    language model produces it, for st.write_stream. Messages that replace an
+    answer (empty question, no context, model errors) are yielded as text too,
+    so the concatenated output is always what should be stored in the chat.
+    `on_complete`, if given, is called with the full answer only when the model
+    streamed one successfully.
+    """
+    started = time.perf_counter()
+    first_chunk = True
+    received_text = False
+    answer_chunks = []
+    try:
+        prompt_inputs, message = _prepare_answer_inputs(
+            user_query, context_documents, conversation_history
+        )
+        if message:
+            yield message
+            return
+
+        conversation_prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+        response_chain = conversation_prompt | language_model
+        for chunk in response_chain.stream(prompt_inputs):
+            if not chunk:
+                continue
+            if first_chunk:
+                first_chunk = False
+                logger.info(
+                    f"First answer token after {time.perf_counter() - started:.2f}s."
+                )
+            received_text = received_text or bool(chunk.strip())
+            answer_chunks.append(chunk)
+            yield chunk
+    except Exception as e:
+        user_message = (
+            "I'm sorry, but I encountered an error while trying to generate a response."
+        )
+        logger.exception(f"Error during answer generation: {e}")
+        st.error(
+            f"An error occurred while generating the answer using the AI model. Details: {e}"
+        )
+        # Anything already streamed stays on screen; the error follows it
+        separator = "" if first_chunk else "\n\n"
+        yield f"{separator}{user_message} Please try again later or rephrase your question. (Details: {e})"
+        return
+
+    if not received_text:
+        logger.warning("AI model returned an empty response for answer generation.")
+        st.warning(
+            "The AI model returned an empty response. Please try rephrasing your question or try again later."
+        )
+        yield "The AI model returned an empty response. Please try rephrasing your question or try again later."
+        return
+    logger.info(f"Answer streamed successfully in {time.perf_counter() - started:.2f}s.")
+    if on_complete is not None:
+        on_complete("".join(answer_chunks))
+
+
 def generate_summary(language_model, full_document_text):
     """
     Generates a summary for the given document text.
@@ -133,3 +215,35 @@ def generate_keywords(language_model, full_document_text):
             f"An error occurred while extracting keywords using the AI model. Details: {e}"
         )
         return f"{user_message} Please try again later. (Details: {e})"
+
+
+def refine_keywords(language_model, candidate_keywords):
+    """
+    Asks the LLM to choose and tidy up the final keywords from locally ranked
+    candidates (see core/keywords.py). The prompt holds only the candidate
+    terms, so its size doesn't depend on the size of the documents.
+    """
+    if not candidate_keywords:
+        logger.warning("refine_keywords called with no candidate keywords.")
+        return None
+    logger.info(f"Refining {len(candidate_keywords)} keyword candidates with the LLM...")
+    try:
+        refinement_prompt = ChatPromptTemplate.from_template(
+            KEYWORD_REFINEMENT_PROMPT_TEMPLATE
+        )
+        refinement_chain = refinement_prompt | language_model
+        keywords = refinement_chain.invoke(
+            {"candidate_keywords": ", ".join(candidate_keywords)}
+        )
+        if not keywords or not keywords.strip():
+            logger.warning("AI model returned no refined keywords.")
+            return None
+        logger.info("Keywords refined successfully.")
+        return keywords
+    except Exception as e:
+        user_message = "Failed to extract keywords due to an AI model error."
+        logger.exception(f"Error during keyword refinement: {e}")
+        st.error(
+            f"An error occurred while refining keywords using the AI model. Details: {e}"
+        )
+        return f"{user_message} Please try again later. (Details: {e})"
@@ -0,0 +1,333 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections.abc import Sequence
+import numpy as np
+import streamlit as st
+from langchain_core.documents import Document as LangchainDocument
+from .config import INDEX_STORAGE_PATH, OLLAMA_EMBEDDING_MODEL_NAME
+from .analyzer import DEFAULT_ANALYZER
+from .chunk_store import TextSpan
+from .vector_store import NumpyVectorStore
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Bump whenever the on-disk layout or the chunking that produced it changes.
+# BM25 tokenization is tracked separately by the analyzer signature in meta.json.
+INDEX_FORMAT_VERSION = 1
+# Bump whenever document_processing.load_document's output for the same file changes;
+# cached parses (see parse_cache.py) and index segments of older versions are then
+# ignored, and replaced when the file is processed again.
+PARSER_VERSION = 3
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Files that make up one persisted segment (one uploaded file, one embedding model)
+META_FILE = "meta.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_PREFIX = "chunks"
+PAGES_PREFIX = "pages"
+BM25_FILE = "bm25.json"
+
+
+def compute_file_hash(file_path):
+    """Returns the SHA-256 hex digest of a file, read in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def segment_directory(
+    file_hash,
+    embedding_model_name=OLLAMA_EMBEDDING_MODEL_NAME,
+    storage_path=INDEX_STORAGE_PATH,
+):
+    """
+    Directory holding the persisted index for one file content hash.
+    Embeddings depend on the model, so each model gets its own subdirectory.
+    """
+    model_slug = re.sub(r"[^A-Za-z0-9_.-]", "_", embedding_model_name)
+    return os.path.join(storage_path, file_hash, model_slug)
+
+
+def _write_records(directory, prefix, documents):
+    """
+    Writes documents as concatenated UTF-8 JSON records (`<prefix>.bin`) plus an
+    int64 offsets array (`<prefix>.idx.npy`) so any record can be read by position.
+    """
+    offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+    with open(os.path.join(directory, f"{prefix}.bin"), "wb") as f:
+        for i, doc in enumerate(documents):
+            record = json.dumps(
+                {"page_content": doc.page_content, "metadata": doc.metadata},
+                ensure_ascii=False,
+                default=str,  # Loader metadata may contain non-JSON values (e.g. dates)
+            ).encode("utf-8")
+            f.write(record)
+            offsets[i + 1] = offsets[i] + len(record)
+    np.save(os.path.join(directory, f"{prefix}.idx.npy"), offsets)
+
+
+class RecordFile(Sequence):
+    """
+    Read-only, memory-mapped view over documents written by `_write_records`.
+    Records are decoded only when accessed, so opening a large segment is cheap.
+    `spans` are the records as TextSpan views, which the indexes hold instead of
+    decoded documents; each decodes its record whenever it is read.
+    """
+
+    def __init__(self, directory, prefix):
+        self._offsets = np.load(
+            os.path.join(directory, f"{prefix}.idx.npy"), mmap_mode="r"
+        )
+        data_path = os.path.join(directory, f"{prefix}.bin")
+        # np.memmap refuses zero-length files
+        if os.path.getsize(data_path) > 0:
+            self._data = np.memmap(data_path, dtype=np.uint8, mode="r")
+        else:
+            self._data = np.zeros(0, dtype=np.uint8)
+        self._spans = None  # Built on first use
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    @property
+    def spans(self):
+        if self._spans is None:
+            self._spans = [TextSpan(self, index) for index in range(len(self))]
+        return self._spans
+
+    def _record(self, index):
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return json.loads(self._data[start:end].tobytes().decode("utf-8"))
+
+    def text_of(self, index):
+        return self._record(index)["page_content"]
+
+    def metadata_of(self, index):
+        return self._record(index)["metadata"]
+
+    def memory_bytes(self):
+        """Nothing of its own: the records are mapped, their pages shared through the OS page cache."""
+        return 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        record = self._record(index)
+        return LangchainDocument(
+            page_content=record["page_content"], metadata=record["metadata"]
+        )
+
+
+class IndexSegment:
+    """
+    Persisted index for one uploaded file: raw pages, chunks, embeddings and BM25
+    stats. Pages, chunks and embeddings are memory-mapped and read-only, so one
+    segment opened per process serves every session without copies.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.directory = directory
+        self.raw_documents = RecordFile(directory, PAGES_PREFIX)
+        self.chunks = RecordFile(directory, CHUNKS_PREFIX)
+        self.embeddings = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+        if not self.meta.get("normalized") and len(self.embeddings):
+            # Segments written before embeddings were stored unit-length; normalize
+            # them once per process, read-only so the vector stores still share them
+            logger.info(f"Normalizing the embeddings of index segment at '{directory}' in memory.")
+            self.embeddings = NumpyVectorStore._normalize(self.embeddings)
+            self.embeddings.flags.writeable = False
+        bm25 = None
+        if self.meta.get("analyzer") == DEFAULT_ANALYZER.signature:
+            with open(os.path.join(directory, BM25_FILE), "r", encoding="utf-8") as f:
+                bm25 = json.load(f)
+        if bm25 is not None and "surface_forms" in bm25:
+            self.bm25_term_freqs = bm25["term_freqs"]
+            self.surface_forms = bm25["surface_forms"]
+        else:
+            # Counts were made with other analyzer settings, or without the words
+            # behind stemmed terms; re-tokenizing the stored chunks is cheap, unlike
+            # re-parsing and re-embedding the file.
+            logger.info(
+                f"Re-tokenizing index segment at '{directory}' for the current BM25 analyzer."
+            )
+            self.surface_forms = {}
+            self.bm25_term_freqs = chunk_term_frequencies(self.chunks, self.surface_forms)
+
+    def __len__(self):
+        return len(self.chunks)
+
+
+def _is_current(meta):
+    """True if a segment was written with this format version and parser version."""
+    return (
+        meta.get("format_version") == INDEX_FORMAT_VERSION
+        and meta.get("parser_version") == PARSER_VERSION
+    )
+
+
+def _read_meta(directory):
+    """A segment's meta.json, or None if there is no segment or it is unreadable."""
+    try:
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_segment(
+    file_hash,
+    raw_documents,
+    chunks,
+    embeddings,
+    bm25_term_freqs,
+    embedding_model_name=OLLAMA_EMBEDDING_MODEL_NAME,
+    storage_path=INDEX_STORAGE_PATH,
+    surface_forms=None,
+):
+    """
+    Persists the index for one file, with the words behind its stemmed BM25
+    terms (`surface_forms`, see Analyzer.analyze). The segment is written to a
+    temporary directory and renamed into place, so readers never see a partial
+    segment; a segment of an older format or parser version is replaced.
+    Returns True on success; failures are logged and never interrupt the upload.
+    """
+    if len(chunks) != len(embeddings) or len(chunks) != len(bm25_term_freqs):
+        logger.error(
+            f"Refusing to persist segment {file_hash[:12]}: {len(chunks)} chunks, "
+            f"{len(embeddings)} embeddings, {len(bm25_term_freqs)} BM25 entries."
+        )
+        return False
+
+    final_dir = segment_directory(file_hash, embedding_model_name, storage_path)
+    meta = _read_meta(final_dir)
+    if meta is not None and _is_current(meta):
+        logger.debug(f"Segment {file_hash[:12]} already persisted.")
+        return True
+
+    parent_dir = os.path.dirname(final_dir)
+    tmp_dir = None
+    stale_dir = None
+    try:
+        os.makedirs(parent_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent_dir)
+        # Stored unit-length, as the vector store keeps them, so loaded segments are used as mapped
+        if len(chunks):
+            embedding_matrix = NumpyVectorStore._normalize(embeddings)
+        else:
+            embedding_matrix = np.asarray(embeddings, dtype=np.float32)
+        np.save(os.path.join(tmp_dir, EMBEDDINGS_FILE), embedding_matrix)
+        _write_records(tmp_dir, PAGES_PREFIX, raw_documents)
+        _write_records(tmp_dir, CHUNKS_PREFIX, chunks)
+        with open(os.path.join(tmp_dir, BM25_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {"term_freqs": bm25_term_freqs, "surface_forms": surface_forms or {}},
+                f,
+                ensure_ascii=False,
+            )
+        with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format_version": INDEX_FORMAT_VERSION,
+                    "parser_version": PARSER_VERSION,
+                    "analyzer": DEFAULT_ANALYZER.signature,
+                    "file_hash": file_hash,
+                    "embedding_model": embedding_model_name,
+                    "num_chunks": len(chunks),
+                    "dimension": int(embedding_matrix.shape[1]) if len(chunks) else 0,
+                    "normalized": True,
+                },
+                f,
+            )
+        if os.path.exists(final_dir):
+            # An outdated segment; moved aside, as a directory is only replaced by rename when empty
+            stale_dir = tempfile.mkdtemp(prefix=".stale-", dir=parent_dir)
+            os.replace(final_dir, os.path.join(stale_dir, "segment"))
+            logger.info(f"Replacing index segment {file_hash[:12]} written by an older version.")
+        os.replace(tmp_dir, final_dir)
+        tmp_dir = None
+        logger.info(f"Persisted index segment {file_hash[:12]} ({len(chunks)} chunks).")
+        return True
+    except OSError as e:
+        # Another session may have persisted the same file first; that is fine.
+        meta = _read_meta(final_dir)
+        if meta is not None and _is_current(meta):
+            return True
+        logger.error(f"Failed to persist index segment {file_hash[:12]}. Details: {e}")
+        return False
+    except Exception as e:
+        logger.exception(f"Unexpected error persisting index segment {file_hash[:12]}. Details: {e}")
+        return False
+    finally:
+        for leftover in (tmp_dir, stale_dir):
+            if leftover:
+                shutil.rmtree(leftover, ignore_errors=True)
+
+
+@st.cache_resource(show_spinner=False)
+def _open_segment(directory, modified_ns):
+    """
+    Opens a segment once per process; its memory maps and spans are shared by all
+    sessions. `modified_ns` (of its meta.json) tells a replaced segment apart.
+    """
+    return IndexSegment(directory)
+
+
+def load_segment(
+    file_hash,
+    embedding_model_name=OLLAMA_EMBEDDING_MODEL_NAME,
+    storage_path=INDEX_STORAGE_PATH,
+):
+    """
+    Returns the persisted IndexSegment for a file hash, or None if there is no
+    usable segment (missing, written by an older format or parser, or unreadable).
+    """
+    directory = segment_directory(file_hash, embedding_model_name, storage_path)
+    try:
+        modified_ns = os.stat(os.path.join(directory, META_FILE)).st_mtime_ns
+    except OSError:
+        return None
+    try:
+        segment = _open_segment(directory, modified_ns)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable index segment at '{directory}'. Details: {e}")
+        return None
+    if not _is_current(segment.meta):
+        logger.info(f"Ignoring index segment at '{directory}' written by an older format or parser.")
+        return None
+    logger.info(f"Loaded persisted index segment {file_hash[:12]} ({len(segment)} chunks).")
+    return segment
+
+
+def bm25_term_frequencies(tokenized_corpus):
+    """Per-document term counts, the only per-document data BM25 needs."""
+    term_freqs = []
+    for tokens in tokenized_corpus:
+        frequencies = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        term_freqs.append(frequencies)
+    return term_freqs
+
+
+def chunk_term_frequencies(chunks, surface_forms=None):
+    """
+    BM25 term counts for each chunk, tokenized by the app's analyzer. Given a
+    `surface_forms` dict, also counts the words behind stemmed terms in it (see
+    Analyzer.analyze).
+    """
+    return bm25_term_frequencies(
+        DEFAULT_ANALYZER.analyze(chunk.page_content, surface_forms) for chunk in chunks
+    )
@@ -0,0 +1,236 @@
+import multiprocessing
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import streamlit as st
+from .config import (
+    INGEST_MAX_WORKERS,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_WORKERS,
+)
+from .document_processing import load_document, chunk_documents
+from .chunk_store import ChunkStore
+from .parse_cache import load_parsed_documents, save_parsed_documents
+from .embedding_pipeline import embed_batch_with_retry
+from .index_store import chunk_term_frequencies
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class IngestedFile:
+    """Outcome of ingesting one uploaded file. `error` is a user-facing message, or None."""
+
+    def __init__(self, filename, file_path, file_hash):
+        self.filename = filename
+        self.file_path = file_path
+        self.file_hash = file_hash
+        self.raw_documents = []
+        self.chunks = []
+        self.embeddings = None
+        self.bm25_term_freqs = []
+        self.surface_forms = {}  # Words behind the stemmed BM25 terms (see Analyzer.analyze)
+        self.needs_saving = True  # False when restored from a persisted index segment
+        self.error = None
+
+    def set_documents(self, raw_documents, chunks):
+        """
+        Keeps the file's text once, in a ChunkStore, with its pages and chunks as
+        spans of it rather than as separate copies of the text.
+        """
+        store = ChunkStore(raw_documents, chunks)
+        self.raw_documents = store.pages
+        self.chunks = store.chunks
+
+    @classmethod
+    def from_segment(cls, filename, file_path, file_hash, segment):
+        """
+        Wraps a persisted IndexSegment so it can be indexed like a freshly ingested
+        file. Its pages, chunks and embeddings stay the segment's mapped, shared
+        ones; nothing is decoded or copied for the session.
+        """
+        ingested = cls(filename, file_path, file_hash)
+        ingested.raw_documents = segment.raw_documents.spans
+        ingested.chunks = segment.chunks.spans
+        ingested.embeddings = segment.embeddings
+        ingested.bm25_term_freqs = segment.bm25_term_freqs
+        ingested.surface_forms = segment.surface_forms
+        ingested.needs_saving = False
+        return ingested
+
+
+def parse_and_chunk(file_path, file_hash=None, file_name=None):
+    """
+    Parses one file, splits it into chunks and counts their BM25 terms (and the
+    words behind stemmed terms). Runs in a worker process, so any Streamlit
+    messages raised here are not shown; callers report failures instead.
+    Given the file's content hash, pages parsed before are taken from the parse
+    cache and new parses are added to it. `file_name` is the uploaded name, used
+    in load_document's messages only: pages are cached and indexed by content,
+    so their "source" is the content hash.
+    """
+    extension = os.path.splitext(file_path)[1]
+    raw_documents = load_parsed_documents(file_hash, extension) if file_hash else None
+    if raw_documents is None:
+        raw_documents = load_document(file_path, file_name, file_hash)
+        if raw_documents and file_hash:
+            save_parsed_documents(file_hash, extension, raw_documents)
+    chunks = chunk_documents(raw_documents) if raw_documents else []
+    surface_forms = {}
+    term_freqs = chunk_term_frequencies(chunks, surface_forms)
+    return raw_documents, chunks, term_freqs, surface_forms
+
+
+@st.cache_resource(show_spinner=False)
+def _get_parse_pool(max_workers):
+    """
+    Process pool shared by all sessions. PDF parsing is pure Python and holds the
+    GIL, so only separate processes parse files in parallel. 'spawn' avoids
+    forking Streamlit's server threads into the workers.
+    """
+    logger.info(f"Starting document parsing pool with {max_workers} worker process(es).")
+    return ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def ingest_files(
+    files,
+    embedding_model,
+    status_callback=None,
+    max_workers=INGEST_MAX_WORKERS,
+    batch_size=EMBEDDING_BATCH_SIZE,
+    embedding_workers=EMBEDDING_MAX_WORKERS,
+):
+    """
+    Parses, chunks and embeds uploaded files as a pipeline.
+
+    `files` is a list of (filename, saved path, content hash). Files are parsed in
+    a process pool; as soon as one is parsed its chunks are queued as embedding
+    batches on a shared thread pool, so embedding overlaps with parsing of the
+    remaining files. Each batch is retried with backoff (see embed_batch_with_retry).
+    `status_callback(filename, message)` is called from the calling thread whenever
+    a file changes state or a batch of its chunks is embedded.
+
+    Returns one IngestedFile per input file, in input order.
+    """
+    results = [IngestedFile(name, path, file_hash) for name, path, file_hash in files]
+    if not results:
+        return results
+
+    def report(result, message):
+        if status_callback:
+            status_callback(result.filename, message)
+
+    # A single file gains nothing from a process pool; parse it on a helper thread.
+    use_processes = max_workers > 1 and len(results) > 1
+    parse_executor = _get_parse_pool(max_workers) if use_processes else None
+    fallback_executor = None
+    embed_executor = ThreadPoolExecutor(
+        max_workers=max(1, embedding_workers), thread_name_prefix="embed"
+    )
+    pending = {}  # future -> (kind, file index, batch number)
+    vector_batches = {}  # file index -> embedded batches, in batch order
+    remaining_batches = {}  # file index -> batches still being embedded
+    embedded_chunks = {}  # file index -> chunks embedded so far, for progress
+
+    def submit_parse(index):
+        nonlocal fallback_executor
+        result = results[index]
+        if parse_executor is not None:
+            future = parse_executor.submit(
+                parse_and_chunk, result.file_path, result.file_hash, result.filename
+            )
+        else:
+            if fallback_executor is None:
+                fallback_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse")
+            future = fallback_executor.submit(
+                parse_and_chunk, result.file_path, result.file_hash, result.filename
+            )
+        pending[future] = ("parse", index, None)
+        report(result, "Parsing...")
+
+    try:
+        for index in range(len(results)):
+            submit_parse(index)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, index, batch_number = pending.pop(future)
+                result = results[index]
+                if result.error:
+                    continue  # A batch of a file that already failed
+
+                try:
+                    value = future.result()
+                except BrokenProcessPool:
+                    # A worker died (e.g. OOM on a huge PDF). Retire the pool and
+                    # finish the remaining parses on a thread in this process.
+                    logger.warning(
+                        f"Parsing pool broke while processing '{result.filename}'; parsing remaining files in-process."
+                    )
+                    _get_parse_pool.clear()
+                    parse_executor = None
+                    submit_parse(index)
+                    continue
+                except Exception as e:
+                    stage = "parse" if kind == "parse" else "embed"
+                    logger.exception(f"Failed to {stage} '{result.filename}'. Details: {e}")
+                    result.error = f"Failed to {stage} '{result.filename}'. Details: {e}"
+                    report(result, "❌ Failed")
+                    continue
+
+                if kind == "parse":
+                    raw_documents, chunks, result.bm25_term_freqs, result.surface_forms = value
+                    result.set_documents(raw_documents, chunks)
+                    if not result.raw_documents:
+                        result.error = f"Could not load document from '{result.filename}'. It might be empty, corrupted, or an unsupported type."
+                        report(result, "❌ Could not load document")
+                        continue
+                    if not result.chunks:
+                        report(result, "⚠️ No text chunks found")
+                        continue
+                    texts = [chunk.page_content for chunk in result.chunks]
+                    batches = [
+                        texts[start : start + batch_size]
+                        for start in range(0, len(texts), batch_size)
+                    ]
+                    vector_batches[index] = [None] * len(batches)
+                    remaining_batches[index] = len(batches)
+                    embedded_chunks[index] = 0
+                    for number, batch in enumerate(batches):
+                        embed_future = embed_executor.submit(
+                            embed_batch_with_retry, embedding_model, batch, number
+                        )
+                        pending[embed_future] = ("embed", index, number)
+                    report(
+                        result,
+                        f"Parsed {len(result.raw_documents)} page(s); embedding {len(result.chunks)} chunks...",
+                    )
+                else:
+                    vector_batches[index][batch_number] = value
+                    remaining_batches[index] -= 1
+                    embedded_chunks[index] += len(value)
+                    if remaining_batches[index]:
+                        report(result, f"Embedded {embedded_chunks[index]}/{len(result.chunks)} chunks...")
+                    else:
+                        result.embeddings = np.asarray(
+                            [vector for batch in vector_batches.pop(index) for vector in batch],
+                            dtype=np.float32,
+                        )
+                        report(result, f"✅ Ready ({len(result.chunks)} chunks)")
+    finally:
+        embed_executor.shutdown(wait=True, cancel_futures=True)
+        if fallback_executor is not None:
+            fallback_executor.shutdown(wait=True, cancel_futures=True)
+
+    succeeded = sum(1 for result in results if not result.error)
+    logger.info(f"Ingested {succeeded} of {len(results)} file(s).")
+    return results
@@ -0,0 +1,60 @@
+import numpy as np
+from .config import KEYWORDS_TOP_N
+from .logger_config import get_logger
+from .search_pipeline import top_positive_indices
+
+logger = get_logger(__name__)
+
+MIN_KEYWORD_LENGTH = 3
+
+
+def _is_keyword_candidate(term):
+    return len(term) >= MIN_KEYWORD_LENGTH and not term.isdigit()
+
+
+def _surface_form(term, total_count, words):
+    """
+    The word most often behind `term` in the text. `words` counts the words
+    that stemming changed; the rest of the term's occurrences are the term itself.
+    """
+    if not words:
+        return term
+    unchanged = total_count - sum(words.values())
+    word, count = max(words.items(), key=lambda item: (item[1], item[0]))
+    return word if count > unchanged else term
+
+
+def extract_keywords(bm25_index, top_n=KEYWORDS_TOP_N, surface_forms=None):
+    """
+    Ranks the corpus's own terms by TF-IDF computed from the BM25 index's
+    statistics, so no text is re-read and no LLM is involved. A term scores
+    (1 + log of its total count) * log(1 + documents / documents containing it):
+    frequent terms rank high unless they are spread evenly over every chunk.
+    Terms come from the BM25 analyzer, so stopwords are already gone and
+    plurals are folded. Each is shown as the word most often behind it, from
+    `surface_forms` ({term: {word: count}}, see Analyzer.analyze), since a
+    stemmed term is often not a word ("analysi"). Returns up to `top_n`
+    keywords, best first.
+    """
+    if bm25_index is None or not len(bm25_index):
+        return []
+    terms, counts, document_frequencies = bm25_index.term_statistics()
+    num_documents = len(bm25_index)
+    surface_forms = surface_forms or {}
+
+    eligible = document_frequencies > 0
+    eligible &= np.fromiter((_is_keyword_candidate(term) for term in terms), dtype=bool, count=len(terms))
+    if num_documents > 1:
+        eligible &= counts >= 2  # A single mention doesn't describe the corpus
+    scores = np.zeros(len(terms))
+    scores[eligible] = (1 + np.log(counts[eligible])) * np.log(
+        1 + num_documents / document_frequencies[eligible]
+    )
+    keywords = [
+        _surface_form(terms[i], counts[i], surface_forms.get(terms[i]))
+        for i in top_positive_indices(scores, top_n)
+    ]
+    logger.info(
+        f"Extracted {len(keywords)} keywords from {num_documents} chunks and {len(terms)} terms."
+    )
+    return keywords
@@ -0,0 +1,229 @@
+import threading
+import time
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from .config import MEMORY_BUDGET_MB, SESSION_IDLE_SECONDS
+from .session_manager import evict_documents
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+MEGABYTE = 1024 * 1024
+
+_NO_DOCUMENTS = {"text": 0, "embeddings": 0, "bm25": 0}
+
+
+def _session_is_open(session_id):
+    """False once Streamlit has closed the session (e.g. its browser tab is gone)."""
+    return not Runtime.exists() or Runtime.instance().is_active_session(session_id)
+
+
+def _chat_bytes(state):
+    messages = state["messages"] if "messages" in state else []
+    return sum(len(message.get("content") or "") for message in messages)
+
+
+class SessionTracker:
+    """
+    Tracks the Streamlit sessions of this process for memory accounting. Each
+    session reports in at the start and end of every script run (begin_run(),
+    end_run()) with its session state. A session is never idle while a run is in
+    progress; after it, the session is idle once `idle_seconds` have passed
+    without another run.
+
+    Memory is estimated per session as the text, embeddings and BM25 index of its
+    documents plus its chat history. When the total over all sessions, counting a
+    corpus shared by several sessions once, exceeds `budget_bytes`,
+    enforce_budget() unloads the documents of idle sessions, longest idle first,
+    until it no longer does (see session_manager.evict_documents).
+    """
+
+    def __init__(
+        self,
+        budget_bytes=MEMORY_BUDGET_MB * MEGABYTE,
+        idle_seconds=SESSION_IDLE_SECONDS,
+        is_open=_session_is_open,
+    ):
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self.evictions = 0
+        self._is_open = is_open
+        # session id -> [session state, time of its last activity, thread of the run in progress or None]
+        self._sessions = {}
+        # Held while evicting, so a run of the evicted session waits in touch() and
+        # then finds its documents unloaded, never half-unloaded
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _touch(self, session_id, state, now):
+        now = time.monotonic() if now is None else now
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = self._sessions[session_id] = [state, now, None]
+        else:
+            entry[0], entry[1] = state, now
+        return entry
+
+    def touch(self, session_id, state, now=None):
+        """Records activity of the session; it is idle from `now` on unless a run is in progress."""
+        with self._lock:
+            self._touch(session_id, state, now)
+
+    def begin_run(self, session_id, state, now=None):
+        """
+        Records that a run of the session started on the calling thread. The run is
+        in progress until end_run(), or until the thread ends: a run stopped by an
+        exception or st.stop() never reaches end_run().
+        """
+        with self._lock:
+            self._touch(session_id, state, now)[2] = threading.current_thread()
+
+    def end_run(self, session_id, now=None):
+        """Records that the session's run finished; it is idle from `now` on."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry[1] = time.monotonic() if now is None else now
+                entry[2] = None
+
+    def _forget_closed_sessions(self):
+        for session_id in [session_id for session_id in self._sessions if not self._is_open(session_id)]:
+            del self._sessions[session_id]  # Its state is freed with the session
+            logger.debug(f"Stopped tracking closed session {session_id}.")
+
+    def _measure(self, now):
+        """
+        Usage per session, with the id of the corpus it holds, and per corpus
+        ({corpus id: [usage, holding session ids]}). Corpora keep their measured
+        size until their files change, so this costs O(sessions) on every run.
+        """
+        sessions = {}
+        corpora = {}
+        for session_id, (state, last_active, run_thread) in self._sessions.items():
+            corpus = state["corpus"] if "corpus" in state else None
+            if id(corpus) not in corpora:
+                # An empty corpus holds a few bytes of bookkeeping; count it as nothing
+                usage = corpus.memory_bytes() if corpus is not None and corpus.files else _NO_DOCUMENTS
+                corpora[id(corpus)] = [usage, []]
+            usage, holders = corpora[id(corpus)]
+            holders.append(session_id)
+            chat = _chat_bytes(state)
+            sessions[session_id] = {
+                **usage,
+                "chat": chat,
+                "total": sum(usage.values()) + chat,
+                "idle_seconds": now - last_active,
+                "running": run_thread is not None and run_thread.is_alive(),
+                "corpus": id(corpus),
+            }
+        return sessions, corpora
+
+    @staticmethod
+    def _total(sessions, corpora):
+        return sum(sum(usage.values()) for usage, _ in corpora.values()) + sum(
+            usage["chat"] for usage in sessions.values()
+        )
+
+    def memory_report(self, now=None):
+        """
+        Approximate memory use: {"sessions": {session id: {"text", "embeddings",
+        "bm25", "chat", "total" (bytes), "shared_with" (other sessions using the
+        same documents), "idle_seconds", "running" (a run is in progress)}},
+        "total": bytes over all sessions}.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._forget_closed_sessions()
+            sessions, corpora = self._measure(now)
+        for usage in sessions.values():
+            usage["shared_with"] = len(corpora[usage.pop("corpus")][1]) - 1
+        return {"sessions": sessions, "total": self._total(sessions, corpora)}
+
+    def enforce_budget(self, current_session_id=None, now=None):
+        """
+        Unloads the documents of idle sessions, longest idle first, until the
+        estimated total is within the budget. The current session and sessions
+        with a run in progress are never unloaded, nor documents a session that
+        isn't idle also uses, since that frees nothing. Returns the number of
+        sessions unloaded.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._forget_closed_sessions()
+            if self.budget_bytes <= 0:
+                return 0
+            sessions, corpora = self._measure(now)
+            total = self._total(sessions, corpora)
+            if total <= self.budget_bytes:
+                logger.debug(
+                    f"Sessions use ~{total / MEGABYTE:.1f} MB of the {self.budget_bytes / MEGABYTE:.0f} MB memory budget."
+                )
+                return 0
+
+            idle = {
+                session_id
+                for session_id, usage in sessions.items()
+                if session_id != current_session_id
+                and not usage["running"]
+                and usage["idle_seconds"] >= self.idle_seconds
+                and usage["total"] > usage["chat"]
+            }
+            logger.warning(
+                f"Sessions use ~{total / MEGABYTE:.1f} MB, over the {self.budget_bytes / MEGABYTE:.0f} MB memory budget; {len(idle)} idle session(s) can be unloaded."
+            )
+            remaining_holders = {key: len(holders) for key, (_, holders) in corpora.items()}
+            evicted = 0
+            for session_id in sorted(idle, key=lambda session_id: -sessions[session_id]["idle_seconds"]):
+                if total <= self.budget_bytes:
+                    break
+                key = sessions[session_id]["corpus"]
+                usage, holders = corpora[key]
+                if not idle.issuperset(holders):
+                    continue
+                try:
+                    evict_documents(self._sessions[session_id][0])
+                except Exception as e:
+                    logger.exception(f"Failed to unload the documents of session {session_id}. Details: {e}")
+                    continue
+                evicted += 1
+                remaining_holders[key] -= 1
+                if remaining_holders[key] == 0:
+                    total -= sum(usage.values())
+                logger.info(
+                    f"Unloaded the documents of session {session_id}, idle for {sessions[session_id]['idle_seconds']:.0f}s; ~{total / MEGABYTE:.1f} MB in use."
+                )
+            self.evictions += evicted
+            if total > self.budget_bytes:
+                logger.warning(
+                    f"Still ~{total / MEGABYTE:.1f} MB in use after unloading {evicted} idle session(s); the other sessions are active."
+                )
+            return evicted
+
+
+# Shared by all sessions of the process
+session_tracker = SessionTracker()
+
+
+def track_session():
+    """
+    Records that a run of the current Streamlit session started and, if the
+    memory budget is exceeded, unloads the documents of idle sessions. Call at the
+    start of every run, before the session state is used, and end_session_run()
+    at its end. Does nothing outside a Streamlit server.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return
+    session_tracker.begin_run(ctx.session_id, ctx.session_state)
+    session_tracker.enforce_budget(ctx.session_id)
+
+
+def end_session_run():
+    """Records that the run of the current Streamlit session finished; the session may be idle from now on."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return
+    session_tracker.end_run(ctx.session_id)
@@ -7,7 +7,13 @@ from .config import (
     OLLAMA_EMBEDDING_MODEL_NAME,
     OLLAMA_LLM_NAME,
     RERANKER_MODEL_NAME,
+    RERANKER_BACKEND,
+    RERANKER_ONNX_MODEL_DIR,
 )
+from .embedding_cache import CachedEmbeddings
+from .onnx_reranker import load_onnx_reranker
+from .reranker_cache import CachedReranker
+from .reranker_service import RerankerService
 from .logger_config import get_logger  # Import the logger
 import requests
 
@@ -17,7 +23,10 @@ logger = get_logger(__name__)  # Initialize logger for this module
 # Cached functions to load models
 @st.cache_resource
 def get_embedding_model():
-    """Loads and caches the Ollama embedding model."""
+    """
+    Loads and caches the Ollama embedding model, wrapped in an on-disk
+    embedding cache so previously seen chunks are never re-embedded.
+    """
     logger.info(
         f"Attempting to load Embedding Model: {OLLAMA_EMBEDDING_MODEL_NAME} from: {OLLAMA_BASE_URL}"
     )
@@ -31,7 +40,7 @@ def get_embedding_model():
         # Attempt a simple operation to check connectivity, if available and cheap.
         # For OllamaEmbeddings, actual connection might be deferred.
         # If not, error will be caught on first use in the main script.
-        return model
+        return CachedEmbeddings(model, OLLAMA_EMBEDDING_MODEL_NAME)
     except requests.exceptions.ConnectionError as conn_err:
         user_message = f"Failed to connect to Ollama at {OLLAMA_BASE_URL} for Embedding Model. Please ensure Ollama is running and accessible."
         logger.error(f"{user_message} Details: {conn_err}")
@@ -71,17 +80,53 @@ def get_language_model():
         return None
 
 
+def _load_onnx_reranker():
+    """Returns the exported ONNX reranker, or None (after logging why) if it can't be used."""
+    try:
+        return load_onnx_reranker(RERANKER_ONNX_MODEL_DIR)
+    except FileNotFoundError:
+        logger.warning(
+            f"No exported ONNX reranker in '{RERANKER_ONNX_MODEL_DIR}'; run scripts/export_reranker_onnx.py to create it. Using the CrossEncoder instead."
+        )
+    except ImportError as e:
+        logger.warning(
+            f"ONNX reranker backend needs onnxruntime; using the CrossEncoder instead. Details: {e}"
+        )
+    except Exception as e:
+        logger.exception(
+            f"Failed to load the ONNX reranker from '{RERANKER_ONNX_MODEL_DIR}'; using the CrossEncoder instead. Details: {e}"
+        )
+    return None
+
+
 @st.cache_resource
 def get_reranker_model():  # model_name parameter removed, uses RERANKER_MODEL_NAME from config
     """
     Loads and caches the CrossEncoder model for re-ranking.
-    Uses RERANKER_MODEL_NAME from config.
+    Uses RERANKER_MODEL_NAME from config. The model sits behind a micro-batching
+    service shared by all sessions, wrapped in an in-memory score cache so
+    repeated (question, chunk) pairs are not scored again.
+
+    With RERANKER_BACKEND="onnx", the int8 ONNX export in RERANKER_ONNX_MODEL_DIR
+    is used instead of the PyTorch model when it is available.
     """
+    if RERANKER_BACKEND == "onnx":
+        model = _load_onnx_reranker()
+        if model is not None:
+            if model.model_name and model.model_name != RERANKER_MODEL_NAME:
+                logger.warning(
+                    f"The ONNX reranker was exported from '{model.model_name}', not RERANKER_MODEL_NAME '{RERANKER_MODEL_NAME}'."
+                )
+            # Scores differ slightly from the PyTorch model's, so they are cached separately
+            return CachedReranker(RerankerService(model), f"{RERANKER_MODEL_NAME}:onnx")
+    elif RERANKER_BACKEND != "torch":
+        logger.warning(f"Unknown RERANKER_BACKEND '{RERANKER_BACKEND}'; using 'torch'.")
+
     logger.info(f"Attempting to load CrossEncoder model: {RERANKER_MODEL_NAME}")
     try:
         model = CrossEncoder(RERANKER_MODEL_NAME)
         logger.info(f"CrossEncoder model {RERANKER_MODEL_NAME} loaded successfully.")
-        return model
+        return CachedReranker(RerankerService(model), RERANKER_MODEL_NAME)
     except Exception as e:
         user_message = f"Error loading CrossEncoder model '{RERANKER_MODEL_NAME}'. Re-ranking will be disabled."
         logger.exception(
@@ -0,0 +1,109 @@
+import json
+import os
+import numpy as np
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Written by scripts/export_reranker_onnx.py; the int8 model is preferred when both exist.
+ONNX_MODEL_FILENAMES = ("model_quantized.onnx", "model.onnx")
+EXPORT_METADATA_FILENAME = "reranker_export.json"
+
+
+def find_onnx_model(model_dir):
+    """Returns the path of the exported reranker in `model_dir`, or None if there is none."""
+    for filename in ONNX_MODEL_FILENAMES:
+        path = os.path.join(model_dir, filename)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+class OnnxCrossEncoder:
+    """
+    Cross-encoder running on ONNX Runtime, with the same `predict(pairs)` call as
+    sentence-transformers' CrossEncoder. `activation` is the one CrossEncoder
+    applied to the logits when the model was exported ("identity" or "sigmoid"),
+    so scores are on the same scale as the PyTorch model's.
+    """
+
+    def __init__(
+        self,
+        session,
+        tokenizer,
+        activation="identity",
+        max_length=512,
+        batch_size=32,
+        model_name=None,
+    ):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.activation = activation
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.model_name = model_name  # The model that was exported, if recorded
+        self.input_names = {model_input.name for model_input in session.get_inputs()}
+
+    def predict(self, pairs, show_progress_bar=False, batch_size=None):
+        """Scores (query, text) pairs; returns one float32 score per pair."""
+        pairs = list(pairs)
+        if not pairs:
+            return np.empty(0, dtype=np.float32)
+        batch_size = batch_size or self.batch_size
+        scores = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start : start + batch_size]
+            features = self.tokenizer(
+                [query for query, _ in batch],
+                [text for _, text in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            inputs = {
+                name: np.asarray(values, dtype=np.int64)
+                for name, values in features.items()
+                if name in self.input_names
+            }
+            logits = self.session.run(None, inputs)[0]
+            scores.append(np.asarray(logits, dtype=np.float32).reshape(len(batch), -1)[:, 0])
+        scores = np.concatenate(scores)
+        if self.activation == "sigmoid":
+            scores = 1.0 / (1.0 + np.exp(-scores))
+        return scores
+
+
+def load_onnx_reranker(model_dir):
+    """
+    Loads an exported reranker from `model_dir` on the CPU, without network
+    access. Raises FileNotFoundError if nothing was exported there and
+    ImportError if onnxruntime is not installed.
+    """
+    model_path = find_onnx_model(model_dir)
+    if model_path is None:
+        raise FileNotFoundError(f"No exported ONNX reranker in '{model_dir}'.")
+
+    import onnxruntime  # Optional dependency, only needed for this backend
+    from transformers import AutoTokenizer
+
+    metadata = {}
+    metadata_path = os.path.join(model_dir, EXPORT_METADATA_FILENAME)
+    if os.path.isfile(metadata_path):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = onnxruntime.InferenceSession(
+        model_path, options, providers=["CPUExecutionProvider"]
+    )
+    tokenizer = AutoTokenizer.from_pretrained(model_dir, local_files_only=True)
+    logger.info(f"Loaded ONNX reranker from '{model_path}'.")
+    return OnnxCrossEncoder(
+        session,
+        tokenizer,
+        activation=metadata.get("activation", "identity"),
+        max_length=metadata.get("max_length", 512),
+        model_name=metadata.get("model_name"),
+    )
@@ -0,0 +1,132 @@
+import gzip
+import json
+import os
+import tempfile
+from langchain_core.documents import Document as LangchainDocument
+from .config import PARSE_CACHE_PATH, PARSE_CACHE_MAX_MB
+from .index_store import PARSER_VERSION
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+PARSE_CACHE_SUFFIX = ".jsonl.gz"
+
+
+def parse_cache_file(file_hash, extension, storage_path=PARSE_CACHE_PATH):
+    """
+    Path of the cached parse of a file. The extension is part of the key because
+    it selects the loader, and the parser version because the loader's output
+    may change between releases.
+    """
+    extension = extension.lower().lstrip(".")
+    return os.path.join(storage_path, f"{file_hash}-{extension}-v{PARSER_VERSION}{PARSE_CACHE_SUFFIX}")
+
+
+def load_parsed_documents(file_hash, extension, storage_path=PARSE_CACHE_PATH):
+    """
+    Returns the cached pages of a file as documents, or None if the file hasn't
+    been parsed with this parser version (or the cache entry is unreadable).
+    """
+    path = parse_cache_file(file_hash, extension, storage_path)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            documents = [
+                LangchainDocument(page_content=record["page_content"], metadata=record["metadata"])
+                for record in map(json.loads, f)
+            ]
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Discarding unreadable parse cache entry {os.path.basename(path)}. Details: {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    try:
+        os.utime(path)  # Most recently used; eviction goes by modification time
+    except OSError:
+        pass
+    logger.info(f"Parsed pages of {file_hash[:12]} loaded from cache ({len(documents)} page(s)).")
+    return documents
+
+
+def save_parsed_documents(
+    file_hash,
+    extension,
+    documents,
+    storage_path=PARSE_CACHE_PATH,
+    max_bytes=PARSE_CACHE_MAX_MB * 1024 * 1024,
+):
+    """
+    Caches the parsed pages of a file as gzip-compressed JSON lines, one page per
+    line, then evicts the least recently used entries beyond `max_bytes`. The
+    entry is written to a temporary file and renamed into place, so concurrent
+    parses of the same file never leave a partial entry. Returns True on success;
+    failures are logged and never interrupt ingestion.
+    """
+    if max_bytes <= 0 or not documents:
+        return False
+    path = parse_cache_file(file_hash, extension, storage_path)
+    tmp_path = None
+    try:
+        os.makedirs(storage_path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=storage_path)
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", compresslevel=6, encoding="utf-8") as f:
+            for doc in documents:
+                f.write(
+                    json.dumps(
+                        {"page_content": doc.page_content, "metadata": doc.metadata},
+                        ensure_ascii=False,
+                        default=str,  # Loader metadata may contain non-JSON values (e.g. dates)
+                    )
+                )
+                f.write("\n")
+        os.replace(tmp_path, path)
+        tmp_path = None
+        logger.debug(f"Cached parsed pages of {file_hash[:12]} ({len(documents)} page(s)).")
+    except Exception as e:
+        logger.error(f"Failed to cache parsed pages of {file_hash[:12]}. Details: {e}")
+        return False
+    finally:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    evict_parse_cache(storage_path, max_bytes)
+    return True
+
+
+def evict_parse_cache(storage_path=PARSE_CACHE_PATH, max_bytes=PARSE_CACHE_MAX_MB * 1024 * 1024):
+    """Removes the least recently used entries until the cache fits in `max_bytes`. Returns how many."""
+    entries = []
+    try:
+        with os.scandir(storage_path) as scan:
+            for entry in scan:
+                if entry.name.endswith(PARSE_CACHE_SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue  # Removed by another process meanwhile
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError as e:
+        logger.warning(f"Could not scan the parse cache for eviction. Details: {e}")
+        return 0
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not evict parse cache entry {os.path.basename(path)}. Details: {e}")
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        logger.info(f"Evicted {removed} parse cache entries; {total / (1024 * 1024):.1f} MB remain.")
+    return removed
@@ -0,0 +1,84 @@
+import threading
+import numpy as np
+from .cache import LRUCache
+from .config import RERANKER_SCORE_CACHE_SIZE
+from .embedding_cache import text_hash
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class CachedReranker:
+    """
+    CrossEncoder wrapper that caches relevance scores in memory, keyed by
+    (model name, normalized query, SHA-256 of the chunk text). Only pairs that
+    are not cached are sent to the underlying model, so a regenerated or
+    re-asked question over the same chunks costs no cross-encoder inference.
+    The model is shared by all sessions through st.cache_resource, and so is
+    the cache.
+    """
+
+    def __init__(self, underlying, model_name, max_entries=RERANKER_SCORE_CACHE_SIZE):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.score_cache = LRUCache(max_entries)
+        self.pairs_requested = 0
+        self.pairs_scored = 0
+        self._lock = threading.Lock()
+        # Uncased models score "What is X" and "what is x" identically
+        tokenizer = getattr(underlying, "tokenizer", None)
+        self.lowercase_queries = getattr(tokenizer, "do_lower_case", False) is True
+
+    def __getattr__(self, name):
+        # Anything not overridden here (tokenizer, config, ...) comes from the model
+        if name == "underlying":
+            raise AttributeError(name)
+        return getattr(self.underlying, name)
+
+    def normalize_query(self, query):
+        """Collapses whitespace (and case, for uncased models) so trivial variants share entries."""
+        query = " ".join(query.split())
+        return query.lower() if self.lowercase_queries else query
+
+    def predict(self, pairs, show_progress_bar=False, **kwargs):
+        """Scores (query, text) pairs, serving cached scores and predicting only the misses."""
+        keys = [
+            (self.model_name, self.normalize_query(query), text_hash(text))
+            for query, text in pairs
+        ]
+        cached = self.score_cache.get_many(list(dict.fromkeys(keys)))
+
+        # Score each distinct missing pair once, even if it repeats within the call
+        missing = {}
+        for key, pair in zip(keys, pairs):
+            if key not in cached and key not in missing:
+                missing[key] = pair
+        if missing:
+            scores = self.underlying.predict(
+                list(missing.values()), show_progress_bar=show_progress_bar, **kwargs
+            )
+            for key, score in zip(missing.keys(), scores):
+                cached[key] = float(score)
+                self.score_cache.put(key, float(score))
+
+        with self._lock:
+            self.pairs_requested += len(pairs)
+            self.pairs_scored += len(missing)
+        logger.debug(
+            f"Reranker score cache: {len(pairs) - len(missing)} of {len(pairs)} pairs served from cache."
+        )
+        return np.asarray([cached[key] for key in keys], dtype=np.float32)
+
+    def stats(self):
+        """
+        Score cache counters plus how many pairs were requested, how many the
+        model actually scored, and the difference, i.e. the inference saved.
+        """
+        with self._lock:
+            requested, scored = self.pairs_requested, self.pairs_scored
+        return {
+            **self.score_cache.stats(),
+            "pairs_requested": requested,
+            "pairs_scored": scored,
+            "pairs_saved": requested - scored,
+        }
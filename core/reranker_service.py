@@ -0,0 +1,144 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import numpy as np
+from .config import RERANKER_BATCH_WINDOW_MS, RERANKER_MAX_BATCH_PAIRS
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+_STOP = object()
+
+# How often a caller waiting for its scores checks that the worker is still running
+WORKER_CHECK_SECONDS = 1.0
+
+
+class RerankerService:
+    """
+    Micro-batching front for a CrossEncoder shared by all sessions. Callers use
+    `predict(pairs)` as with the model itself; their requests are queued, and a
+    single worker thread merges whatever is waiting (plus anything arriving
+    within `batch_window_ms`) into one forward pass of up to `max_batch_pairs`
+    pairs, then hands each caller its slice of the scores. Under load this
+    replaces many small passes competing for the same cores with a few larger
+    ones; a lone request only waits for the window.
+    """
+
+    def __init__(
+        self,
+        model,
+        batch_window_ms=RERANKER_BATCH_WINDOW_MS,
+        max_batch_pairs=RERANKER_MAX_BATCH_PAIRS,
+    ):
+        self.model = model
+        self.batch_window_seconds = max(0.0, batch_window_ms) / 1000
+        self.max_batch_pairs = max(1, max_batch_pairs)
+        self.requests = 0
+        self.batches = 0
+        self.pairs = 0
+        self._queue = queue.Queue()
+        self._carry = None  # Request that didn't fit in the previous batch
+        self._closed = False
+        self._lock = threading.Lock()  # Guards the counters, and _closed against queued requests
+        self._worker = threading.Thread(target=self._run, name="reranker-batcher", daemon=True)
+        self._worker.start()
+
+    def __getattr__(self, name):
+        # Anything not overridden here (tokenizer, config, ...) comes from the model
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def predict(self, pairs, show_progress_bar=False, **kwargs):
+        """Scores (query, text) pairs in a shared batch; blocks until they are scored."""
+        pairs = list(pairs)
+        if not pairs:
+            return np.empty(0, dtype=np.float32)
+        future = None
+        if not kwargs:  # Requests with custom predict options can't share a batch
+            with self._lock:
+                # Queued ahead of close()'s stop marker, so the worker scores it before exiting
+                if not self._closed and self._worker.is_alive():
+                    future = Future()
+                    self._queue.put((pairs, future))
+        if future is None:
+            return self.model.predict(pairs, show_progress_bar=show_progress_bar, **kwargs)
+        while True:
+            try:
+                return future.result(timeout=WORKER_CHECK_SECONDS)
+            except FutureTimeoutError:
+                # A worker that died unexpectedly never scores the request; score it here
+                if not self._worker.is_alive() and future.cancel():
+                    logger.warning("Re-ranking worker is not running; scoring the request directly.")
+                    return self.model.predict(pairs, show_progress_bar=show_progress_bar)
+
+    def close(self):
+        """Stops the worker once the requests already queued are scored; later requests are scored directly."""
+        with self._lock:
+            self._closed = True
+            self._queue.put(_STOP)
+        self._worker.join()
+
+    def _next_batch(self):
+        """Blocks for the first request, then gathers more until the window closes or the batch is full."""
+        first = self._carry if self._carry is not None else self._queue.get()
+        self._carry = None
+        if first is _STOP:
+            return None
+        batch = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.batch_window_seconds
+        while size < self.max_batch_pairs:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    request = self._queue.get(timeout=remaining)
+                else:
+                    request = self._queue.get_nowait()  # Still take what queued up meanwhile
+            except queue.Empty:
+                break
+            if request is _STOP or size + len(request[0]) > self.max_batch_pairs:
+                self._carry = request
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            pairs = [pair for request_pairs, _ in batch for pair in request_pairs]
+            started = time.perf_counter()
+            try:
+                scores = np.asarray(
+                    self.model.predict(pairs, show_progress_bar=False), dtype=np.float32
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for request_pairs, future in batch:
+                future.set_result(scores[start : start + len(request_pairs)])
+                start += len(request_pairs)
+            with self._lock:
+                self.requests += len(batch)
+                self.batches += 1
+                self.pairs += len(pairs)
+            logger.debug(
+                f"Re-ranked {len(pairs)} pairs from {len(batch)} request(s) in one batch in {time.perf_counter() - started:.3f}s."
+            )
+
+    def stats(self):
+        """Requests served, forward passes run and pairs scored since creation."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "pairs": self.pairs,
+                "requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            }
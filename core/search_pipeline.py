@@ -1,17 +1,353 @@
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import numpy as np
 import streamlit as st
-from rank_bm25 import BM25Okapi
+from scipy import sparse
 from sentence_transformers import CrossEncoder
-from .config import K_SEMANTIC, K_BM25, K_RRF_PARAM
+from .config import (
+    K_SEMANTIC,
+    K_BM25,
+    K_RRF_PARAM,
+    BM25_COMPACTION_RATIO,
+    SEMANTIC_SEARCH_TIMEOUT_SECONDS,
+    BM25_SEARCH_TIMEOUT_SECONDS,
+    RERANK_CASCADE_SCORE_RATIO,
+    RERANK_CASCADE_AUDIT_RATE,
+)
+from .analyzer import analyze
 from .logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# Threads shared by all sessions for concurrent retrieval (see _get_retrieval_pool)
+RETRIEVAL_POOL_WORKERS = 8
+
+
+class IncrementalBM25:
+    """
+    BM25 index (same scoring as rank_bm25.BM25Okapi) that supports adding and
+    deleting documents without rebuilding.
+
+    Document frequencies, document lengths and the total length are updated in
+    O(terms of the changed documents). New postings go to a small pending list;
+    deleted documents are tombstoned. Both are merged into the CSR posting matrix
+    (terms x slots, raw term counts) once they exceed `compaction_ratio` of it.
+
+    For scoring, the posting matrix is turned into a CSR matrix of BM25 weights
+    (each entry a term's full contribution to one document, IDF and length
+    normalization included), rebuilt lazily after a change so it always reflects
+    the current corpus. A query is then scored as one sparse product of its term
+    counts with that matrix, touching only documents that contain a query term;
+    only the few pending postings are weighted per query term.
+
+    Mirrors NumpyVectorStore: documents are stored by id, and get_scores()
+    returns one score per slot, aligned with `documents`, where deleted slots
+    hold None and always score 0.
+    """
+
+    def __init__(self, k1=1.5, b=0.75, epsilon=0.25, compaction_ratio=BM25_COMPACTION_RATIO):
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.compaction_ratio = compaction_ratio
+        self.documents = []  # Per slot; None once deleted
+        self._ids = []
+        self._slot_by_id = {}
+        self._term_freqs = []  # Per slot {term: count}; None once deleted
+        self._doc_len = []
+        self._deleted_count = 0
+        self._total_len = 0
+        self._vocabulary = {}  # term -> term id (row of the posting matrix)
+        self._df = []  # Live documents containing each term id
+        self._postings = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self._pending = {}  # term id -> ([slots], [counts]) not yet in _postings
+        self._pending_count = 0
+        self._scoring_arrays = None  # (idf, doc lengths, deleted mask, weights); reset by every change
+
+    def __len__(self):
+        return len(self.documents) - self._deleted_count
+
+    @property
+    def corpus_size(self):
+        return len(self)
+
+    @property
+    def avgdl(self):
+        return self._total_len / len(self) if len(self) else 0.0
+
+    def add_documents(self, documents, term_freqs, ids):
+        """
+        Appends documents with their per-document {term: count} dicts. An id that
+        is already indexed is replaced: its previous slot is tombstoned. Returns `ids`.
+        """
+        if not (len(documents) == len(term_freqs) == len(ids)):
+            raise ValueError(
+                f"Got {len(documents)} documents, {len(term_freqs)} term counts and {len(ids)} ids."
+            )
+        for document, frequencies, doc_id in zip(documents, term_freqs, ids):
+            previous = self._slot_by_id.get(doc_id)
+            if previous is not None:
+                self._tombstone(previous)
+            slot = len(self.documents)
+            self.documents.append(document)
+            self._ids.append(doc_id)
+            self._slot_by_id[doc_id] = slot
+            self._term_freqs.append(frequencies)
+            length = sum(frequencies.values())
+            self._doc_len.append(length)
+            self._total_len += length
+            for term, count in frequencies.items():
+                term_id = self._vocabulary.setdefault(term, len(self._vocabulary))
+                if term_id == len(self._df):
+                    self._df.append(0)
+                self._df[term_id] += 1
+                slots, counts = self._pending.setdefault(term_id, ([], []))
+                slots.append(slot)
+                counts.append(count)
+                self._pending_count += 1
+        self._scoring_arrays = None
+        if (
+            self._pending_count > self.compaction_ratio * self._postings.nnz
+            or self._deleted_count > self.compaction_ratio * len(self.documents)
+        ):
+            self.compact()
+        return list(ids)
+
+    def _tombstone(self, slot):
+        """Removes a slot's document from the corpus statistics; its postings are dropped on compaction."""
+        for term in self._term_freqs[slot]:
+            self._df[self._vocabulary[term]] -= 1
+        self._total_len -= self._doc_len[slot]
+        self._term_freqs[slot] = None
+        self.documents[slot] = None
+        self._deleted_count += 1
+
+    def delete(self, ids):
+        """Tombstones the documents with the given ids. Unknown ids are ignored. Returns True if all were found."""
+        found = 0
+        for doc_id in ids:
+            slot = self._slot_by_id.pop(doc_id, None)
+            if slot is None:
+                continue
+            self._tombstone(slot)
+            found += 1
+        self._scoring_arrays = None
+        if self._deleted_count > self.compaction_ratio * len(self.documents):
+            self.compact()
+        return bool(ids) and found == len(ids)
+
+    def compact(self):
+        """
+        Rebuilds the posting matrix from the live documents: drops tombstoned slots
+        and terms no live document uses, and merges pending postings. Slots are
+        renumbered, so `documents` is replaced by a new list.
+        """
+        live = [slot for slot, frequencies in enumerate(self._term_freqs) if frequencies is not None]
+        self.documents = [self.documents[slot] for slot in live]
+        self._ids = [self._ids[slot] for slot in live]
+        self._slot_by_id = {doc_id: slot for slot, doc_id in enumerate(self._ids)}
+        self._term_freqs = [self._term_freqs[slot] for slot in live]
+        self._doc_len = [self._doc_len[slot] for slot in live]
+        self._deleted_count = 0
+
+        self._vocabulary = {}
+        self._df = []
+        rows, cols, counts = [], [], []
+        for slot, frequencies in enumerate(self._term_freqs):
+            for term, count in frequencies.items():
+                term_id = self._vocabulary.setdefault(term, len(self._vocabulary))
+                if term_id == len(self._df):
+                    self._df.append(0)
+                self._df[term_id] += 1
+                rows.append(term_id)
+                cols.append(slot)
+                counts.append(count)
+        self._postings = sparse.csr_matrix(
+            (np.array(counts, dtype=np.float64), (rows, cols)),
+            shape=(len(self._vocabulary), len(self.documents)),
+        )
+        self._pending = {}
+        self._pending_count = 0
+        self._scoring_arrays = None
+        logger.debug(
+            f"Compacted BM25 index: {len(self.documents)} documents, {len(self._vocabulary)} terms."
+        )
+
+    def _weights(self, idf, doc_len, term_ids, slots, counts):
+        """BM25 contribution of each (term id, slot, count) posting."""
+        length_norm = 1 - self.b + self.b * doc_len[slots] / self.avgdl
+        return idf[term_ids] * (counts * (self.k1 + 1) / (counts + self.k1 * length_norm))
+
+    def _get_scoring_arrays(self):
+        """
+        IDF per term id for the live corpus (with BM25Okapi's epsilon floor), document
+        lengths and the tombstone mask per slot, and the posting matrix as BM25
+        weights. Rebuilt lazily after a change.
+        """
+        if self._scoring_arrays is None:
+            df = np.array(self._df, dtype=np.float64)
+            present = df > 0
+            idf = np.zeros(len(df))
+            idf[present] = np.log(len(self) - df[present] + 0.5) - np.log(df[present] + 0.5)
+            if present.any():
+                average_idf = idf[present].sum() / present.sum()
+                idf[present & (idf < 0)] = self.epsilon * average_idf
+            doc_len = np.array(self._doc_len, dtype=np.float64)
+            deleted = np.array([frequencies is None for frequencies in self._term_freqs], dtype=bool)
+            weights = self._postings.copy()
+            if weights.nnz and len(self):
+                term_ids = np.repeat(np.arange(weights.shape[0]), np.diff(weights.indptr))
+                weights.data = self._weights(idf, doc_len, term_ids, weights.indices, weights.data)
+            self._scoring_arrays = (idf, doc_len, deleted, weights)
+        return self._scoring_arrays
+
+    def term_statistics(self):
+        """
+        Corpus statistics per vocabulary term, for keyword extraction: (terms,
+        total count over the live documents, number of live documents containing
+        it). Counts are NumPy arrays aligned with `terms`.
+        """
+        _, _, deleted, _ = self._get_scoring_arrays()
+        live = (~deleted).astype(np.float64)
+        counts = np.zeros(len(self._vocabulary))
+        merged_terms, merged_slots = self._postings.shape
+        if merged_terms:
+            counts[:merged_terms] = self._postings @ live[:merged_slots]
+        for term_id, (slots, pending_counts) in self._pending.items():
+            counts[term_id] += np.dot(np.asarray(pending_counts, dtype=np.float64), live[slots])
+        return list(self._vocabulary), counts, np.array(self._df, dtype=np.float64)
+
+    def term_frequencies(self, ids):
+        """The {term: count} dict of each document in `ids`. Raises KeyError for unknown ids."""
+        return [self._term_freqs[self._slot_by_id[doc_id]] for doc_id in ids]
+
+    def memory_bytes(self):
+        """
+        Approximate bytes held by the index: the posting matrix and its BM25
+        weights, pending postings, each document's term counts (kept for copying
+        and compaction) and the vocabulary. Document text is not included.
+        """
+        matrices = [self._postings]
+        if self._scoring_arrays is not None:
+            matrices.append(self._scoring_arrays[3])
+        postings = sum(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes for matrix in matrices)
+        pending = sum(
+            sys.getsizeof(slots) + sys.getsizeof(counts) for slots, counts in self._pending.values()
+        )
+        term_freqs = sum(sys.getsizeof(frequencies) for frequencies in self._term_freqs if frequencies)
+        vocabulary = sys.getsizeof(self._vocabulary) + sum(len(term) for term in self._vocabulary)
+        return postings + pending + term_freqs + vocabulary
+
+    def get_scores(self, query):
+        """BM25 score per slot for the tokenized `query`; deleted slots score 0."""
+        scores = np.zeros(len(self.documents))
+        if not len(self):
+            return scores
+        idf, doc_len, deleted, weights = self._get_scoring_arrays()
+        query_counts = {}
+        for term in query:
+            term_id = self._vocabulary.get(term)
+            if term_id is not None:
+                query_counts[term_id] = query_counts.get(term_id, 0) + 1
+        merged_terms, merged_slots = weights.shape
+        merged = [term_id for term_id in query_counts if term_id < merged_terms]
+        if merged:
+            query_vector = sparse.csr_matrix(
+                ([query_counts[term_id] for term_id in merged], ([0] * len(merged), merged)),
+                shape=(1, merged_terms),
+                dtype=np.float64,
+            )
+            scores[:merged_slots] = (query_vector @ weights).toarray().ravel()
+        for term_id, query_count in query_counts.items():
+            if term_id in self._pending:
+                slots, counts = self._pending[term_id]
+                slots = np.asarray(slots, dtype=np.int64)
+                counts = np.asarray(counts, dtype=np.float64)
+                np.add.at(
+                    scores, slots, query_count * self._weights(idf, doc_len, term_id, slots, counts)
+                )
+        if self._deleted_count:
+            scores[deleted] = 0.0
+        return scores
+
+
+def top_positive_indices(scores, k):
+    """
+    Indices of the `k` highest positive scores, best first (ties by lower index).
+    argpartition finds the cut-off in linear time; only the winners are sorted.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    candidates = np.flatnonzero(scores > 0)
+    if k <= 0 or not len(candidates):
+        return []
+    if len(candidates) > k:
+        kth_score = np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k]
+        candidates = candidates[scores[candidates] >= kth_score]  # Keeps ties at the cut-off
+    order = np.lexsort((candidates, -scores[candidates]))[:k]
+    return candidates[order].tolist()
+
+
+@st.cache_resource(show_spinner=False)
+def _get_retrieval_pool():
+    """
+    Thread pool shared by all sessions for running retrievers concurrently. A
+    retriever that times out keeps its thread until it returns, so the pool is
+    sized for a few stuck calls without starving new queries.
+    """
+    return ThreadPoolExecutor(max_workers=RETRIEVAL_POOL_WORKERS, thread_name_prefix="retrieve")
+
+
+def _semantic_search(query, document_vector_db):
+    """Embeds the query (an Ollama round trip) and scores it against the vector store."""
+    semantic_docs = document_vector_db.similarity_search(query, k=K_SEMANTIC)
+    logger.info(f"Semantic search found {len(semantic_docs)} results.")
+    return semantic_docs
+
+
+def _bm25_search(query, bm25_index, bm25_corpus_chunks):
+    """Scores the analyzed query with BM25 and returns the top chunks with positive scores."""
+    tokenized_query = analyze(query)
+    all_doc_scores = bm25_index.get_scores(tokenized_query)
+
+    num_bm25_chunks = len(bm25_corpus_chunks)
+    num_docs_to_consider = min(K_BM25, num_bm25_chunks)
+
+    top_n_indices = top_positive_indices(all_doc_scores, num_docs_to_consider)
+    bm25_retrieved_chunks = [bm25_corpus_chunks[i] for i in top_n_indices]
+    logger.info(
+        f"BM25 search found {len(bm25_retrieved_chunks)} results with positive scores."
+    )
+    return bm25_retrieved_chunks
+
+
+def _collect_result(future, deadline, retriever_name):
+    """
+    Waits for a retriever until its deadline. Errors and timeouts are reported
+    here, on the calling thread, where Streamlit messages can be shown; either
+    way the search degrades to the other retriever's results.
+    """
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        future.cancel()
+        user_message = f"The {retriever_name} search timed out; using the other search results only."
+        logger.warning(user_message)
+        st.warning(user_message)
+    except Exception as e:
+        user_message = f"An error occurred during {retriever_name} search."
+        logger.exception(f"{user_message} Details: {e}")
+        st.error(f"{user_message} Check logs for details.")
+    return []
+
 
 def find_related_documents(
     query, document_vector_db, bm25_index, bm25_corpus_chunks, document_processed_flag
 ):
     """
     Perform both semantic and BM25 search to find related document chunks.
+    The two retrievers run concurrently, each with its own timeout, so a slow
+    query embedding falls back to BM25-only results instead of blocking.
     Returns a dictionary with 'semantic_results' and 'bm25_results'.
     """
     semantic_docs = []
@@ -37,72 +373,57 @@ def find_related_documents(
             "bm25_results": bm25_retrieved_chunks,
         }
 
+    pool = _get_retrieval_pool()
+    started = time.monotonic()
+
     # 1. Semantic Search (Vector Search)
     logger.debug(f"Performing semantic search for query: '{query[:50]}...'")
-    try:
-        semantic_docs = document_vector_db.similarity_search(query, k=K_SEMANTIC)
-        logger.info(f"Semantic search found {len(semantic_docs)} results.")
-    except Exception as e:
-        user_message = "An error occurred during semantic search."
-        logger.exception(f"{user_message} Details: {e}")
-        st.error(f"{user_message} Check logs for details.")
-        semantic_docs = []
+    semantic_future = pool.submit(_semantic_search, query, document_vector_db)
 
     # 2. BM25 Search
+    bm25_future = None
     if bm25_index and bm25_corpus_chunks:
         logger.debug(f"Performing BM25 search for query: '{query[:50]}...'")
-        try:
-            tokenized_query = query.lower().split(" ")
-            all_doc_scores = bm25_index.get_scores(tokenized_query)
-
-            num_bm25_chunks = len(bm25_corpus_chunks)
-            num_docs_to_consider = min(K_BM25, num_bm25_chunks)
-
-            top_n_indices = sorted(
-                [i for i, score in enumerate(all_doc_scores) if score > 0],
-                key=lambda i: all_doc_scores[i],
-                reverse=True,
-            )[:num_docs_to_consider]
-
-            bm25_retrieved_chunks = [bm25_corpus_chunks[i] for i in top_n_indices]
-            logger.info(
-                f"BM25 search found {len(bm25_retrieved_chunks)} results with positive scores."
-            )
-        except Exception as e:
-            user_message = "An error occurred during BM25 search."
-            logger.exception(f"{user_message} Details: {e}")
-            st.error(f"{user_message} Check logs for details.")
-            bm25_retrieved_chunks = []
+        bm25_future = pool.submit(_bm25_search, query, bm25_index, bm25_corpus_chunks)
     else:
         logger.info("BM25 index not available. Skipping BM25 search.")
-        bm25_retrieved_chunks = []
+
+    semantic_docs = _collect_result(
+        semantic_future, started + SEMANTIC_SEARCH_TIMEOUT_SECONDS, "semantic"
+    )
+    if bm25_future is not None:
+        bm25_retrieved_chunks = _collect_result(
+            bm25_future, started + BM25_SEARCH_TIMEOUT_SECONDS, "BM25"
+        )
+    logger.debug(f"Retrieval finished in {time.monotonic() - started:.3f}s.")
 
     return {"semantic_results": semantic_docs, "bm25_results": bm25_retrieved_chunks}
 
 
+def reciprocal_rank_scores(search_results_dict):
+    """
+    RRF score of each retrieved chunk, keyed by its text and summed over the
+    semantic and BM25 rankings, in first-seen order.
+    """
+    doc_to_score = {}
+    for results_key in ("semantic_results", "bm25_results"):
+        for i, doc in enumerate(search_results_dict.get(results_key, [])):
+            score = 1.0 / (K_RRF_PARAM + i + 1)
+            doc_to_score[doc.page_content] = doc_to_score.get(doc.page_content, 0) + score
+    return doc_to_score
+
+
 def combine_results_rrf(search_results_dict):
     """
     Combines search results from different methods using Reciprocal Rank Fusion (RRF).
     """
-    doc_to_score = {}
     doc_objects = {}
-
     semantic_results = search_results_dict.get("semantic_results", [])
-    for i, doc in enumerate(semantic_results):
-        doc_id = doc.page_content
-        if doc_id not in doc_objects:
-            doc_objects[doc_id] = doc
-        score = 1.0 / (K_RRF_PARAM + i + 1)
-        doc_to_score[doc_id] = doc_to_score.get(doc_id, 0) + score
-
     bm25_results = search_results_dict.get("bm25_results", [])
-    for i, doc in enumerate(bm25_results):
-        doc_id = doc.page_content
-        if doc_id not in doc_objects:
-            doc_objects[doc_id] = doc
-        score = 1.0 / (K_RRF_PARAM + i + 1)
-        doc_to_score[doc_id] = doc_to_score.get(doc_id, 0) + score
+    for doc in semantic_results + bm25_results:
+        doc_objects.setdefault(doc.page_content, doc)
 
+    doc_to_score = reciprocal_rank_scores(search_results_dict)
     sorted_doc_ids = sorted(
         doc_to_score.keys(), key=lambda x: doc_to_score[x], reverse=True
     )
@@ -143,3 +464,108 @@ def rerank_documents(query: str, documents: list, model: CrossEncoder, top_n: in
     scored_documents.sort(key=lambda x: x[0], reverse=True)
     reranked_docs = [doc for score, doc in scored_documents[:top_n]]
     return reranked_docs
+
+
+class CascadeStats:
+    """
+    Process-wide counters for cascade re-ranking: how many candidates were
+    pruned before the cross-encoder, and, for audited queries, how much of the
+    full re-ranking's top N the cascade still returned.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.candidates = 0
+        self.pruned = 0
+        self.audited_queries = 0
+        self.audited_recall_total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, candidates, pruned):
+        with self._lock:
+            self.queries += 1
+            self.candidates += candidates
+            self.pruned += pruned
+
+    def record_audit(self, recall):
+        with self._lock:
+            self.audited_queries += 1
+            self.audited_recall_total += recall
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "candidates": self.candidates,
+                "pruned": self.pruned,
+                "pruned_rate": self.pruned / self.candidates if self.candidates else 0.0,
+                "audited_queries": self.audited_queries,
+                "audited_recall": (
+                    self.audited_recall_total / self.audited_queries
+                    if self.audited_queries
+                    else None
+                ),
+            }
+
+
+cascade_stats = CascadeStats()
+
+
+def prune_rerank_candidates(documents, first_stage_scores, top_n, score_ratio):
+    """
+    Splits RRF-ordered `documents` into (kept, pruned). A candidate is pruned when
+    its first-stage score is below `score_ratio` times the score of the `top_n`-th
+    candidate, i.e. it trails the context cut-off by a wide margin. The first
+    `top_n` candidates are always kept.
+    """
+    if score_ratio <= 0 or len(documents) <= top_n:
+        return list(documents), []
+    scores = [first_stage_scores.get(doc.page_content, 0.0) for doc in documents]
+    threshold = score_ratio * scores[top_n - 1]
+    kept = list(documents[:top_n])
+    pruned = []
+    for doc, score in zip(documents[top_n:], scores[top_n:]):
+        (kept if score >= threshold else pruned).append(doc)
+    return kept, pruned
+
+
+def cascade_rerank_documents(
+    query,
+    documents,
+    search_results_dict,
+    model,
+    top_n,
+    score_ratio=RERANK_CASCADE_SCORE_RATIO,
+    audit_rate=RERANK_CASCADE_AUDIT_RATE,
+):
+    """
+    Re-ranks `documents` (hybrid search results, best first) in two stages: the
+    RRF scores from `search_results_dict` prune candidates that are unlikely to
+    reach the top `top_n`, and only the survivors are scored by the cross-encoder.
+    With probability `audit_rate` the pruned candidates are scored as well, to
+    measure how often pruning changed the final context (see `cascade_stats`).
+    """
+    if model is None or score_ratio <= 0:
+        return rerank_documents(query, documents, model, top_n)
+
+    kept, pruned = prune_rerank_candidates(
+        documents, reciprocal_rank_scores(search_results_dict), top_n, score_ratio
+    )
+    cascade_stats.record(len(documents), len(pruned))
+    if pruned:
+        logger.info(
+            f"Cascade pruned {len(pruned)} of {len(documents)} candidates before re-ranking."
+        )
+    reranked_docs = rerank_documents(query, kept, model, top_n)
+
+    if pruned and audit_rate > 0 and random.random() < audit_rate:
+        # Survivors' scores are usually served from the reranker's score cache
+        full_reranked_docs = rerank_documents(query, kept + pruned, model, top_n)
+        expected = {doc.page_content for doc in full_reranked_docs}
+        found = {doc.page_content for doc in reranked_docs}
+        recall = len(expected & found) / len(expected) if expected else 1.0
+        cascade_stats.record_audit(recall)
+        logger.info(
+            f"Cascade audit: recall@{top_n} {recall:.2f} versus re-ranking all {len(documents)} candidates."
+        )
+    return reranked_docs
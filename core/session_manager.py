@@ -1,6 +1,7 @@
 import streamlit as st
-from langchain_core.vectorstores import InMemoryVectorStore
 from .model_loader import get_embedding_model
+from .corpus_registry import Corpus, corpus_registry
+from .answer_cache import corpus_version
 from .logger_config import get_logger
 
 logger = get_logger(__name__)
@@ -10,8 +11,12 @@ def initialize_session_state():
     """
     Initializes the session state variables if they don't exist.
     """
+    if "corpus" not in st.session_state:
+        st.session_state.corpus = Corpus(get_embedding_model())
+    if "corpus_handle" not in st.session_state:
+        st.session_state.corpus_handle = None  # Set while the corpus is registered and shared
     if "DOCUMENT_VECTOR_DB" not in st.session_state:
-        st.session_state.DOCUMENT_VECTOR_DB = InMemoryVectorStore(get_embedding_model())
+        st.session_state.DOCUMENT_VECTOR_DB = st.session_state.corpus.vector_db
     if "messages" not in st.session_state:
         st.session_state.messages = []
     if "document_processed" not in st.session_state:
@@ -30,6 +35,28 @@ def initialize_session_state():
         st.session_state.bm25_index = None
     if "bm25_corpus_chunks" not in st.session_state:
         st.session_state.bm25_corpus_chunks = []
+    if "indexed_files" not in st.session_state:
+        st.session_state.indexed_files = {}
+    if "failed_uploads" not in st.session_state:
+        st.session_state.failed_uploads = []
+    if "corpus_version" not in st.session_state:
+        st.session_state.corpus_version = None
+    if "evicted_corpus_version" not in st.session_state:
+        st.session_state.evicted_corpus_version = None  # Set while documents are unloaded, see evict_documents
+
+
+def _release_corpus():
+    """Gives up the session's reference to a shared corpus, if it holds one."""
+    handle = st.session_state.get("corpus_handle")
+    if handle is not None:
+        handle.release()
+    st.session_state.corpus_handle = None
+
+
+def _use_corpus(corpus):
+    st.session_state.corpus = corpus
+    st.session_state.DOCUMENT_VECTOR_DB = corpus.vector_db
+    st.session_state.bm25_index = corpus.bm25_index
 
 
 def reset_document_states(clear_chat=True):
@@ -37,7 +64,8 @@ def reset_document_states(clear_chat=True):
     Resets all document-related session state variables.
     Optionally clears chat history.
     """
-    st.session_state.DOCUMENT_VECTOR_DB = InMemoryVectorStore(get_embedding_model())
+    _release_corpus()
+    _use_corpus(Corpus(get_embedding_model()))
     st.session_state.document_processed = False
     if clear_chat:
         st.session_state.messages = []
@@ -48,9 +76,175 @@ def reset_document_states(clear_chat=True):
     st.session_state.document_keywords = None
     st.session_state.bm25_index = None
     st.session_state.bm25_corpus_chunks = []
+    st.session_state.indexed_files = {}
+    st.session_state.failed_uploads = []
+    st.session_state.corpus_version = None
+    st.session_state.evicted_corpus_version = None
     logger.info("Document states reset.")
 
 
+def use_shared_corpus(files):
+    """
+    Switches the session to the corpus of exactly these files ({filename: file
+    hash}) if another session has already indexed them, so nothing needs to be
+    parsed, embedded or indexed. Returns True if it did.
+    Call refresh_document_views() afterwards.
+    """
+    handle = corpus_registry.acquire(corpus_version(list(files.values())))
+    if handle is None:
+        return False
+    _release_corpus()
+    _use_corpus(handle.corpus)
+    st.session_state.corpus_handle = handle
+    st.session_state.indexed_files = {
+        filename: handle.corpus.files[file_hash] for filename, file_hash in files.items()
+    }
+    logger.info(f"Using the shared index of {len(files)} file(s) built by another session.")
+    return True
+
+
+def make_corpus_private(exclude_file_hashes=()):
+    """
+    Makes sure the session's corpus can be changed without affecting other
+    sessions. A corpus no other session uses is taken out of the registry; a
+    shared one is copied (from its stored vectors, nothing is re-embedded),
+    leaving out `exclude_file_hashes`. Call before changing the indexed files.
+    """
+    handle = st.session_state.get("corpus_handle")
+    if handle is None:
+        return
+    if not corpus_registry.detach(handle):
+        file_hashes = [h for h in handle.corpus.files if h not in exclude_file_hashes]
+        _use_corpus(handle.corpus.copy(file_hashes))
+        handle.release()
+        logger.info(f"Copied the shared index of {len(file_hashes)} file(s) to change this session's files.")
+    st.session_state.corpus_handle = None
+
+
+def add_indexed_file(filename, file_hash, raw_documents, chunks, chunk_ids, bm25_term_freqs, surface_forms=None):
+    """
+    Records a file whose chunks were added to the vector store, so it can later be
+    removed on its own, and appends its chunks to the BM25 index under the same ids.
+    `surface_forms` are the words behind its stemmed BM25 terms, for keywords.
+    Call refresh_document_views() once all changes are made.
+    """
+    make_corpus_private()
+    corpus = st.session_state.corpus
+    try:
+        record = corpus.add_file(file_hash, raw_documents, chunks, chunk_ids, bm25_term_freqs, surface_forms)
+    except Exception as e:
+        logger.exception(f"Failed to create BM25 index for documents ({filename}).")
+        st.error(
+            f"Failed to create BM25 index for documents ({filename}). Vector indexing may still be active. Details: {e}"
+        )
+        record = corpus.files[file_hash]
+    st.session_state.indexed_files[filename] = record
+    logger.debug(f"Registered '{filename}' with {len(chunk_ids)} indexed chunks.")
+
+
+def link_indexed_file(filename, file_hash):
+    """
+    Records `filename` as another name for content the session has already
+    indexed. Returns False if the content isn't indexed yet.
+    """
+    record = st.session_state.corpus.files.get(file_hash)
+    if record is None:
+        return False
+    st.session_state.indexed_files[filename] = record
+    logger.debug(f"'{filename}' has the same content as an indexed file; not indexed again.")
+    return True
+
+
+def remove_indexed_files(filenames):
+    """
+    Removes files from the session. Their chunks are tombstoned in the vector store
+    and the BM25 index; chunks of the remaining files are left untouched.
+    """
+    removed = [filename for filename in filenames if filename in st.session_state.indexed_files]
+    if not removed:
+        return
+    remaining_hashes = {
+        record["file_hash"]
+        for filename, record in st.session_state.indexed_files.items()
+        if filename not in removed
+    }
+    # Content still loaded under another name stays indexed
+    removed_hashes = {
+        st.session_state.indexed_files[filename]["file_hash"] for filename in removed
+    } - remaining_hashes
+    make_corpus_private(exclude_file_hashes=removed_hashes)
+    for filename in removed:
+        record = st.session_state.indexed_files.pop(filename)
+        if record["file_hash"] in removed_hashes:
+            st.session_state.corpus.remove_file(record["file_hash"])
+        logger.info(f"Removed '{filename}' ({len(record['chunk_ids'])} chunks) from the session.")
+
+
+def evict_documents(state):
+    """
+    Unloads a session's documents to free memory; its chat, summary and keywords
+    are kept. `state` is the session's state, possibly another session's. The
+    files are still in the session's file uploader and their indexes on disk, so
+    its next run loads them again like new uploads, without re-embedding (and
+    shares the corpus if another session still has it loaded).
+    """
+    handle = state["corpus_handle"]
+    corpus = Corpus(state["corpus"].vector_db.embedding)
+    state["evicted_corpus_version"] = state["corpus_version"]
+    state["corpus"] = corpus
+    state["corpus_handle"] = None
+    state["DOCUMENT_VECTOR_DB"] = corpus.vector_db
+    state["bm25_index"] = None
+    state["bm25_corpus_chunks"] = []
+    state["raw_documents"] = []
+    state["indexed_files"] = {}
+    state["uploaded_filenames"] = []
+    state["document_processed"] = False
+    state["corpus_version"] = None
+    if handle is not None:
+        handle.release()
+
+
+def refresh_document_views():
+    """
+    Registers the session's corpus, so other sessions loading the same files can
+    share it, and rebuilds the session state derived from it: filenames, raw
+    documents, the chunk list aligned with the BM25 index's slots and the corpus
+    version. Summary and keywords are cleared because they describe the previous
+    set of documents, unless the documents were just reloaded after eviction.
+    """
+    corpus = st.session_state.corpus
+    version = corpus_version(list(corpus.files))
+    if st.session_state.get("corpus_handle") is None and version is not None:
+        handle = corpus_registry.register(version, corpus)
+        st.session_state.corpus_handle = handle
+        corpus = handle.corpus  # Another session's, if it registered these files first
+        st.session_state.indexed_files = {
+            filename: corpus.files[record["file_hash"]]
+            for filename, record in st.session_state.indexed_files.items()
+        }
+    _use_corpus(corpus)
+    st.session_state.corpus_version = version
+    reloaded = version is not None and version == st.session_state.get("evicted_corpus_version")
+    st.session_state.evicted_corpus_version = None
+
+    records = corpus.files.values()
+    st.session_state.uploaded_filenames = list(st.session_state.indexed_files)
+    st.session_state.raw_documents = [
+        doc for record in records for doc in record["raw_documents"]
+    ]
+    bm25_index = corpus.bm25_index if len(corpus.bm25_index) else None
+    st.session_state.bm25_index = bm25_index
+    st.session_state.bm25_corpus_chunks = bm25_index.documents if bm25_index is not None else []
+    st.session_state.document_processed = len(st.session_state.DOCUMENT_VECTOR_DB) > 0
+    if not reloaded:
+        st.session_state.document_summary = None
+        st.session_state.document_keywords = None
+    logger.info(
+        f"Session documents: {len(st.session_state.uploaded_filenames)} file(s), {len(bm25_index) if bm25_index is not None else 0} BM25 chunks."
+    )
+
+
 def reset_file_uploader():
     """Increments the key for the file uploader to reset it."""
     st.session_state.uploaded_file_key += 1
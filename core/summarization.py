@@ -0,0 +1,163 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from langchain_core.prompts import ChatPromptTemplate
+from .cache import LRUCache
+from .config import (
+    OLLAMA_LLM_NAME,
+    SUMMARIZATION_PROMPT_TEMPLATE,
+    SUMMARY_REDUCE_PROMPT_TEMPLATE,
+    SUMMARY_CHUNK_GROUP_CHARS,
+    SUMMARY_MAX_WORKERS,
+    SUMMARY_CACHE_SIZE,
+)
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Reasoning models (e.g. deepseek-r1) prefix answers with their chain of thought;
+# it must not be fed into the next level of summaries.
+THINK_BLOCK_PATTERN = re.compile(r"<think>.*?</think>", re.DOTALL)
+
+# Summary of each file by (LLM name, file content hash, group size), shared by all
+# sessions, so adding a file to a summarized set only summarizes the new file.
+file_summary_cache = LRUCache(SUMMARY_CACHE_SIZE)
+
+
+def group_texts(texts, max_chars):
+    """
+    Packs consecutive texts into groups whose joined length stays within
+    `max_chars`. A text longer than `max_chars` gets a group of its own.
+    """
+    groups = []
+    current, current_chars = [], 0
+    for text in texts:
+        if current and current_chars + len(text) > max_chars:
+            groups.append(current)
+            current, current_chars = [], 0
+        current.append(text)
+        current_chars += len(text) + 2  # "\n\n" separator
+    if current:
+        groups.append(current)
+    return groups
+
+
+class _Summarizer:
+    """Runs map and reduce prompts for one summarize_documents call on a bounded thread pool."""
+
+    def __init__(self, language_model, executor, max_chars):
+        self.map_chain = (
+            ChatPromptTemplate.from_template(SUMMARIZATION_PROMPT_TEMPLATE) | language_model
+        )
+        self.reduce_chain = (
+            ChatPromptTemplate.from_template(SUMMARY_REDUCE_PROMPT_TEMPLATE) | language_model
+        )
+        self.executor = executor
+        self.max_chars = max_chars
+        self.calls = 0
+
+    def _summarize_groups(self, chain, groups):
+        """Summarizes each group of texts concurrently; returns the summaries in order."""
+        futures = [
+            self.executor.submit(chain.invoke, {"document_text": "\n\n".join(group)})
+            for group in groups
+        ]
+        self.calls += len(futures)
+        return [THINK_BLOCK_PATTERN.sub("", future.result()).strip() for future in futures]
+
+    def reduce(self, summaries):
+        """Merges summaries level by level until one is left."""
+        summaries = [summary for summary in summaries if summary]
+        while len(summaries) > 1:
+            groups = group_texts(summaries, self.max_chars)
+            if len(groups) == len(summaries):
+                # Summaries too long to pack together; merge pairs so every level shrinks
+                groups = [summaries[i : i + 2] for i in range(0, len(summaries), 2)]
+            summaries = [
+                summary
+                for summary in self._summarize_groups(self.reduce_chain, groups)
+                if summary
+            ]
+        return summaries[0] if summaries else ""
+
+    def summarize_files(self, texts_per_file):
+        """
+        Summarizes each file's texts. The map prompts of all files run as one
+        concurrent batch; each file's partial summaries are then reduced.
+        """
+        groups_per_file = [group_texts(texts, self.max_chars) for texts in texts_per_file]
+        partial_summaries = self._summarize_groups(
+            self.map_chain, [group for groups in groups_per_file for group in groups]
+        )
+        file_summaries = []
+        start = 0
+        for groups in groups_per_file:
+            file_summaries.append(self.reduce(partial_summaries[start : start + len(groups)]))
+            start += len(groups)
+        return file_summaries
+
+
+def summarize_documents(
+    language_model,
+    files,
+    max_chars=SUMMARY_CHUNK_GROUP_CHARS,
+    max_workers=SUMMARY_MAX_WORKERS,
+):
+    """
+    Summarizes documents of any size with map-reduce. `files` is a list of
+    (file hash, chunks). Each file's chunks are packed into prompts of at most
+    `max_chars` characters and summarized concurrently (at most `max_workers` LLM
+    requests at a time), then the partial summaries are merged in a tree until
+    one is left. File summaries are cached by content hash, and the summaries of
+    all files are merged the same way into the combined summary.
+
+    Returns the summary, None if there is nothing to summarize, or a
+    "Failed to generate summary..." message, like generate_summary.
+    """
+    files = [
+        (file_hash, [chunk.page_content for chunk in chunks if chunk.page_content.strip()])
+        for file_hash, chunks in files
+    ]
+    files = [(file_hash, texts) for file_hash, texts in files if texts]
+    if not files:
+        logger.warning("summarize_documents called with no document text.")
+        st.warning(
+            "Document content is empty or contains only whitespace. Cannot generate summary."
+        )
+        return None
+
+    logger.info(f"Generating map-reduce summary of {len(files)} file(s)...")
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="summarize")
+    summarizer = _Summarizer(language_model, executor, max_chars)
+    try:
+        keys = [(OLLAMA_LLM_NAME, file_hash, max_chars) for file_hash, _ in files]
+        file_summaries = [file_summary_cache.get(key) for key in keys]
+        missing = [index for index, file_summary in enumerate(file_summaries) if file_summary is None]
+        if len(missing) < len(files):
+            logger.info(f"Reusing cached summaries of {len(files) - len(missing)} file(s).")
+        new_summaries = summarizer.summarize_files([files[index][1] for index in missing])
+        for index, file_summary in zip(missing, new_summaries):
+            file_summaries[index] = file_summary
+            if file_summary:
+                file_summary_cache.put(keys[index], file_summary)
+        summary = summarizer.reduce(file_summaries)
+    except Exception as e:
+        user_message = "Failed to generate summary due to an AI model error."
+        logger.exception(f"Error during summary generation: {e}")
+        st.error(
+            f"An error occurred while generating the document summary using the AI model. Details: {e}"
+        )
+        return f"{user_message} Please try again later. (Details: {e})"
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if not summary:
+        logger.warning("AI model returned an empty summary.")
+        st.warning(
+            "The AI model returned an empty summary. The document might be too short or lack clear content for summarization."
+        )
+        return None
+    logger.info(
+        f"Summary generated successfully with {summarizer.calls} LLM call(s) ({len(files)} file(s))."
+    )
+    return summary
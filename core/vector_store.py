@@ -0,0 +1,316 @@
+import uuid
+import numpy as np
+from .config import VECTOR_STORE_COMPACTION_RATIO
+from .logger_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class NumpyVectorStore:
+    """
+    In-memory vector store backed by contiguous float32 NumPy matrices.
+
+    Embeddings are L2-normalized when they are added, so cosine similarity for a
+    query is a matrix-vector product over all rows. Documents and ids are kept in
+    lists parallel to the rows. Implements the subset of the LangChain
+    InMemoryVectorStore interface used by the app (add_documents,
+    similarity_search, delete), so it can be swapped in without touching callers.
+
+    Rows added by this store go into a growable matrix it owns. Read-only
+    matrices of unit-length rows, such as the memory-mapped embeddings of a
+    persisted index segment, are referenced as blocks of rows instead of copied,
+    so every store that adds the same segment shares its pages.
+
+    Deleted rows are only tombstoned and skipped by searches; the rows are
+    compacted once tombstones exceed `compaction_ratio` of them.
+    """
+
+    def __init__(self, embedding, compaction_ratio=VECTOR_STORE_COMPACTION_RATIO):
+        self.embedding = embedding
+        self.compaction_ratio = compaction_ratio
+        self._dimension = None
+        self._blocks = []  # (matrix, shared) of the rows before the ones in self._matrix
+        self._sealed_rows = 0  # Rows in self._blocks
+        self._matrix = None  # Owned rows after the blocks; allocated on demand, grows by doubling
+        self._deleted = None  # Tombstone flag per row
+        self._deleted_count = 0
+        self._size = 0  # Rows in use, including tombstoned ones
+        self._documents = []
+        self._ids = []
+        self._row_by_id = {}
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def __len__(self):
+        """Number of live (not deleted) documents."""
+        return self._size - self._deleted_count
+
+    @property
+    def dimension(self):
+        return self._dimension
+
+    @staticmethod
+    def _normalize(vectors):
+        """Returns a float32 copy of `vectors` with every row scaled to unit length."""
+        matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0  # Leave all-zero vectors as they are
+        matrix /= norms
+        return matrix
+
+    @staticmethod
+    def _is_shareable(vectors):
+        """True for a read-only float32 matrix of unit-length rows, which can be referenced as it is."""
+        if not (
+            isinstance(vectors, np.ndarray)
+            and vectors.ndim == 2
+            and vectors.dtype == np.float32
+            and not vectors.flags.writeable
+        ):
+            return False
+        squared_norms = np.einsum("ij,ij->i", vectors, vectors)
+        return bool(np.all(np.abs(squared_norms - 1.0) < 1e-3))
+
+    def _parts(self):
+        """Yields (first row, matrix, shared) for the blocks and the owned rows, in row order."""
+        start = 0
+        for block, shared in self._blocks:
+            yield start, block, shared
+            start += len(block)
+        if self._size > start:
+            yield start, self._matrix[: self._size - start], False
+
+    def _reserve_flags(self, rows):
+        if self._deleted is None:
+            self._deleted = np.zeros(max(rows, 16), dtype=bool)
+        elif rows > len(self._deleted):
+            grown = np.zeros(max(rows, 2 * len(self._deleted)), dtype=bool)
+            grown[: self._size] = self._deleted[: self._size]
+            self._deleted = grown
+
+    def _reserve(self, extra_rows, dimension):
+        """Makes room for `extra_rows` more owned rows, growing capacity geometrically."""
+        owned_rows = self._size - self._sealed_rows
+        required = owned_rows + extra_rows
+        if self._matrix is None:
+            self._matrix = np.empty((max(required, 16), dimension), dtype=np.float32)
+        elif required > self._matrix.shape[0]:
+            new_capacity = max(required, 2 * self._matrix.shape[0])
+            grown = np.empty((new_capacity, dimension), dtype=np.float32)
+            grown[:owned_rows] = self._matrix[:owned_rows]
+            self._matrix = grown
+        self._reserve_flags(self._size + extra_rows)
+
+    def _add_shared_block(self, vectors):
+        """Appends `vectors` as a block of rows without copying them; owned rows so far become a block too."""
+        owned_rows = self._size - self._sealed_rows
+        if owned_rows:
+            self._blocks.append((self._matrix[:owned_rows], False))
+        self._matrix = None
+        self._blocks.append((vectors, True))
+        self._reserve_flags(self._size + len(vectors))
+        self._size += len(vectors)
+        self._sealed_rows = self._size
+
+    def add_documents(self, documents, ids=None, **kwargs):
+        """
+        Embeds the documents with the configured embedding model and adds them to the store.
+        Returns the list of ids assigned to the added documents.
+        """
+        if not documents:
+            return []
+        texts = [doc.page_content for doc in documents]
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_embeddings(documents, vectors, ids=ids)
+
+    def add_embeddings(self, documents, embeddings, ids=None):
+        """
+        Adds documents with precomputed embeddings (one row per document). A
+        read-only float32 matrix of unit-length rows (e.g. a mapped index segment)
+        is referenced rather than copied. An id that is already stored is replaced: its previous row is tombstoned.
+        Returns the list of ids assigned to the added documents.
+        """
+        if len(documents) != len(embeddings):
+            raise ValueError(
+                f"Got {len(documents)} documents but {len(embeddings)} embeddings."
+            )
+        if ids is not None and len(ids) != len(documents):
+            raise ValueError(f"Got {len(documents)} documents but {len(ids)} ids.")
+        if not documents:
+            return []
+
+        shared = self._is_shareable(embeddings)
+        vectors = embeddings if shared else self._normalize(embeddings)
+        if self.dimension is not None and vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dimension}."
+            )
+        self._dimension = vectors.shape[1]
+
+        if shared:
+            self._add_shared_block(vectors)
+        else:
+            self._reserve(len(documents), vectors.shape[1])
+            owned_rows = self._size - self._sealed_rows
+            self._matrix[owned_rows : owned_rows + len(documents)] = vectors
+            self._size += len(documents)
+
+        new_ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in documents]
+        self._documents.extend(documents)
+        self._ids.extend(new_ids)
+        replaced = 0
+        for row, doc_id in enumerate(new_ids, start=self._size - len(documents)):
+            previous = self._row_by_id.get(doc_id)
+            if previous is not None:
+                self._tombstone(previous)
+                replaced += 1
+            self._row_by_id[doc_id] = row
+        logger.debug(f"Added {len(documents)} vectors ({replaced} replaced); store now holds {self._size}.")
+        if replaced:
+            self._maybe_compact()
+        return new_ids
+
+    def _tombstone(self, row):
+        self._deleted[row] = True
+        self._documents[row] = None  # Release the text; the row is dead
+        self._deleted_count += 1
+
+    def _maybe_compact(self):
+        if self._size and self._deleted_count > self.compaction_ratio * self._size:
+            self.compact()
+
+    def delete(self, ids=None, **kwargs):
+        """
+        Tombstones the documents with the given ids so searches skip them.
+        Unknown ids are ignored. Returns True if every id was found.
+        """
+        if not ids:
+            return False
+        found = 0
+        for doc_id in ids:
+            row = self._row_by_id.pop(doc_id, None)
+            if row is None:
+                continue
+            self._tombstone(row)
+            found += 1
+        logger.debug(
+            f"Deleted {found} of {len(ids)} vectors; {self._deleted_count} tombstones of {self._size} rows."
+        )
+        self._maybe_compact()
+        return found == len(ids)
+
+    def compact(self):
+        """
+        Drops tombstoned rows. Shared blocks without tombstones are kept as they
+        are; the live rows of all others are packed into owned matrices.
+        """
+        if not self._deleted_count:
+            return
+        live = ~self._deleted[: self._size]
+        blocks = []
+        packed = []  # Live rows waiting to be packed into the next owned block
+        kept_rows = []
+        for start, block, shared in self._parts():
+            block_live = live[start : start + len(block)]
+            if shared and block_live.all():
+                if packed:
+                    blocks.append((np.concatenate(packed), False))
+                    packed = []
+                blocks.append((block, True))
+            elif block_live.any():
+                packed.append(block[block_live])
+            kept_rows.extend(start + np.flatnonzero(block_live))
+
+        owned = np.concatenate(packed) if packed else np.empty((0, self._dimension), dtype=np.float32)
+        self._matrix = np.empty((max(len(owned), 16), self._dimension), dtype=np.float32)
+        self._matrix[: len(owned)] = owned
+        self._blocks = blocks
+        self._sealed_rows = sum(len(block) for block, _ in blocks)
+        self._documents = [self._documents[row] for row in kept_rows]
+        self._ids = [self._ids[row] for row in kept_rows]
+        self._row_by_id = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        logger.info(
+            f"Compacted vector store: removed {self._deleted_count} tombstoned rows, {len(kept_rows)} remain."
+        )
+        self._size = len(kept_rows)
+        self._deleted = np.zeros(max(self._size, 16), dtype=bool)
+        self._deleted_count = 0
+
+    def memory_bytes(self):
+        """
+        Bytes held by the owned embedding matrices and the tombstone flags (chunk
+        text not included). Shared blocks are not counted: a mapped segment's
+        pages belong to the OS page cache, shared by every store that adds it.
+        """
+        if self._deleted is None:
+            return 0
+        owned = sum(block.nbytes for block, shared in self._blocks if not shared)
+        if self._matrix is not None:
+            owned += self._matrix.nbytes
+        return owned + self._deleted.nbytes
+
+    def get_vectors(self, ids):
+        """
+        Returns the stored (normalized) embeddings for `ids` as a float32 matrix.
+        Ids whose rows are a contiguous run of a shared block get a read-only view
+        of it, so the rows stay shared when added to another store.
+        """
+        rows = np.array([self._row_by_id[doc_id] for doc_id in ids], dtype=np.int64)
+        if not len(rows):
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        parts = list(self._parts())
+        contiguous = bool(np.all(np.diff(rows) == 1))
+        for start, block, shared in parts:
+            if shared and contiguous and start <= rows[0] and rows[-1] < start + len(block):
+                return block[rows[0] - start : rows[-1] - start + 1]
+        vectors = np.empty((len(rows), self._dimension), dtype=np.float32)
+        part_of_row = np.searchsorted([start for start, _, _ in parts], rows, side="right") - 1
+        for index, (start, block, _) in enumerate(parts):
+            selected = part_of_row == index
+            if selected.any():
+                vectors[selected] = block[rows[selected] - start]
+        return vectors
+
+    def similarity_search(self, query, k=4, **kwargs):
+        """Returns the `k` documents most similar to `query`."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        """Returns (document, cosine similarity) pairs for the `k` best matches to `query`."""
+        if len(self) == 0:
+            return []
+        query_vector = self.embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(query_vector, k=k)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        """Returns the `k` documents most similar to the given query embedding."""
+        return [
+            doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k)
+        ]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        """
+        Scores every stored vector with one matmul and selects the top `k` with
+        argpartition, so only the winners are fully sorted.
+        """
+        if len(self) == 0 or k <= 0:
+            return []
+        query_vector = self._normalize(embedding)[0]
+        if query_vector.shape[0] != self.dimension:
+            raise ValueError(
+                f"Query dimension {query_vector.shape[0]} does not match store dimension {self.dimension}."
+            )
+
+        parts = [np.asarray(block @ query_vector) for _, block, _ in self._parts()]
+        scores = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        if self._deleted_count:
+            scores[self._deleted[: self._size]] = -np.inf
+        k = min(k, len(self))
+        if k < self._size:
+            top_indices = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top_indices = np.arange(self._size)
+        top_indices = top_indices[np.argsort(-scores[top_indices], kind="stable")]
+        return [(self._documents[i], float(scores[i])) for i in top_indices]
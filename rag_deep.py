@@ -1,6 +1,5 @@
 import os
 import streamlit as st
-from rank_bm25 import BM25Okapi
 
 # Configure logging first
 from core.logger_config import setup_logging, get_logger
@@ -16,8 +15,11 @@ from core.config import (
     # K_BM25, # Removed as it's used in core.search_pipeline
     # K_RRF_PARAM, # Removed as it's used in core.search_pipeline
     TOP_K_FOR_RERANKER, # Still used directly in rag_deep.py for slicing
-    FINAL_TOP_N_FOR_CONTEXT, # Still used directly in rag_deep.py for rerank_documents call
+    FINAL_TOP_N_FOR_CONTEXT, # Still used directly in rag_deep.py for cascade_rerank_documents call
     PDF_STORAGE_PATH,
+    KEYWORDS_TOP_N,
+    KEYWORDS_LLM_CANDIDATES,
+    KEYWORDS_LLM_REFINEMENT,
 )
 from core.model_loader import (
     get_embedding_model,
@@ -26,21 +28,38 @@ from core.model_loader import (
 )
 from core.document_processing import (
     save_uploaded_file,
-    load_document,
-    chunk_documents,
     index_documents,
 )
+from core.ingestion import IngestedFile, ingest_files
+from core.index_store import (
+    load_segment,
+    save_segment,
+)
 from core.search_pipeline import (
     find_related_documents,
     combine_results_rrf,
-    rerank_documents,
+    cascade_rerank_documents,
+)
+from core.generation import (
+    stream_answer,
+    refine_keywords,
 )
-from core.generation import generate_answer, generate_summary, generate_keywords
+from core.keywords import extract_keywords
+from core.answer_cache import answer_cache, context_chunk_ids
+from core.context_builder import select_recent_history
+from core.summarization import summarize_documents
 from core.session_manager import (
     initialize_session_state,
     reset_document_states,
     reset_file_uploader,
+    add_indexed_file,
+    link_indexed_file,
+    remove_indexed_files,
+    refresh_document_views,
+    use_shared_corpus,
+    make_corpus_private,
 )
+from core.memory_manager import track_session, end_session_run
 
 # ---------------------------------
 # App Styling with CSS
@@ -98,7 +117,11 @@ st.markdown(
 # Initialize Session State & Models
 # ---------------------------------
 logger.info("Initializing session state.")
+track_session()  # First: idle sessions may be unloaded here if memory is over budget
 initialize_session_state()
+# Set if the documents were unloaded while the session was idle; the upload handling
+# below loads them again from the uploader and the persisted indexes.
+reloading_documents = st.session_state.evicted_corpus_version is not None
 
 logger.info("Loading core models.")
 EMBEDDING_MODEL = get_embedding_model()
@@ -141,10 +164,17 @@ with st.sidebar:
                 with st.spinner(
                     "Generating summary for all documents... This might take a few moments."
                 ):
-                    full_text = "\n\n".join(
-                        [doc.page_content for doc in st.session_state.raw_documents]
-                    )
-                    if not full_text.strip():
+                    # Summarized from the indexed chunks, file by file (see core/summarization.py);
+                    # once per content, even if it was uploaded under several names
+                    files_to_summarize = [
+                        (record["file_hash"], record["chunks"])
+                        for record in st.session_state.corpus.files.values()
+                    ]
+                    if not any(
+                        chunk.page_content.strip()
+                        for _, chunks in files_to_summarize
+                        for chunk in chunks
+                    ):
                         st.sidebar.warning(
                             "Cannot generate summary: Combined content of documents is effectively empty."
                         )
@@ -154,7 +184,9 @@ with st.sidebar:
                         st.session_state.document_summary = None
                     else:
                         logger.info("Generating combined content summary.")
-                        summary_text = generate_summary(LANGUAGE_MODEL, full_text)
+                        summary_text = summarize_documents(
+                            LANGUAGE_MODEL, files_to_summarize
+                        )
                         st.session_state.document_summary = summary_text
                         if "Failed to generate summary" in (summary_text or ""):
                             logger.error(f"Summary generation failed: {summary_text}")
@@ -171,10 +203,17 @@ with st.sidebar:
         ):
             if st.session_state.raw_documents:
                 with st.spinner("Extracting keywords from all documents..."):
-                    full_text = "\n\n".join(
-                        [doc.page_content for doc in st.session_state.raw_documents]
+                    # Ranked from the BM25 index's term statistics (see core/keywords.py)
+                    candidate_keywords = extract_keywords(
+                        st.session_state.bm25_index,
+                        surface_forms=st.session_state.corpus.surface_forms(),
+                        top_n=(
+                            KEYWORDS_LLM_CANDIDATES
+                            if KEYWORDS_LLM_REFINEMENT
+                            else KEYWORDS_TOP_N
+                        ),
                     )
-                    if not full_text.strip():
+                    if not candidate_keywords:
                         st.sidebar.warning(
                             "Cannot extract keywords: Combined content of documents is effectively empty."
                         )
@@ -183,13 +222,19 @@ with st.sidebar:
                         )
                         st.session_state.document_keywords = None
                     else:
-                        logger.info("Extracting keywords from combined content.")
-                        keywords_text = generate_keywords(LANGUAGE_MODEL, full_text)
+                        keywords_text = ", ".join(candidate_keywords[:KEYWORDS_TOP_N])
+                        if KEYWORDS_LLM_REFINEMENT:
+                            refined_keywords = refine_keywords(
+                                LANGUAGE_MODEL, candidate_keywords
+                            )
+                            if refined_keywords and "Failed to extract keywords" not in refined_keywords:
+                                keywords_text = refined_keywords
+                            else:
+                                logger.warning(
+                                    "Keyword refinement failed; showing locally extracted keywords."
+                                )
                         st.session_state.document_keywords = keywords_text
-                        if "Failed to extract keywords" in (keywords_text or ""):
-                            logger.error(f"Keyword extraction failed: {keywords_text}")
-                        else:
-                            logger.info("Keywords extracted successfully.")
+                        logger.info("Keywords extracted successfully.")
             else:
                 st.sidebar.error(
                     "Cannot extract keywords: Document content not loaded or available."
@@ -223,119 +268,203 @@ st.markdown("---")
 uploaded_files = st.file_uploader(
     "Upload Research Documents (PDF, DOCX, TXT)",
     type=["pdf", "docx", "txt"],
-    help="Select one or more PDF, DOCX, or TXT documents for analysis. Processing will begin upon upload. Re-uploading or changing files will reset the session.",
+    help="Select one or more PDF, DOCX, or TXT documents for analysis. Processing will begin upon upload. Adding or removing files updates the loaded documents; your chat is kept.",
     accept_multiple_files=True,
     key=f"file_uploader_{st.session_state.uploaded_file_key}",
 )
 
-if uploaded_files:
-    current_uploaded_file_names = sorted([f.name for f in uploaded_files])
-    logger.info(f"Files uploaded: {current_uploaded_file_names}")
-
-    if set(current_uploaded_file_names) != set(
-        st.session_state.get("uploaded_filenames", [])
-    ):
-        logger.info("New set of files detected. Resetting document states and file uploader.")
-        reset_document_states(clear_chat=True)
-        reset_file_uploader() # Added call to reset file uploader widget
-
-        all_raw_docs_for_session = []
-        successfully_loaded_filenames = []
-
-        for uploaded_file_obj in uploaded_files:
-            filename = uploaded_file_obj.name
-            logger.debug(f"Processing uploaded file: {filename}")
-            with st.spinner(f"Processing '{filename}'... This may take a moment."):
-                saved_path = save_uploaded_file(uploaded_file_obj)
-                if saved_path:
-                    logger.info(f"File '{filename}' saved to '{saved_path}'")
-                    raw_docs_from_file = load_document(saved_path)
-                    if raw_docs_from_file:
-                        all_raw_docs_for_session.extend(raw_docs_from_file)
-                        successfully_loaded_filenames.append(filename)
-                        logger.info(f"Successfully loaded and parsed: {filename}")
-                    else:
-                        st.error(
-                            f"Could not load document from '{filename}'. It might be empty, corrupted, or an unsupported type."
-                        )
-                        logger.error(f"Failed to load document from '{filename}'.")
-                else:
-                    st.error(f"Failed to save '{filename}'. It will be skipped.")
-                    logger.error(f"Failed to save '{filename}'.")
-
-        st.session_state.uploaded_filenames = successfully_loaded_filenames
+current_uploads = {}  # filename -> uploaded file; the first of any duplicate names wins
+for uploaded_file_obj in uploaded_files or []:
+    current_uploads.setdefault(uploaded_file_obj.name, uploaded_file_obj)
+
+# Forget failures of files the user has since removed, so adding them again retries.
+st.session_state.failed_uploads = [
+    name for name in st.session_state.failed_uploads if name in current_uploads
+]
+removed_filenames = [
+    name for name in st.session_state.indexed_files if name not in current_uploads
+]
+new_uploads = [
+    uploaded_file_obj
+    for name, uploaded_file_obj in current_uploads.items()
+    if name not in st.session_state.indexed_files
+    and name not in st.session_state.failed_uploads
+]
+
+if removed_filenames or new_uploads:
+    logger.info(f"Files uploaded: {sorted(current_uploads)}")
+    logger.info(
+        f"Updating documents: {len(new_uploads)} added, {len(removed_filenames)} removed."
+    )
 
-        if all_raw_docs_for_session:
-            st.session_state.raw_documents = all_raw_docs_for_session
-            logger.info(
-                f"Total {len(all_raw_docs_for_session)} raw documents collected from {len(successfully_loaded_filenames)} files."
+    saved_uploads = []  # (filename, saved path, file hash) per new file
+    for uploaded_file_obj in new_uploads:
+        filename = uploaded_file_obj.name
+        logger.debug(f"Processing uploaded file: {filename}")
+        saved_path, file_hash = save_uploaded_file(uploaded_file_obj)
+        if saved_path:
+            logger.info(f"File '{filename}' saved to '{saved_path}'")
+            saved_uploads.append((filename, saved_path, file_hash))
+        else:
+            st.error(f"Failed to save '{filename}'. It will be skipped.")
+            logger.error(f"Failed to save '{filename}'.")
+            st.session_state.failed_uploads.append(filename)
+
+    # If another session has already indexed exactly these files, share its corpus.
+    session_files = {
+        name: record["file_hash"]
+        for name, record in st.session_state.indexed_files.items()
+        if name not in removed_filenames
+    }
+    session_files.update(
+        {filename: file_hash for filename, _, file_hash in saved_uploads}
+    )
+    using_shared_corpus = bool(saved_uploads or removed_filenames) and use_shared_corpus(
+        session_files
+    )
+    if removed_filenames:
+        if not using_shared_corpus:
+            remove_indexed_files(removed_filenames)
+        st.info(f"Removed from the session: {', '.join(removed_filenames)}")
+
+    files_to_index = []  # IngestedFile per new file, restored or freshly ingested
+    files_to_ingest = []  # (filename, saved path, file hash) for files that need indexing
+
+    if using_shared_corpus and saved_uploads:
+        display_filenames = ", ".join(filename for filename, _, _ in saved_uploads)
+        logger.info(f"Using the shared index for: {display_filenames}")
+        st.success(f"✅ Documents ({display_filenames}) loaded from an existing index!")
+        saved_uploads = []
+
+    same_content_uploads = []  # (filename, file hash) of uploads identical to another new file
+    for filename, saved_path, file_hash in saved_uploads:
+        if link_indexed_file(filename, file_hash):
+            continue
+        if any(file_hash == pending[2] for pending in files_to_ingest) or any(
+            file_hash == ingested.file_hash for ingested in files_to_index
+        ):
+            same_content_uploads.append((filename, file_hash))
+            continue
+        segment = load_segment(file_hash)
+        if segment is not None and len(segment) > 0:
+            files_to_index.append(
+                IngestedFile.from_segment(filename, saved_path, file_hash, segment)
+            )
+            logger.info(f"Reusing persisted index for: {filename}")
+        else:
+            files_to_ingest.append((filename, saved_path, file_hash))
+
+    if files_to_ingest:
+        with st.status(
+            f"Processing {len(files_to_ingest)} new file(s)... This may take a moment.",
+            expanded=True,
+        ) as ingest_status:
+            file_status_lines = {
+                filename: st.empty() for filename, _, _ in files_to_ingest
+            }
+
+            def show_file_status(filename, message):
+                file_status_lines[filename].markdown(f"**{filename}**: {message}")
+
+            ingested_files = ingest_files(
+                files_to_ingest, EMBEDDING_MODEL, status_callback=show_file_status
+            )
+            ingest_status.update(
+                label=f"Processed {len(files_to_ingest)} new file(s).",
+                state="complete",
+                expanded=False,
             )
 
-            with st.spinner(
-                f"Chunking and indexing {len(st.session_state.uploaded_filenames)} document(s)..."
-            ):
-                logger.debug("Starting document chunking.")
-                processed_chunks = chunk_documents(st.session_state.raw_documents)
-                if processed_chunks:
-                    logger.info(f"{len(processed_chunks)} chunks created.")
-                    logger.debug("Starting document indexing.")
-                    index_documents(processed_chunks)  # Modifies st.session_state
-
-                    if st.session_state.document_processed:
-                        logger.info("Vector indexing successful.")
-                        try:
-                            logger.debug("Starting BM25 indexing.")
-                            corpus_texts = [
-                                chunk.page_content for chunk in processed_chunks
-                            ]
-                            tokenized_corpus = [
-                                doc.lower().split(" ") for doc in corpus_texts
-                            ]
-                            st.session_state.bm25_index = BM25Okapi(tokenized_corpus)
-                            st.session_state.bm25_corpus_chunks = processed_chunks
-                            display_filenames = ", ".join(
-                                st.session_state.uploaded_filenames
-                            )
-                            logger.info(
-                                f"BM25 index created for documents: {display_filenames}"
-                            )
-                            st.success(
-                                f"✅ Documents ({display_filenames}) processed and indexed successfully!"
-                            )
-                        except Exception as e:
-                            display_filenames = ", ".join(
-                                st.session_state.uploaded_filenames
-                            )
-                            logger.exception(
-                                f"Failed to create BM25 index for documents ({display_filenames})."
-                            )
-                            st.error(
-                                f"Failed to create BM25 index for documents ({display_filenames}). Vector indexing may still be active. Details: {e}"
-                            )
-                    else:
-                        display_filenames = ", ".join(
-                            st.session_state.uploaded_filenames
-                        )
-                        logger.error(
-                            f"Vector indexing failed for documents ({display_filenames}). BM25 indexing skipped."
-                        )
-                        st.error(
-                            f"Documents ({display_filenames}) loaded but failed during vector indexing. BM25 indexing also skipped."
-                        )
-                else:
-                    logger.warning(
-                        "No processable chunks generated from documents. Indexing skipped."
-                    )
-                    st.warning(
-                        "No processable content found after loading all uploaded documents. Indexing skipped."
+        for ingested in ingested_files:
+            if ingested.error:
+                st.error(ingested.error)
+                logger.error(ingested.error)
+                st.session_state.failed_uploads.append(ingested.filename)
+                continue
+            files_to_index.append(ingested)
+            logger.info(f"Successfully loaded and parsed: {ingested.filename}")
+
+    if files_to_index:
+        # Only the new files' chunks are added; chunks already in the store stay as they are.
+        files_with_chunks = [ingested for ingested in files_to_index if ingested.chunks]
+        chunk_ids = []
+        if files_with_chunks:
+            new_chunks = [chunk for ingested in files_with_chunks for chunk in ingested.chunks]
+            make_corpus_private()  # Other sessions may share the current index
+            with st.spinner(f"Indexing {len(new_chunks)} chunks..."):
+                logger.debug("Starting document indexing.")
+                chunk_ids = index_documents(
+                    new_chunks,
+                    embedding_blocks=[ingested.embeddings for ingested in files_with_chunks],
+                )
+
+        offset = 0
+        added_filenames = []
+        for ingested in files_to_index:
+            file_chunk_ids = []
+            if ingested.chunks:
+                if not chunk_ids:
+                    # Vector indexing failed (already reported); retry if the file is re-added.
+                    st.session_state.failed_uploads.append(ingested.filename)
+                    continue
+                file_chunk_ids = chunk_ids[offset : offset + len(ingested.chunks)]
+                offset += len(ingested.chunks)
+                if ingested.needs_saving:
+                    # Persist each new file so it is never embedded again.
+                    save_segment(
+                        ingested.file_hash,
+                        ingested.raw_documents,
+                        ingested.chunks,
+                        ingested.embeddings,
+                        ingested.bm25_term_freqs,
+                        surface_forms=ingested.surface_forms,
                     )
-        elif not st.session_state.uploaded_filenames and uploaded_files:
-            logger.warning(
-                "Files were uploaded, but none could be successfully processed."
-            )
-            st.warning(
-                "Although files were uploaded, none could be successfully processed. Please check file formats and content."
+            add_indexed_file(
+                ingested.filename,
+                ingested.file_hash,
+                ingested.raw_documents,
+                ingested.chunks,
+                file_chunk_ids,
+                ingested.bm25_term_freqs,
+                ingested.surface_forms,
             )
+            added_filenames.append(ingested.filename)
+
+        if added_filenames:
+            display_filenames = ", ".join(added_filenames)
+            if chunk_ids:
+                logger.info(f"Vector indexing successful for: {display_filenames}")
+                st.success(
+                    f"✅ Documents ({display_filenames}) processed and indexed successfully!"
+                )
+            else:
+                logger.warning(
+                    f"No processable chunks generated from documents ({display_filenames}). Indexing skipped."
+                )
+                st.warning(
+                    f"No processable content found in {display_filenames}. Indexing skipped."
+                )
+
+    for filename, file_hash in same_content_uploads:
+        # Indexed once above, under the first of the identical files' names
+        if not link_indexed_file(filename, file_hash):
+            st.session_state.failed_uploads.append(filename)
+
+    refresh_document_views()
+
+    if reloading_documents and st.session_state.document_processed:
+        logger.info("Reloaded the session's documents after they were unloaded while idle.")
+        st.info(
+            "Your documents were unloaded from memory while this session was idle and have been reloaded."
+        )
+
+    if current_uploads and not st.session_state.uploaded_filenames:
+        logger.warning(
+            "Files were uploaded, but none could be successfully processed."
+        )
+        st.warning(
+            "Although files were uploaded, none could be successfully processed. Please check file formats and content."
+        )
 
 if st.session_state.get("uploaded_filenames") and st.session_state.get(
     "document_processed"
@@ -370,6 +499,7 @@ if st.session_state.document_processed:
             with st.chat_message("user"):
                 st.write(user_input)
 
+            answer_stream = None  # Set when the answer is generated by the LLM
             with st.spinner("Thinking..."):
                 num_messages_to_take = MAX_HISTORY_TURNS * 2
                 chat_log_for_prompt = st.session_state.messages[:-1]
@@ -378,7 +508,7 @@ if st.session_state.document_processed:
                     f"{('User' if msg['role'] == 'user' else 'Assistant')}: {msg['content']}"
                     for msg in chat_log_for_prompt
                 ]
-                formatted_history = "\n".join(history_lines)
+                formatted_history = select_recent_history(history_lines)
                 logger.debug(f"Formatted history for prompt: {formatted_history}")
 
                 retrieved_results_dict = find_related_documents(
@@ -407,9 +537,10 @@ if st.session_state.document_processed:
                         with st.spinner(
                             f"Re-ranking top {len(docs_for_reranking)} documents..."
                         ):
-                            final_context_docs = rerank_documents(
+                            final_context_docs = cascade_rerank_documents(
                                 user_input,
                                 docs_for_reranking,
+                                retrieved_results_dict,
                                 RERANKER_MODEL,
                                 top_n=FINAL_TOP_N_FOR_CONTEXT,
                             )
@@ -433,26 +564,67 @@ if st.session_state.document_processed:
                         )
                         ai_response = "After re-ranking, no relevant sections were found in the loaded documents to answer your query."
                     else:
-                        logger.debug("Generating answer with final context documents.")
-                        ai_response = generate_answer(
-                            LANGUAGE_MODEL,
-                            user_query=user_input,
-                            context_documents=final_context_docs,
-                            conversation_history=formatted_history,
-                        )
+                        context_ids = context_chunk_ids(final_context_docs)
+                        query_embedding = None
+                        if answer_cache.enabled and st.session_state.corpus_version:
+                            try:
+                                # Served from the query embedding cache filled by the semantic search
+                                query_embedding = EMBEDDING_MODEL.embed_query(user_input)
+                            except Exception as e:
+                                logger.warning(
+                                    f"Answer cache skipped: the question could not be embedded. Details: {e}"
+                                )
+                        cached_answer = None
+                        if query_embedding is not None:
+                            cached_answer = answer_cache.lookup(
+                                st.session_state.corpus_version,
+                                context_ids,
+                                query_embedding,
+                                formatted_history,
+                            )
+
+                        if cached_answer is not None:
+                            ai_response = cached_answer
+                        else:
+                            logger.debug("Generating answer with final context documents.")
+
+                            def cache_answer(answer):
+                                if query_embedding is not None:
+                                    answer_cache.store(
+                                        st.session_state.corpus_version,
+                                        context_ids,
+                                        query_embedding,
+                                        answer,
+                                        formatted_history,
+                                    )
+
+                            # Consumed below, so tokens appear as they are generated
+                            answer_stream = stream_answer(
+                                LANGUAGE_MODEL,
+                                user_query=user_input,
+                                context_documents=final_context_docs,
+                                conversation_history=formatted_history,
+                                on_complete=cache_answer,
+                            )
                 else:
                     logger.warning("No relevant sections found from hybrid search.")
                     ai_response = "I could not find relevant sections in the loaded documents to answer your query. Please ensure the documents contain information related to your query or try rephrasing."
 
+            with st.chat_message("assistant", avatar="🤖"):
+                if answer_stream is not None:
+                    # Returns the full text once the stream is exhausted
+                    ai_response = st.write_stream(answer_stream)
+                else:
+                    st.write(ai_response)
             logger.info(
                 f"AI Response: {ai_response[:100]}..."
             )  # Log snippet of AI response
             st.session_state.messages.append(
                 {"role": "assistant", "content": ai_response, "avatar": "🤖"}
             )
-            with st.chat_message("assistant", avatar="🤖"):
-                st.write(ai_response)
 else:
     st.info(
         "Please upload one or more PDF, DOCX, or TXT documents to begin your session and ask questions."
     )
+
+end_session_run()  # The session counts as idle from here, not from the start of the run
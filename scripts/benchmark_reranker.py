@@ -0,0 +1,125 @@
+"""
+Compares the PyTorch CrossEncoder with the exported ONNX reranker: latency per
+query and how closely the ONNX scores reproduce the PyTorch ranking.
+
+    python scripts/benchmark_reranker.py [--queries-file FILE] [--repeat N]
+
+`--queries-file` is JSON Lines, one {"query": ..., "passages": [...]} per line;
+without it a small built-in set is used. Both models score each query's
+passages as one batch, as rerank_documents does.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scipy.stats import kendalltau  # noqa: E402
+from sentence_transformers import CrossEncoder  # noqa: E402
+
+from core.config import (  # noqa: E402
+    RERANKER_MODEL_NAME,
+    RERANKER_ONNX_MODEL_DIR,
+    FINAL_TOP_N_FOR_CONTEXT,
+)
+from core.onnx_reranker import load_onnx_reranker  # noqa: E402
+
+SAMPLE_PASSAGES = [
+    "Employees accrue 1.5 days of paid vacation per month, up to 30 days per year.",
+    "Unused vacation days can be carried over to the next year, to a maximum of 5 days.",
+    "Refunds are issued to the original payment method within 30 days of purchase.",
+    "Items must be returned unused and in their original packaging to qualify for a refund.",
+    "The licensee may not sublicense, sell or distribute the software without written consent.",
+    "This agreement is governed by the laws of the State of Delaware.",
+    "Either party may terminate this agreement with 60 days' written notice.",
+    "Passwords must be at least 12 characters long and rotated every 90 days.",
+    "Multi-factor authentication is required for all remote access to company systems.",
+    "Quarterly revenue grew 12% year over year, driven by subscription sales.",
+    "Operating expenses rose 4% due to hiring in research and development.",
+    "The warranty covers manufacturing defects for two years from the date of delivery.",
+]
+SAMPLE_QUERIES = [
+    "How many vacation days do I get?",
+    "How do I get my money back for a purchase?",
+    "Can I resell the licensed software?",
+    "What are the password requirements?",
+    "How did revenue change last quarter?",
+    "How can the contract be ended?",
+]
+
+
+def load_queries(path):
+    if not path:
+        return [{"query": query, "passages": SAMPLE_PASSAGES} for query in SAMPLE_QUERIES]
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def time_predictions(model, queries, repeat):
+    """Returns (scores per query from the last run, latencies in ms of every run)."""
+    latencies = []
+    scores = []
+    for _ in range(repeat):
+        scores = []
+        for item in queries:
+            pairs = [(item["query"], passage) for passage in item["passages"]]
+            started = time.perf_counter()
+            scores.append(list(model.predict(pairs, show_progress_bar=False)))
+            latencies.append((time.perf_counter() - started) * 1000)
+    return scores, latencies
+
+
+def top_n(scores, n):
+    return set(sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:n])
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries-file", help="JSON Lines file of queries and passages")
+    parser.add_argument("--model", default=RERANKER_MODEL_NAME, help="CrossEncoder model")
+    parser.add_argument("--onnx-dir", default=RERANKER_ONNX_MODEL_DIR, help="Exported model directory")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs over all queries")
+    parser.add_argument("--top-n", type=int, default=FINAL_TOP_N_FOR_CONTEXT, help="Cut-off for overlap")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries_file)
+    models = {
+        "torch": CrossEncoder(args.model, device="cpu"),
+        "onnx": load_onnx_reranker(args.onnx_dir),
+    }
+    results = {}
+    for name, model in models.items():
+        time_predictions(model, queries[:1], 2)  # Warm-up
+        results[name] = time_predictions(model, queries, args.repeat)
+
+    print(f"{len(queries)} queries, {args.repeat} runs each\n")
+    print(f"{'backend':<8} {'median ms':>10} {'p95 ms':>10}")
+    for name, (_, latencies) in results.items():
+        print(f"{name:<8} {statistics.median(latencies):>10.2f} {percentile(latencies, 0.95):>10.2f}")
+    speedup = statistics.median(results["torch"][1]) / statistics.median(results["onnx"][1])
+    print(f"\nONNX speed-up (median): {speedup:.2f}x")
+
+    torch_scores, onnx_scores = results["torch"][0], results["onnx"][0]
+    taus, overlaps, same_top = [], [], 0
+    for reference, candidate in zip(torch_scores, onnx_scores):
+        tau = kendalltau(reference, candidate).statistic
+        taus.append(1.0 if tau != tau else tau)  # NaN when all scores tie
+        n = min(args.top_n, len(reference))
+        overlaps.append(len(top_n(reference, n) & top_n(candidate, n)) / n)
+        same_top += top_n(reference, 1) == top_n(candidate, 1)
+    print(f"Mean Kendall tau vs torch: {statistics.mean(taus):.4f}")
+    print(f"Mean top-{args.top_n} overlap: {statistics.mean(overlaps):.2%}")
+    print(f"Same top result: {same_top}/{len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Exports the re-ranking CrossEncoder to ONNX and quantizes its weights to int8,
+for use with RERANKER_BACKEND=onnx.
+
+    pip install onnx onnxruntime
+    python scripts/export_reranker_onnx.py [--model NAME] [--output DIR]
+
+Needs network access (or a populated Hugging Face cache) once, to fetch the
+model; the app then loads the exported files from the output directory only.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch  # noqa: E402
+from sentence_transformers import CrossEncoder  # noqa: E402
+
+from core.config import RERANKER_MODEL_NAME, RERANKER_ONNX_MODEL_DIR  # noqa: E402
+from core.onnx_reranker import EXPORT_METADATA_FILENAME  # noqa: E402
+
+MODEL_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+class LogitsOnly(torch.nn.Module):
+    """Takes the tokenizer outputs positionally and returns just the logits, as ONNX export needs."""
+
+    def __init__(self, model, input_names):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *inputs):
+        return self.model(**dict(zip(self.input_names, inputs))).logits
+
+
+def activation_name(encoder):
+    """The activation CrossEncoder applies to the logits, as recorded for OnnxCrossEncoder."""
+    activation = getattr(encoder, "activation_fn", None) or getattr(
+        encoder, "default_activation_function", None
+    )
+    return "sigmoid" if isinstance(activation, torch.nn.Sigmoid) else "identity"
+
+
+def export(model_name, output_dir, opset=17, quantize=True):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(output_dir, exist_ok=True)
+    encoder = CrossEncoder(model_name, device="cpu")
+    model = encoder.model.eval()
+    tokenizer = encoder.tokenizer
+
+    sample = tokenizer(
+        ["what is the refund policy?"],
+        ["Refunds are issued within 30 days of purchase."],
+        return_tensors="pt",
+    )
+    input_names = [name for name in MODEL_INPUT_NAMES if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            LogitsOnly(model, input_names),
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False,
+        )
+    print(f"Exported {model_name} to {fp32_path}")
+
+    if quantize:
+        int8_path = os.path.join(output_dir, "model_quantized.onnx")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"Quantized weights to int8 in {int8_path}")
+
+    tokenizer.save_pretrained(output_dir)
+    metadata = {
+        "model_name": model_name,
+        "activation": activation_name(encoder),
+        # Renamed to max_seq_length in newer sentence-transformers
+        "max_length": getattr(encoder, "max_seq_length", None)
+        or getattr(encoder, "max_length", None)
+        or 512,
+        "quantized": quantize,
+        "opset": opset,
+    }
+    with open(os.path.join(output_dir, EXPORT_METADATA_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    print(f"Wrote tokenizer and {EXPORT_METADATA_FILENAME} to {output_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=RERANKER_MODEL_NAME, help="CrossEncoder model to export")
+    parser.add_argument("--output", default=RERANKER_ONNX_MODEL_DIR, help="Directory to write to")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset version")
+    parser.add_argument(
+        "--no-quantize", action="store_true", help="Only export the float32 model"
+    )
+    args = parser.parse_args()
+    export(args.model, args.output, opset=args.opset, quantize=not args.no_quantize)
+
+
+if __name__ == "__main__":
+    main()
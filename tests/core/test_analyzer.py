@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import patch
+
+# Module to test
+from core.analyzer import Analyzer, analyze, light_stem
+
+ANALYZER_LOGGER_PATH = "core.analyzer.logger"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(ANALYZER_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+def test_splits_on_punctuation_and_whitespace():
+    analyzer = Analyzer(stopwords="none", stemmer="none")
+    assert analyzer.analyze("Revenue,\tgrowth\n(2023): 5.2%!") == [
+        "revenue", "growth", "2023", "5", "2",
+    ]
+
+
+def test_unicode_case_folding_and_normalization():
+    analyzer = Analyzer(stopwords="none", stemmer="none")
+    assert analyzer.analyze("STRASSE Straße ＡＢＣ") == ["strasse", "strasse", "abc"]
+
+
+def test_stopwords_are_removed():
+    analyzer = Analyzer(stopwords="english", stemmer="none")
+    assert analyzer.analyze("What is the capital of France?") == ["capital", "france"]
+
+
+@pytest.mark.parametrize(
+    "token, stem",
+    [
+        ("policies", "policy"),
+        ("documents", "document"),
+        ("licenses", "license"),
+        ("class", "class"),
+        ("status", "status"),
+        ("gas", "gas"),
+        ("agrees", "agree"),
+        ("model", "model"),
+    ],
+)
+def test_light_stem(token, stem):
+    assert light_stem(token) == stem
+
+
+def test_index_and_query_terms_match():
+    chunk_terms = analyze("Our refund policies: see Section 4.")
+    query_terms = analyze("what is the refund policy?")
+    assert set(query_terms) <= set(chunk_terms)
+
+
+def test_surface_forms_count_the_words_behind_stemmed_terms():
+    analyzer = Analyzer(stopwords="english", stemmer="light")
+    surface_forms = {}
+
+    terms = analyzer.analyze("Analysis of the policies; policy analysis.", surface_forms)
+
+    assert terms == ["analysi", "policy", "policy", "analysi"]
+    assert surface_forms == {"analysi": {"analysis": 2}, "policy": {"policies": 1}}
+
+
+def test_unknown_settings_fall_back_to_none(mock_logger_fixture):
+    analyzer = Analyzer(stopwords="klingon", stemmer="porter")
+    assert analyzer.analyze("The Cats") == ["the", "cats"]
+    assert "stopwords=none" in analyzer.signature and "stemmer=none" in analyzer.signature
+    assert mock_logger_fixture.warning.call_count == 2
+
+
+def test_signature_reflects_settings():
+    assert Analyzer("english", "light").signature != Analyzer("none", "light").signature
@@ -0,0 +1,108 @@
+import pytest
+from unittest.mock import patch
+
+from langchain_core.documents import Document as LangchainDocument
+
+# Module to test
+from core.answer_cache import (
+    SemanticAnswerCache,
+    MAX_QUESTIONS_PER_CONTEXT,
+    context_chunk_ids,
+    corpus_version,
+)
+
+ANSWER_CACHE_LOGGER_PATH = "core.answer_cache.logger"
+
+CONTEXT = ("chunk-1", "chunk-2")
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(ANSWER_CACHE_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture
+def cache():
+    return SemanticAnswerCache(max_entries=10, similarity_threshold=0.95, model_name="llm")
+
+
+def test_similar_question_with_same_context_is_served(cache):
+    cache.store("v1", CONTEXT, [1.0, 0.0, 0.0], "The refund window is 30 days.")
+
+    # Embeddings need not be normalized; cosine similarity ~0.995
+    answer = cache.lookup("v1", CONTEXT, [2.0, 0.2, 0.0])
+
+    assert answer == "The refund window is 30 days."
+    assert cache.stats()["hits"] == 1
+
+
+def test_dissimilar_question_misses(cache):
+    cache.store("v1", CONTEXT, [1.0, 0.0, 0.0], "Answer")
+
+    assert cache.lookup("v1", CONTEXT, [0.7, 0.7, 0.0]) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_context_history_and_version_must_match(cache):
+    cache.store("v1", CONTEXT, [1.0, 0.0], "Answer", conversation_history="User: hi")
+
+    assert cache.lookup("v1", CONTEXT, [1.0, 0.0], "User: hi") == "Answer"
+    assert cache.lookup("v1", CONTEXT, [1.0, 0.0]) is None
+    assert cache.lookup("v1", ("chunk-2", "chunk-1"), [1.0, 0.0], "User: hi") is None
+    assert cache.lookup("v2", CONTEXT, [1.0, 0.0], "User: hi") is None
+
+
+def test_most_similar_cached_question_wins(cache):
+    cache.store("v1", CONTEXT, [1.0, 0.0], "First")
+    cache.store("v1", CONTEXT, [0.0, 1.0], "Second")
+
+    assert cache.lookup("v1", CONTEXT, [0.05, 1.0]) == "Second"
+    assert cache.lookup("v1", CONTEXT, [1.0, 0.05]) == "First"
+
+
+def test_questions_per_context_are_bounded(cache):
+    for i in range(MAX_QUESTIONS_PER_CONTEXT + 1):
+        cache.store("v1", CONTEXT, [1.0, float(i) * 10], f"Answer {i}")
+
+    assert cache.lookup("v1", CONTEXT, [1.0, 0.0]) is None  # The oldest was forgotten
+    assert cache.lookup("v1", CONTEXT, [1.0, 10.0]) == "Answer 1"
+
+
+def test_invalidate_drops_only_that_corpus_version(cache):
+    cache.store("v1", CONTEXT, [1.0, 0.0], "Old corpus answer")
+    cache.store("v2", CONTEXT, [1.0, 0.0], "Other corpus answer")
+
+    assert cache.invalidate("v1") == 1
+
+    assert cache.lookup("v1", CONTEXT, [1.0, 0.0]) is None
+    assert cache.lookup("v2", CONTEXT, [1.0, 0.0]) == "Other corpus answer"
+    assert cache.invalidate(None) == 0
+
+
+def test_disabled_or_unversioned_cache_stores_nothing(cache):
+    disabled = SemanticAnswerCache(max_entries=0)
+    disabled.store("v1", CONTEXT, [1.0], "Answer")
+    cache.store(None, CONTEXT, [1.0], "Answer")
+    cache.store("v1", CONTEXT, [1.0], "   ")
+
+    assert disabled.enabled is False
+    assert disabled.lookup("v1", CONTEXT, [1.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_corpus_version_is_order_independent_content_id():
+    assert corpus_version(["hash-b", "hash-a"]) == corpus_version(["hash-a", "hash-b"])
+    assert corpus_version(["hash-a"]) != corpus_version(["hash-a", "hash-b"])
+    assert corpus_version([]) is None
+
+
+def test_context_chunk_ids_follow_content_and_order():
+    first = LangchainDocument(page_content="alpha", metadata={"source": "a"})
+    second = LangchainDocument(page_content="beta")
+
+    ids = context_chunk_ids([first, second])
+
+    assert ids == context_chunk_ids([LangchainDocument(page_content="alpha"), second])
+    assert ids != context_chunk_ids([second, first])
@@ -0,0 +1,85 @@
+import pytest
+import threading
+from unittest.mock import patch
+
+# Module to test
+from core.cache import LRUCache
+
+MONOTONIC_PATH = "core.cache.time.monotonic"
+
+
+def test_get_and_put():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("missing") is None
+    assert cache.get("missing", "default") == "default"
+    assert cache.stats() == {
+        "hits": 1, "misses": 2, "hit_rate": pytest.approx(1 / 3), "evictions": 0, "entries": 1,
+    }
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = LRUCache(max_entries=10, ttl_seconds=5)
+    with patch(MONOTONIC_PATH, side_effect=[0.0, 4.0, 6.0]):
+        cache.put("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_get_many_returns_only_cached_keys():
+    cache = LRUCache(max_entries=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    assert cache.get_many(["a", "x", "b"]) == {"a": 1, "b": 2}
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 1)
+
+
+def test_discard_if_removes_matching_keys():
+    cache = LRUCache(max_entries=10)
+    cache.put(("v1", "a"), 1)
+    cache.put(("v2", "a"), 2)
+    cache.put(("v1", "b"), 3)
+
+    assert cache.discard_if(lambda key: key[0] == "v1") == 2
+    assert len(cache) == 1
+    assert cache.get(("v2", "a")) == 2
+
+
+def test_zero_size_cache_stores_nothing():
+    cache = LRUCache(max_entries=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_concurrent_puts_respect_bound():
+    cache = LRUCache(max_entries=50)
+
+    def fill(offset):
+        for i in range(500):
+            cache.put((offset, i), i)
+            cache.get((offset, i // 2))
+
+    threads = [threading.Thread(target=fill, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache) == 50
+    assert cache.stats()["evictions"] == 4 * 500 - 50
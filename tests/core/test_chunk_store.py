@@ -0,0 +1,87 @@
+import sys
+import pytest
+from unittest.mock import patch
+
+from langchain_core.documents import Document as LangchainDocument
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Module to test
+from core.chunk_store import ChunkStore, TextSpan, text_memory_bytes
+
+CHUNK_STORE_LOGGER_PATH = "core.chunk_store.logger"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(CHUNK_STORE_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture
+def pages():
+    return [
+        LangchainDocument(
+            page_content=f"Page {number} says " + " ".join(f"word{number}x{i}" for i in range(60)),
+            metadata={"source": "a.pdf", "page": number},
+        )
+        for number in range(3)
+    ]
+
+
+def split(pages):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=120, chunk_overlap=30, add_start_index=True)
+    return splitter.split_documents(pages)
+
+
+def test_chunks_and_pages_read_like_the_original_documents(pages):
+    chunks = split(pages)
+
+    store = ChunkStore(pages, chunks)
+
+    assert [chunk.to_document() for chunk in store.chunks] == chunks
+    assert [page.to_document() for page in store.pages] == pages
+    assert store.text == "".join(page.page_content for page in pages)
+    assert store._own == {}  # Every chunk is a span of its page
+
+
+def test_chunks_that_are_not_spans_keep_their_own_text(pages):
+    chunks = split(pages)
+    moved = LangchainDocument(page_content="not in any page", metadata={"source": "a.pdf", "start_index": 5})
+    no_start = LangchainDocument(page_content=pages[1].page_content[:10], metadata={"source": "a.pdf"})
+    other_metadata = LangchainDocument(
+        page_content=chunks[0].page_content, metadata={**chunks[0].metadata, "extra": True}
+    )
+
+    store = ChunkStore(pages, [moved, *chunks, no_start, other_metadata])
+
+    assert [chunk.to_document() for chunk in store.chunks] == [moved, *chunks, no_start, other_metadata]
+    assert len(store._own) == 3
+
+
+def test_text_is_sliced_on_access_not_kept(pages):
+    store = ChunkStore(pages, split(pages))
+    chunk = store.chunks[3]
+
+    assert isinstance(chunk, TextSpan) and not hasattr(chunk, "__dict__")
+    assert chunk.page_content == chunk.page_content
+    assert chunk.page_content is not chunk.page_content  # A fresh string per access
+    chunk.metadata["page"] = 99  # Metadata is a copy
+    assert chunk.metadata["page"] != 99
+
+
+def test_text_memory_bytes_counts_a_store_once(pages):
+    chunks = split(pages)
+    store = ChunkStore(pages, chunks)
+    copies = sum(sys.getsizeof(doc.page_content) for doc in (*pages, *chunks))
+
+    assert text_memory_bytes(store.chunks) == text_memory_bytes(store.pages + store.chunks) == store.memory_bytes()
+    assert sys.getsizeof(store.text) < store.memory_bytes() < copies
+    assert text_memory_bytes(chunks) == sum(len(chunk.page_content) for chunk in chunks)
+
+
+def test_empty_store():
+    store = ChunkStore([], [])
+
+    assert store.pages == [] and store.chunks == []
+    assert store.text == ""
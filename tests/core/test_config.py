@@ -101,6 +101,256 @@ def test_pdf_storage_path_env_override():
         assert config.PDF_STORAGE_PATH == test_path
 
 
+def test_index_storage_path_default():
+    with patch.dict(os.environ, {}, clear=True):
+        if "INDEX_STORAGE_PATH" in os.environ:
+            del os.environ["INDEX_STORAGE_PATH"]
+        importlib.reload(config)
+        assert config.INDEX_STORAGE_PATH == "document_store/indexes/"
+
+
+def test_index_storage_path_env_override():
+    test_path = "/mnt/custom_indexes/"
+    with patch.dict(os.environ, {"INDEX_STORAGE_PATH": test_path}):
+        importlib.reload(config)
+        assert config.INDEX_STORAGE_PATH == test_path
+
+
+def test_embedding_cache_settings_default():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.EMBEDDING_CACHE_PATH == "document_store/embedding_cache.sqlite3"
+        assert config.EMBEDDING_CACHE_MAX_ENTRIES == 200000
+
+
+def test_embedding_cache_settings_env_override():
+    with patch.dict(
+        os.environ,
+        {"EMBEDDING_CACHE_PATH": "/tmp/cache.db", "EMBEDDING_CACHE_MAX_ENTRIES": "42"},
+    ):
+        importlib.reload(config)
+        assert config.EMBEDDING_CACHE_PATH == "/tmp/cache.db"
+        assert config.EMBEDDING_CACHE_MAX_ENTRIES == 42
+
+
+def test_embedding_batching_settings_default():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.EMBEDDING_BATCH_SIZE == 32
+        assert config.EMBEDDING_MAX_WORKERS == 4
+        assert config.EMBEDDING_MAX_RETRIES == 3
+
+
+def test_embedding_batching_settings_env_override():
+    with patch.dict(
+        os.environ,
+        {"EMBEDDING_BATCH_SIZE": "8", "EMBEDDING_MAX_WORKERS": "2", "EMBEDDING_MAX_RETRIES": "0"},
+    ):
+        importlib.reload(config)
+        assert config.EMBEDDING_BATCH_SIZE == 8
+        assert config.EMBEDDING_MAX_WORKERS == 2
+        assert config.EMBEDDING_MAX_RETRIES == 0
+
+
+def test_ingest_max_workers_default():
+    with patch.dict(os.environ, {}, clear=True), patch("os.cpu_count", return_value=16):
+        importlib.reload(config)
+        assert config.INGEST_MAX_WORKERS == 4
+
+
+def test_ingest_max_workers_env_override():
+    with patch.dict(os.environ, {"INGEST_MAX_WORKERS": "1"}):
+        importlib.reload(config)
+        assert config.INGEST_MAX_WORKERS == 1
+
+
+def test_vector_store_compaction_ratio_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.VECTOR_STORE_COMPACTION_RATIO == 0.25
+    with patch.dict(os.environ, {"VECTOR_STORE_COMPACTION_RATIO": "0.5"}):
+        importlib.reload(config)
+        assert config.VECTOR_STORE_COMPACTION_RATIO == 0.5
+
+
+def test_bm25_compaction_ratio_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.BM25_COMPACTION_RATIO == 0.25
+    with patch.dict(os.environ, {"BM25_COMPACTION_RATIO": "1.0"}):
+        importlib.reload(config)
+        assert config.BM25_COMPACTION_RATIO == 1.0
+
+
+def test_bm25_analyzer_settings_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.BM25_STOPWORDS == "english"
+        assert config.BM25_STEMMER == "light"
+    with patch.dict(os.environ, {"BM25_STOPWORDS": "none", "BM25_STEMMER": "none"}):
+        importlib.reload(config)
+        assert config.BM25_STOPWORDS == "none"
+        assert config.BM25_STEMMER == "none"
+
+
+def test_retrieval_timeouts_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.SEMANTIC_SEARCH_TIMEOUT_SECONDS == 10.0
+        assert config.BM25_SEARCH_TIMEOUT_SECONDS == 5.0
+    with patch.dict(
+        os.environ, {"SEMANTIC_SEARCH_TIMEOUT_SECONDS": "2.5", "BM25_SEARCH_TIMEOUT_SECONDS": "1"}
+    ):
+        importlib.reload(config)
+        assert config.SEMANTIC_SEARCH_TIMEOUT_SECONDS == 2.5
+        assert config.BM25_SEARCH_TIMEOUT_SECONDS == 1.0
+
+
+def test_rerank_cascade_settings_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.RERANK_CASCADE_SCORE_RATIO == 0.0
+        assert config.RERANK_CASCADE_AUDIT_RATE == 0.0
+    with patch.dict(
+        os.environ, {"RERANK_CASCADE_SCORE_RATIO": "0.5", "RERANK_CASCADE_AUDIT_RATE": "0.1"}
+    ):
+        importlib.reload(config)
+        assert config.RERANK_CASCADE_SCORE_RATIO == 0.5
+        assert config.RERANK_CASCADE_AUDIT_RATE == 0.1
+
+
+def test_query_embedding_cache_settings_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.QUERY_EMBEDDING_CACHE_SIZE == 1024
+        assert config.QUERY_EMBEDDING_CACHE_TTL_SECONDS == 3600.0
+    with patch.dict(
+        os.environ, {"QUERY_EMBEDDING_CACHE_SIZE": "0", "QUERY_EMBEDDING_CACHE_TTL_SECONDS": "60"}
+    ):
+        importlib.reload(config)
+        assert config.QUERY_EMBEDDING_CACHE_SIZE == 0
+        assert config.QUERY_EMBEDDING_CACHE_TTL_SECONDS == 60.0
+
+
+def test_reranker_score_cache_size_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.RERANKER_SCORE_CACHE_SIZE == 50000
+    with patch.dict(os.environ, {"RERANKER_SCORE_CACHE_SIZE": "0"}):
+        importlib.reload(config)
+        assert config.RERANKER_SCORE_CACHE_SIZE == 0
+
+
+def test_reranker_backend_settings_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.RERANKER_BACKEND == "torch"
+        assert config.RERANKER_ONNX_MODEL_DIR == "models/reranker-onnx"
+    with patch.dict(
+        os.environ, {"RERANKER_BACKEND": "ONNX", "RERANKER_ONNX_MODEL_DIR": "/opt/reranker"}
+    ):
+        importlib.reload(config)
+        assert config.RERANKER_BACKEND == "onnx"
+        assert config.RERANKER_ONNX_MODEL_DIR == "/opt/reranker"
+
+
+def test_reranker_batching_settings_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.RERANKER_BATCH_WINDOW_MS == 5.0
+        assert config.RERANKER_MAX_BATCH_PAIRS == 128
+    with patch.dict(
+        os.environ, {"RERANKER_BATCH_WINDOW_MS": "0", "RERANKER_MAX_BATCH_PAIRS": "32"}
+    ):
+        importlib.reload(config)
+        assert config.RERANKER_BATCH_WINDOW_MS == 0.0
+        assert config.RERANKER_MAX_BATCH_PAIRS == 32
+
+
+def test_summary_settings_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.SUMMARY_CHUNK_GROUP_CHARS == 6000
+        assert config.SUMMARY_MAX_WORKERS == 2
+        assert config.SUMMARY_CACHE_SIZE == 256
+    with patch.dict(
+        os.environ,
+        {"SUMMARY_CHUNK_GROUP_CHARS": "12000", "SUMMARY_MAX_WORKERS": "4", "SUMMARY_CACHE_SIZE": "0"},
+    ):
+        importlib.reload(config)
+        assert config.SUMMARY_CHUNK_GROUP_CHARS == 12000
+        assert config.SUMMARY_MAX_WORKERS == 4
+        assert config.SUMMARY_CACHE_SIZE == 0
+
+
+def test_keyword_settings_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.KEYWORDS_TOP_N == 10
+        assert config.KEYWORDS_LLM_CANDIDATES == 30
+        assert config.KEYWORDS_LLM_REFINEMENT is False
+    with patch.dict(
+        os.environ,
+        {"KEYWORDS_TOP_N": "5", "KEYWORDS_LLM_CANDIDATES": "20", "KEYWORDS_LLM_REFINEMENT": "True"},
+    ):
+        importlib.reload(config)
+        assert config.KEYWORDS_TOP_N == 5
+        assert config.KEYWORDS_LLM_CANDIDATES == 20
+        assert config.KEYWORDS_LLM_REFINEMENT is True
+
+
+def test_answer_cache_settings_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.ANSWER_CACHE_SIZE == 0
+        assert config.ANSWER_CACHE_SIMILARITY_THRESHOLD == 0.95
+    with patch.dict(
+        os.environ,
+        {"ANSWER_CACHE_SIZE": "1000", "ANSWER_CACHE_SIMILARITY_THRESHOLD": "0.98"},
+    ):
+        importlib.reload(config)
+        assert config.ANSWER_CACHE_SIZE == 1000
+        assert config.ANSWER_CACHE_SIMILARITY_THRESHOLD == 0.98
+
+
+def test_context_budget_settings_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.CONTEXT_MAX_TOKENS == 1500
+        assert config.HISTORY_MAX_TOKENS == 500
+        assert config.CONTEXT_TOKENIZER_NAME == ""
+    with patch.dict(
+        os.environ,
+        {"CONTEXT_MAX_TOKENS": "3000", "HISTORY_MAX_TOKENS": "0", "CONTEXT_TOKENIZER_NAME": "org/tokenizer"},
+    ):
+        importlib.reload(config)
+        assert config.CONTEXT_MAX_TOKENS == 3000
+        assert config.HISTORY_MAX_TOKENS == 0
+        assert config.CONTEXT_TOKENIZER_NAME == "org/tokenizer"
+
+
+def test_memory_budget_settings_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.MEMORY_BUDGET_MB == 2048
+        assert config.SESSION_IDLE_SECONDS == 900
+    with patch.dict(os.environ, {"MEMORY_BUDGET_MB": "0", "SESSION_IDLE_SECONDS": "60"}):
+        importlib.reload(config)
+        assert config.MEMORY_BUDGET_MB == 0
+        assert config.SESSION_IDLE_SECONDS == 60
+
+
+def test_parse_cache_settings_default_and_override():
+    with patch.dict(os.environ, {}, clear=True):
+        importlib.reload(config)
+        assert config.PARSE_CACHE_PATH == "document_store/parse_cache/"
+        assert config.PARSE_CACHE_MAX_MB == 512
+    with patch.dict(os.environ, {"PARSE_CACHE_PATH": "/cache/parsed", "PARSE_CACHE_MAX_MB": "0"}):
+        importlib.reload(config)
+        assert config.PARSE_CACHE_PATH == "/cache/parsed"
+        assert config.PARSE_CACHE_MAX_MB == 0
+
+
 # --- Tests for Hardcoded Constants (Lower Priority) ---
 
 
@@ -0,0 +1,95 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+from langchain_core.documents import Document as LangchainDocument
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Module to test
+from core.context_builder import (
+    TokenCounter,
+    build_context,
+    select_recent_history,
+)
+
+CONTEXT_BUILDER_LOGGER_PATH = "core.context_builder.logger"
+
+SOURCE_TEXT = " ".join(f"Sentence number {i} of the refund policy." for i in range(200))
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(CONTEXT_BUILDER_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture
+def chunks():
+    """Chunks of SOURCE_TEXT split like chunk_documents does, overlapping by up to 200 characters."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
+    return splitter.split_documents([LangchainDocument(page_content=SOURCE_TEXT, metadata={"source": "policy.txt"})])
+
+
+def test_adjacent_chunks_are_merged_without_overlap(chunks):
+    context = build_context([chunks[2], chunks[1]], max_tokens=10_000)
+
+    start = chunks[1].metadata["start_index"]
+    end = chunks[2].metadata["start_index"] + len(chunks[2].page_content)
+    assert context == SOURCE_TEXT[start:end]  # One passage, no repeated text
+    assert len(context) < len(chunks[1].page_content) + len(chunks[2].page_content)
+
+
+def test_chunks_from_other_sources_are_kept_whole_in_rank_order(chunks):
+    other = LangchainDocument(page_content="Shipping is free.", metadata={"source": "shipping.txt", "start_index": 0})
+    no_offsets = LangchainDocument(page_content="Loose note.")
+
+    context = build_context([other, chunks[5], no_offsets], max_tokens=10_000)
+
+    assert context.split("\n\n") == ["Shipping is free.", chunks[5].page_content, "Loose note."]
+
+
+def test_lower_ranked_chunks_that_do_not_fit_are_skipped(chunks):
+    counter = TokenCounter()  # ~4 characters per token
+    budget = counter.count(chunks[0].page_content) + 10
+
+    context = build_context([chunks[0], chunks[4], LangchainDocument(page_content="Short fact.")], budget, counter)
+
+    assert context == chunks[0].page_content + "\n\nShort fact."
+    assert counter.count(context) <= budget + 2  # Plus the separator
+
+
+def test_best_chunk_larger_than_budget_is_truncated(chunks, mock_logger_fixture):
+    context = build_context([chunks[0]], max_tokens=20)
+
+    assert chunks[0].page_content.startswith(context)
+    assert 0 < TokenCounter().count(context) <= 20
+    mock_logger_fixture.warning.assert_called_once()
+
+
+def test_tokenizer_counts_are_used_when_configured():
+    tokenizer = MagicMock()
+    tokenizer.encode.side_effect = lambda text, add_special_tokens: text.split()
+
+    with patch("transformers.AutoTokenizer.from_pretrained", return_value=tokenizer) as from_pretrained:
+        counter = TokenCounter("some/tokenizer")
+        assert counter.count("one two three") == 3
+        assert counter.truncate("one two three four", 2) == "one two"
+        counter.count("again")
+
+    from_pretrained.assert_called_once_with("some/tokenizer")
+
+
+def test_unavailable_tokenizer_falls_back_to_estimate(mock_logger_fixture):
+    with patch("transformers.AutoTokenizer.from_pretrained", side_effect=OSError("offline")):
+        counter = TokenCounter("missing/tokenizer")
+        assert counter.count("12345678") == 2
+
+    mock_logger_fixture.warning.assert_called_once()
+
+
+def test_select_recent_history_keeps_latest_lines_within_budget():
+    lines = ["User: " + "a" * 400, "Assistant: <think>long reasoning</think>Short answer.", "User: Follow-up?"]
+
+    history = select_recent_history(lines, max_tokens=20)
+
+    assert history == "Assistant: Short answer.\nUser: Follow-up?"
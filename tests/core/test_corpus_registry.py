@@ -0,0 +1,170 @@
+import gc
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock
+
+from langchain_core.documents import Document as LangchainDocument
+
+# Module to test
+from core.corpus_registry import Corpus, CorpusRegistry
+
+CORPUS_REGISTRY_LOGGER_PATH = "core.corpus_registry.logger"
+ANSWER_CACHE_PATH = "core.corpus_registry.answer_cache"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(CORPUS_REGISTRY_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture
+def mock_answer_cache():
+    gc.collect()  # Release handles left over from earlier tests first
+    with patch(ANSWER_CACHE_PATH) as mock_cache:
+        yield mock_cache
+
+
+def make_corpus(*files):
+    """Corpus with one chunk per (file hash, term, vector)."""
+    corpus = Corpus(MagicMock(name="Embedding"))
+    for file_hash, term, vector in files:
+        chunk = LangchainDocument(page_content=f"{term} text")
+        chunk_ids = corpus.vector_db.add_embeddings([chunk], [vector])
+        corpus.add_file(file_hash, [LangchainDocument(page_content=f"raw {term}")], [chunk], chunk_ids, [{term: 2}])
+    return corpus
+
+
+def test_sessions_share_a_registered_corpus_until_the_last_release(mock_answer_cache):
+    registry = CorpusRegistry()
+    corpus = make_corpus(("hash-a", "apple", [1.0, 0.0]))
+
+    first = registry.register("v1", corpus)
+    second = registry.acquire("v1")
+
+    assert second.corpus is corpus
+    assert registry.stats() == {"corpora": 1, "handles": 2, "chunks": 1}
+    first.release()
+    first.release()  # Releasing twice counts once
+    assert len(registry) == 1
+    second.release()
+    assert len(registry) == 0
+    assert registry.acquire("v1") is None
+    mock_answer_cache.invalidate.assert_called_once_with("v1")
+
+
+def test_handle_is_released_when_garbage_collected(mock_answer_cache):
+    registry = CorpusRegistry()
+    handle = registry.register("v1", make_corpus(("hash-a", "apple", [1.0, 0.0])))
+
+    del handle
+    gc.collect()
+
+    assert len(registry) == 0
+    mock_answer_cache.invalidate.assert_called_once_with("v1")
+
+
+def test_registering_a_known_version_shares_the_first_corpus(mock_answer_cache):
+    registry = CorpusRegistry()
+    first_corpus = make_corpus(("hash-a", "apple", [1.0, 0.0]))
+    first = registry.register("v1", first_corpus)
+
+    second = registry.register("v1", make_corpus(("hash-a", "apple", [1.0, 0.0])))
+
+    assert first.corpus is second.corpus is first_corpus
+    assert registry.stats()["handles"] == 2
+
+
+def test_detach_only_when_the_handle_is_the_sole_reference(mock_answer_cache):
+    registry = CorpusRegistry()
+    first = registry.register("v1", make_corpus(("hash-a", "apple", [1.0, 0.0])))
+    second = registry.acquire("v1")
+
+    assert registry.detach(first) is False
+    second.release()
+    assert registry.detach(first) is True
+
+    assert len(registry) == 0
+    del first
+    gc.collect()  # A detached handle no longer releases anything
+    mock_answer_cache.invalidate.assert_not_called()
+
+
+def test_copy_reuses_stored_vectors_and_term_counts():
+    corpus = make_corpus(("hash-a", "apple", [1.0, 0.0]), ("hash-b", "banana", [0.0, 2.0]))
+
+    clone = corpus.copy(["hash-b"])
+
+    assert list(clone.files) == ["hash-b"]
+    assert clone.files["hash-b"] is corpus.files["hash-b"]
+    assert clone.vector_db.get_vectors(clone.files["hash-b"]["chunk_ids"]).tolist() == [[0.0, 1.0]]
+    assert clone.bm25_index.term_frequencies(clone.files["hash-b"]["chunk_ids"]) == [{"banana": 2}]
+    corpus.vector_db.embedding.embed_documents.assert_not_called()
+    assert len(corpus.vector_db) == 2  # The original is untouched
+
+
+def test_copy_shares_mapped_segment_vectors():
+    corpus = Corpus(MagicMock(name="Embedding"))
+    segment_vectors = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    segment_vectors.flags.writeable = False  # Like a mapped index segment
+    chunks = [LangchainDocument(page_content="apple text"), LangchainDocument(page_content="banana text")]
+    chunk_ids = corpus.vector_db.add_embeddings(chunks, segment_vectors)
+    corpus.add_file("hash-a", [], chunks, chunk_ids, [{"apple": 1}, {"banana": 1}])
+
+    clone = corpus.copy()
+
+    assert np.shares_memory(clone.vector_db.get_vectors(chunk_ids), segment_vectors)
+    assert clone.vector_db.memory_bytes() == clone.vector_db._deleted.nbytes
+
+
+def test_remove_file_tombstones_its_chunks():
+    corpus = make_corpus(("hash-a", "apple", [1.0, 0.0]), ("hash-b", "banana", [0.0, 1.0]))
+
+    record = corpus.remove_file("hash-a")
+
+    assert record["file_hash"] == "hash-a"
+    assert list(corpus.files) == ["hash-b"]
+    assert len(corpus.vector_db) == 1 and len(corpus.bm25_index) == 1
+    assert corpus.remove_file("hash-a") is None
+
+
+def test_surface_forms_are_merged_across_files():
+    corpus = Corpus(MagicMock(name="Embedding"))
+    for file_hash, words in (("hash-a", {"analysis": 2}), ("hash-b", {"analysis": 1, "analyses": 1})):
+        chunk = LangchainDocument(page_content=" ".join(words))
+        chunk_ids = corpus.vector_db.add_embeddings([chunk], [[1.0, 0.0]])
+        corpus.add_file(file_hash, [], [chunk], chunk_ids, [{"analysi": 2}], {"analysi": words})
+
+    assert corpus.surface_forms() == {"analysi": {"analysis": 3, "analyses": 1}}
+
+
+def test_memory_bytes_counts_text_of_raw_documents_and_chunks():
+    corpus = make_corpus(("hash-a", "apple", [1.0, 0.0]), ("hash-b", "banana", [0.0, 2.0]))
+
+    usage = corpus.memory_bytes()
+
+    assert usage["text"] == len("raw apple") + len("apple text") + len("raw banana") + len("banana text")
+    assert usage["embeddings"] == corpus.vector_db.memory_bytes() > 0
+    assert usage["bm25"] == corpus.bm25_index.memory_bytes() > 0
+    corpus.remove_file("hash-a")
+    assert corpus.memory_bytes()["text"] == len("raw banana") + len("banana text")
+
+
+def test_memory_bytes_is_measured_once_per_change_of_files():
+    corpus = make_corpus(("hash-a", "apple", [1.0, 0.0]))
+
+    with patch("core.corpus_registry.text_memory_bytes", return_value=7) as mock_measure:
+        assert corpus.memory_bytes()["text"] == 7
+        corpus.memory_bytes()["text"] = 0  # Callers get a copy
+        assert corpus.memory_bytes()["text"] == 7
+        assert mock_measure.call_count == 1
+
+        chunk = LangchainDocument(page_content="banana text")
+        corpus.add_file("hash-b", [], [chunk], corpus.vector_db.add_embeddings([chunk], [[0.0, 1.0]]), [{"banana": 1}])
+        corpus.memory_bytes()
+        assert mock_measure.call_count == 2
+        corpus.remove_file("hash-a")
+        corpus.memory_bytes()
+        corpus.copy().memory_bytes()
+        assert mock_measure.call_count == 4
@@ -1,4 +1,6 @@
 import pytest
+import hashlib
+import io
 import os
 from unittest.mock import patch, MagicMock, mock_open
 
@@ -15,6 +17,8 @@ from pdfplumber.exceptions import PDFSyntaxError # Import directly
 # Modules to test
 from core.document_processing import (
     save_uploaded_file,
+    read_upload_manifest,
+    UPLOAD_MANIFEST_FILE,
     load_document,
     chunk_documents,
     index_documents,
@@ -62,40 +66,63 @@ def mock_logger_fixture():
 # --- Tests for save_uploaded_file (from previous step, confirmed good) ---
 
 
-@patch(OS_PATH_JOIN_PATH, return_value="/fake/path/to/file.pdf")
-@patch(MOCK_OPEN_PATH)
-def test_save_uploaded_file_success(mock_open_file, mock_os_join, mock_logger_fixture):
-    mock_uploaded_file = MagicMock()
-    mock_uploaded_file.name = "file.pdf"
-    mock_uploaded_file.getbuffer.return_value = b"file_content"
+class FakeUploadedFile(io.BytesIO):
+    """In-memory upload with a name, like Streamlit's UploadedFile."""
 
-    with patch.object(config, "PDF_STORAGE_PATH", "/fake/storage"):
-        result_path = save_uploaded_file(mock_uploaded_file)
+    def __init__(self, name, content):
+        super().__init__(content)
+        self.name = name
 
-    mock_os_join.assert_called_once_with("/fake/storage", "file.pdf")
-    mock_open_file.assert_called_once_with("/fake/path/to/file.pdf", "wb")
-    mock_open_file().write.assert_called_once_with(b"file_content")
-    assert result_path == "/fake/path/to/file.pdf"
-    mock_logger_fixture.info.assert_called_once_with(
-        "File 'file.pdf' saved to '/fake/path/to/file.pdf'."
-    )
+
+def test_save_uploaded_file_stores_by_content_hash(tmp_path, mock_logger_fixture):
+    content = b"file_content" * 100
+    expected_hash = hashlib.sha256(content).hexdigest()
+
+    with patch("core.document_processing.HASH_BLOCK_SIZE", 7):  # Streamed in many blocks
+        file_path, file_hash = save_uploaded_file(
+            FakeUploadedFile("File.PDF", content), storage_path=str(tmp_path)
+        )
+
+    assert file_hash == expected_hash
+    assert file_path == os.path.join(str(tmp_path), f"{expected_hash}.pdf")
+    with open(file_path, "rb") as f:
+        assert f.read() == content
+    assert read_upload_manifest(str(tmp_path)) == {"File.PDF": expected_hash}
+    assert sorted(os.listdir(tmp_path)) == sorted([f"{expected_hash}.pdf", UPLOAD_MANIFEST_FILE])
+    mock_logger_fixture.info.assert_called_once_with(f"File 'File.PDF' saved to '{file_path}'.")
+
+
+def test_save_uploaded_file_deduplicates_content_and_keeps_same_named_files(tmp_path):
+    storage = str(tmp_path)
+    first_path, first_hash = save_uploaded_file(FakeUploadedFile("a.txt", b"one"), storage_path=storage)
+    copy_path, copy_hash = save_uploaded_file(FakeUploadedFile("copy.txt", b"one"), storage_path=storage)
+    changed_path, changed_hash = save_uploaded_file(FakeUploadedFile("a.txt", b"two"), storage_path=storage)
+
+    assert (copy_path, copy_hash) == (first_path, first_hash)  # Stored once
+    assert changed_hash != first_hash
+    with open(first_path, "rb") as f:
+        assert f.read() == b"one"  # Not overwritten by the new a.txt
+    assert read_upload_manifest(storage) == {"a.txt": changed_hash, "copy.txt": first_hash}
+    assert len([name for name in os.listdir(storage) if name.endswith(".txt")]) == 2
 
 
-@patch(OS_PATH_JOIN_PATH, return_value="/fake/path/to/file.pdf")
-@patch(MOCK_OPEN_PATH, side_effect=IOError("Disk full"))
+@patch("core.document_processing.tempfile.mkstemp", side_effect=IOError(28, "No space left on device"))
 @patch(STREAMLIT_ERROR_PATH)
 def test_save_uploaded_file_io_error(
-    mock_st_error, mock_open_file, mock_os_join, mock_logger_fixture
+    mock_st_error, mock_mkstemp, tmp_path, mock_logger_fixture
 ):
-    mock_uploaded_file = MagicMock()
-    mock_uploaded_file.name = "file.pdf"
-    mock_uploaded_file.getbuffer.return_value = b"file_content"
+    result = save_uploaded_file(FakeUploadedFile("file.pdf", b"file_content"), storage_path=str(tmp_path))
 
-    result_path = save_uploaded_file(mock_uploaded_file)
-
-    assert result_path is None
+    assert result == (None, None)
     mock_st_error.assert_called_once()
     mock_logger_fixture.error.assert_called_once()
+    assert os.listdir(tmp_path) == []
+
+
+def test_read_upload_manifest_missing_or_corrupt(tmp_path):
+    assert read_upload_manifest(str(tmp_path)) == {}
+    (tmp_path / UPLOAD_MANIFEST_FILE).write_text("{not json")
+    assert read_upload_manifest(str(tmp_path)) == {}
 
 
 # --- Tests for load_document (Adapted from test_rag_deep.py) ---
@@ -117,6 +144,13 @@ def test_load_document_txt_success(mock_file, mock_basename, mock_logger_fixture
     mock_logger_fixture.info.assert_called_with("Successfully loaded TXT: sample.txt")
 
 
+@patch(MOCK_OPEN_PATH, new_callable=mock_open, read_data="Stored under its content hash.")
+def test_load_document_names_the_upload_but_sources_the_content_hash(mock_file, mock_logger_fixture):
+    documents = load_document("/tmp/pdfs/0123abcd.txt", "report.txt", "0123abcd")
+    assert documents[0].metadata["source"] == "0123abcd"
+    mock_logger_fixture.info.assert_called_with("Successfully loaded TXT: report.txt")
+
+
 @patch(OS_PATH_BASENAME_PATH, return_value="sample.docx")
 @patch(DOCX_MODULE_PATH)  # Mock 'core.document_processing.docx'
 def test_load_document_docx_success(
@@ -258,6 +292,16 @@ def test_load_document_pdf_syntax_error(
     mock_logger_fixture.error.assert_called_once()
 
 
+@patch(PDF_PLUMBER_LOADER_PATH)
+def test_load_document_pdf_pages_are_sourced_by_content_hash(mock_pdf_loader, mock_logger_fixture):
+    mock_pdf_loader.return_value.load.return_value = [
+        LangchainDocument(page_content="page", metadata={"source": "/tmp/pdfs/0123abcd.pdf", "page": 0})
+    ]
+    documents = load_document("/tmp/pdfs/0123abcd.pdf", "report.pdf", "0123abcd")
+    assert documents[0].metadata == {"source": "0123abcd", "page": 0}
+    mock_logger_fixture.info.assert_called_with("Successfully loaded PDF: report.pdf, 1 pages/documents.")
+
+
 # --- Tests for chunk_documents (from previous step, confirmed good) ---
 
 
@@ -338,26 +382,38 @@ def test_chunk_documents_exception(
 
 
 @patch("core.document_processing.st.session_state", new_callable=MagicMock)
-def test_index_documents_success(mock_session_state, mock_logger_fixture):
+def test_index_documents_with_precomputed_embeddings(mock_session_state, mock_logger_fixture):
     mock_vector_db_instance = MagicMock()
     mock_session_state.DOCUMENT_VECTOR_DB = mock_vector_db_instance
+    mock_vector_db_instance.add_embeddings.return_value = ["id1"]
 
-    mock_chunks = [
-        LangchainDocument(page_content="chunk1"),
-        LangchainDocument(page_content="chunk2"),
-    ]
-    index_documents(mock_chunks)
+    mock_chunks = [LangchainDocument(page_content="chunk1")]
+    chunk_ids = index_documents(mock_chunks, embeddings=[[0.5]])
 
-    mock_vector_db_instance.add_documents.assert_called_once_with(mock_chunks)
+    mock_vector_db_instance.add_embeddings.assert_called_once_with(mock_chunks, [[0.5]])
+    assert chunk_ids == ["id1"]
     assert mock_session_state.document_processed is True
-    mock_logger_fixture.info.assert_any_call(
-        f"Indexing {len(mock_chunks)} document chunks."
-    )
     mock_logger_fixture.info.assert_any_call(
         "Document chunks indexed successfully into vector store."
     )
 
 
+@patch("core.document_processing.st.session_state", new_callable=MagicMock)
+def test_index_documents_adds_embedding_blocks_separately(mock_session_state, mock_logger_fixture):
+    mock_vector_db_instance = MagicMock()
+    mock_session_state.DOCUMENT_VECTOR_DB = mock_vector_db_instance
+    mock_vector_db_instance.add_embeddings.side_effect = [["id1", "id2"], ["id3"]]
+
+    mock_chunks = [LangchainDocument(page_content=f"chunk{i}") for i in range(3)]
+    chunk_ids = index_documents(mock_chunks, embedding_blocks=[[[0.1], [0.2]], [[0.3]]])
+
+    assert chunk_ids == ["id1", "id2", "id3"]
+    assert [c.args for c in mock_vector_db_instance.add_embeddings.call_args_list] == [
+        (mock_chunks[:2], [[0.1], [0.2]]),
+        (mock_chunks[2:], [[0.3]]),
+    ]
+
+
 @patch(STREAMLIT_WARNING_PATH)
 def test_index_documents_empty_chunks(mock_st_warning, mock_logger_fixture):
     index_documents([])
@@ -371,16 +427,14 @@ def test_index_documents_empty_chunks(mock_st_warning, mock_logger_fixture):
 
 @patch("core.document_processing.st.session_state", new_callable=MagicMock)
 @patch(STREAMLIT_ERROR_PATH)
-def test_index_documents_exception_on_add(
-    mock_st_error, mock_session_state, mock_logger_fixture
-):
+def test_index_documents_exception_on_add(mock_st_error, mock_session_state, mock_logger_fixture):
     mock_vector_db_instance = MagicMock()
-    mock_vector_db_instance.add_documents.side_effect = Exception("DB Error")
+    mock_vector_db_instance.add_embeddings.side_effect = Exception("DB Error")
     mock_session_state.DOCUMENT_VECTOR_DB = mock_vector_db_instance
     mock_session_state.document_processed = True
 
     mock_chunks = [LangchainDocument(page_content="chunk1")]
-    index_documents(mock_chunks)
+    index_documents(mock_chunks, embeddings=[[0.1]])
 
     mock_st_error.assert_called_once()
     mock_logger_fixture.exception.assert_called_once()
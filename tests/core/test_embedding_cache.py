@@ -0,0 +1,154 @@
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock
+
+# Module to test
+from core.embedding_cache import CachedEmbeddings, text_hash
+
+EMBEDDING_CACHE_LOGGER_PATH = "core.embedding_cache.logger"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(EMBEDDING_CACHE_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture
+def mock_underlying():
+    model = MagicMock(name="MockOllamaEmbeddings")
+    # Vector derived from the text so results are checkable
+    model.embed_documents.side_effect = lambda texts: [[float(len(t)), 1.0, 0.5] for t in texts]
+    model.embed_query.return_value = [0.1, 0.2, 0.3]
+    return model
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "embeddings.sqlite3")
+
+
+def test_misses_call_model_and_hits_do_not(mock_underlying, cache_path):
+    cached = CachedEmbeddings(mock_underlying, "model-a", cache_path=cache_path)
+
+    first = cached.embed_documents(["alpha", "beta"])
+    second = cached.embed_documents(["beta", "alpha"])
+
+    assert mock_underlying.embed_documents.call_count == 1
+    assert first == [[5.0, 1.0, 0.5], [4.0, 1.0, 0.5]]
+    assert second == [first[1], first[0]]
+    stats = cached.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+    assert stats["hit_rate"] == pytest.approx(0.5)
+
+
+def test_only_missing_texts_are_embedded(mock_underlying, cache_path):
+    cached = CachedEmbeddings(mock_underlying, "model-a", cache_path=cache_path)
+    cached.embed_documents(["alpha"])
+
+    cached.embed_documents(["alpha", "gamma", "gamma"])
+
+    # Duplicates inside one call are embedded once
+    mock_underlying.embed_documents.assert_called_with(["gamma"])
+
+
+def test_cache_persists_across_instances(mock_underlying, cache_path):
+    CachedEmbeddings(mock_underlying, "model-a", cache_path=cache_path).embed_documents(["alpha"])
+    mock_underlying.embed_documents.reset_mock()
+
+    reopened = CachedEmbeddings(mock_underlying, "model-a", cache_path=cache_path)
+    assert reopened.embed_documents(["alpha"]) == [[5.0, 1.0, 0.5]]
+    mock_underlying.embed_documents.assert_not_called()
+
+
+def test_cache_is_keyed_by_model_name(mock_underlying, cache_path):
+    CachedEmbeddings(mock_underlying, "model-a", cache_path=cache_path).embed_documents(["alpha"])
+    mock_underlying.embed_documents.reset_mock()
+
+    CachedEmbeddings(mock_underlying, "model-b", cache_path=cache_path).embed_documents(["alpha"])
+    mock_underlying.embed_documents.assert_called_once_with(["alpha"])
+
+
+def test_least_recently_used_entries_are_evicted(mock_underlying, cache_path):
+    cached = CachedEmbeddings(mock_underlying, "model-a", cache_path=cache_path, max_entries=2)
+    with patch("core.embedding_cache.time.time", side_effect=[1.0, 2.0, 3.0, 4.0]):
+        cached.embed_documents(["a"])  # lookup t=1, store t=2
+        cached.embed_documents(["bb"])  # lookup t=3, store t=4
+    with patch("core.embedding_cache.time.time", side_effect=[5.0, 6.0, 7.0]):
+        cached.embed_documents(["a"])  # hit refreshes "a" at t=5
+        cached.embed_documents(["ccc"])  # store at t=7 evicts "bb"
+
+    rows = cached._conn.execute("SELECT text_hash FROM embeddings").fetchall()
+    assert {row[0] for row in rows} == {text_hash("a"), text_hash("ccc")}
+
+
+def test_vectors_round_trip_as_float32(mock_underlying, cache_path):
+    mock_underlying.embed_documents.side_effect = lambda texts: [[0.1, 0.2, 0.3] for _ in texts]
+    cached = CachedEmbeddings(mock_underlying, "model-a", cache_path=cache_path)
+    cached.embed_documents(["alpha"])
+
+    from_cache = cached.embed_documents(["alpha"])
+    np.testing.assert_allclose(from_cache[0], [0.1, 0.2, 0.3], rtol=1e-6)
+
+
+def test_repeated_query_is_embedded_once(mock_underlying, cache_path):
+    cached = CachedEmbeddings(mock_underlying, "model-a", cache_path=cache_path)
+    first = cached.embed_query("question")
+    assert cached.embed_query("question") == first
+    cached.embed_query("another question")
+
+    assert mock_underlying.embed_query.call_count == 2
+    query_stats = cached.stats()["query_cache"]
+    assert (query_stats["hits"], query_stats["misses"]) == (1, 2)
+
+
+def test_query_vectors_are_cached_normalized(mock_underlying, cache_path):
+    cached = CachedEmbeddings(mock_underlying, "model-a", cache_path=cache_path)
+
+    vector = cached.embed_query("question")
+
+    assert np.linalg.norm(vector) == pytest.approx(1.0)
+    np.testing.assert_allclose(vector, np.array([0.1, 0.2, 0.3]) / np.linalg.norm([0.1, 0.2, 0.3]), rtol=1e-6)
+
+
+def test_whitespace_variants_share_a_query_entry_but_case_variants_do_not(mock_underlying, cache_path):
+    cached = CachedEmbeddings(mock_underlying, "model-a", cache_path=cache_path)
+
+    first = cached.embed_query("  What are  the\nUS tariffs? ")
+    assert cached.embed_query("What are the US tariffs?") == first
+    mock_underlying.embed_query.assert_called_once_with("What are the US tariffs?")
+
+    cached.embed_query("what are the us tariffs?")
+    assert mock_underlying.embed_query.call_args_list[-1].args == ("what are the us tariffs?",)
+    assert mock_underlying.embed_query.call_count == 2
+
+
+def test_query_cache_entries_expire(mock_underlying, cache_path):
+    cached = CachedEmbeddings(
+        mock_underlying, "model-a", cache_path=cache_path, query_cache_ttl_seconds=60
+    )
+    with patch("core.cache.time.monotonic", side_effect=[0.0, 30.0, 100.0, 100.0]):
+        cached.embed_query("question")  # Stored at t=0
+        cached.embed_query("question")  # Hit at t=30
+        cached.embed_query("question")  # Expired at t=100, re-embedded
+
+    assert mock_underlying.embed_query.call_count == 2
+
+
+def test_returned_query_vector_is_a_copy(mock_underlying, cache_path):
+    cached = CachedEmbeddings(mock_underlying, "model-a", cache_path=cache_path)
+    first = cached.embed_query("question")
+    cached.embed_query("question").append(99.0)
+    assert cached.embed_query("question") == first
+
+
+def test_unavailable_cache_falls_back_to_model(mock_underlying, tmp_path, mock_logger_fixture):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("file in the way")
+    cached = CachedEmbeddings(mock_underlying, "model-a", cache_path=str(blocker / "cache.sqlite3"))
+
+    assert cached.embed_documents(["alpha"]) == [[5.0, 1.0, 0.5]]
+    assert cached.embed_documents(["alpha"]) == [[5.0, 1.0, 0.5]]
+    assert mock_underlying.embed_documents.call_count == 2
+    mock_logger_fixture.warning.assert_called_once()
@@ -0,0 +1,40 @@
+import pytest
+from unittest.mock import patch, MagicMock, call
+
+# Module to test
+from core.embedding_pipeline import embed_batch_with_retry
+
+EMBEDDING_PIPELINE_LOGGER_PATH = "core.embedding_pipeline.logger"
+SLEEP_PATH = "core.embedding_pipeline.time.sleep"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(EMBEDDING_PIPELINE_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@patch(SLEEP_PATH)
+def test_embed_batch_with_retry_retries_transient_failures(mock_sleep, mock_logger_fixture):
+    model = MagicMock()
+    model.embed_documents.side_effect = [ConnectionError("reset"), ConnectionError("reset"), [[1.0]]]
+
+    vectors = embed_batch_with_retry(model, ["a"], max_retries=3, backoff_seconds=0.5)
+
+    assert vectors == [[1.0]]
+    assert model.embed_documents.call_count == 3
+    assert mock_sleep.call_args_list == [call(0.5), call(1.0)]  # Exponential backoff
+    assert mock_logger_fixture.warning.call_count == 2
+
+
+@patch(SLEEP_PATH)
+def test_embed_batch_with_retry_raises_after_max_retries(mock_sleep, mock_logger_fixture):
+    model = MagicMock()
+    model.embed_documents.side_effect = ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        embed_batch_with_retry(model, ["a"], max_retries=2)
+
+    assert model.embed_documents.call_count == 3
+    mock_logger_fixture.error.assert_called_once()
@@ -3,9 +3,16 @@ from unittest.mock import patch, MagicMock, ANY
 
 # Import LangchainDocument for creating test data
 from langchain_core.documents import Document as LangchainDocument
+from langchain_core.language_models.fake import FakeListLLM, FakeStreamingListLLM
 
 # Modules to test
-from core.generation import generate_answer, generate_summary, generate_keywords
+from core.generation import (
+    generate_answer,
+    stream_answer,
+    generate_summary,
+    generate_keywords,
+    refine_keywords,
+)
 
 # Import config to use its prompt templates, and logger for mocking
 from core import config
@@ -126,6 +133,69 @@ def test_generate_answer_context_docs_no_content(
     )
 
 
+# --- Tests for stream_answer ---
+
+
+def test_stream_answer_yields_chunks_as_generated(mock_doc, mock_logger_fixture):
+    llm = FakeStreamingListLLM(responses=["Streamed answer"])
+
+    chunks = list(stream_answer(llm, "What is X?", [mock_doc("X is Y.")], "History"))
+
+    assert len(chunks) > 1  # Delivered incrementally, not as one block
+    assert "".join(chunks) == "Streamed answer"
+    logged = [call.args[0] for call in mock_logger_fixture.info.call_args_list]
+    assert any(message.startswith("First answer token after") for message in logged)
+    assert any(message.startswith("Answer streamed successfully") for message in logged)
+
+
+def test_stream_answer_validation_messages_are_yielded(mock_doc):
+    llm = FakeStreamingListLLM(responses=["unused"])
+
+    assert list(stream_answer(llm, "", [mock_doc("Content")])) == [
+        "Your question is empty. Please type a question to get an answer."
+    ]
+    assert "couldn't find relevant information" in "".join(stream_answer(llm, "Query", []))
+
+
+def test_stream_answer_error_mid_stream_keeps_partial_text(mock_doc, mock_logger_fixture):
+    llm = FakeStreamingListLLM(responses=["Partial answer"], error_on_chunk_number=3)
+
+    with patch(STREAMLIT_ERROR_PATH) as mock_st_error:
+        text = "".join(stream_answer(llm, "Query", [mock_doc("Content")]))
+
+    assert text.startswith("Par\n\nI'm sorry, but I encountered an error")
+    mock_st_error.assert_called_once()
+    mock_logger_fixture.exception.assert_called_once()
+
+
+def test_stream_answer_empty_response(mock_doc):
+    llm = FakeStreamingListLLM(responses=["   "])
+
+    with patch(STREAMLIT_WARNING_PATH) as mock_st_warning:
+        text = "".join(stream_answer(llm, "Query", [mock_doc("Content")]))
+
+    assert text.endswith("The AI model returned an empty response. Please try rephrasing your question or try again later.")
+    mock_st_warning.assert_called_once()
+
+
+def test_stream_answer_on_complete_only_after_success(mock_doc):
+    completed = []
+    answer = "".join(
+        stream_answer(
+            FakeStreamingListLLM(responses=["Full answer"]),
+            "Query",
+            [mock_doc("Content")],
+            on_complete=completed.append,
+        )
+    )
+    failing_llm = FakeStreamingListLLM(responses=["Partial answer"], error_on_chunk_number=3)
+
+    with patch(STREAMLIT_ERROR_PATH):
+        "".join(stream_answer(failing_llm, "Query", [mock_doc("Content")], on_complete=completed.append))
+
+    assert completed == [answer] == ["Full answer"]
+
+
 # --- Tests for generate_summary ---
 
 # Removed @patch(CHAT_PROMPT_TEMPLATE_PATH)
@@ -238,3 +308,38 @@ def test_generate_keywords_llm_returns_empty(
     mock_logger_fixture.warning.assert_called_once_with(
         "AI model returned no keywords."
     )
+
+
+# --- Tests for refine_keywords ---
+
+
+def test_refine_keywords_prompts_with_candidates_only(mock_logger_fixture):
+    llm = FakeListLLM(responses=["refund policy, shipping"])
+
+    with patch.object(FakeListLLM, "invoke", wraps=llm.invoke) as mock_invoke:
+        keywords = refine_keywords(llm, ["refund", "policy", "shipping"])
+
+    assert keywords == "refund policy, shipping"
+    prompt_text = mock_invoke.call_args.args[0].to_string()
+    assert "refund, policy, shipping" in prompt_text
+    mock_logger_fixture.info.assert_any_call("Keywords refined successfully.")
+
+
+def test_refine_keywords_no_candidates(mock_logger_fixture):
+    assert refine_keywords(FakeListLLM(responses=["unused"]), []) is None
+    mock_logger_fixture.warning.assert_called_once_with(
+        "refine_keywords called with no candidate keywords."
+    )
+
+
+def test_refine_keywords_llm_failure(mock_doc, mock_logger_fixture):
+    llm = FakeListLLM(responses=["unused"])
+
+    with patch.object(FakeListLLM, "invoke", side_effect=Exception("LLM down")), \
+         patch(STREAMLIT_ERROR_PATH) as mock_st_error:
+        keywords = refine_keywords(llm, ["refund"])
+
+    assert keywords.startswith("Failed to extract keywords due to an AI model error.")
+    mock_st_error.assert_called_once()
+    mock_logger_fixture.exception.assert_called_once()
+
@@ -0,0 +1,228 @@
+import pytest
+import hashlib
+import json
+import os
+import numpy as np
+from unittest.mock import patch
+
+from langchain_core.documents import Document as LangchainDocument
+
+from core.chunk_store import TextSpan, text_memory_bytes
+from core.vector_store import NumpyVectorStore
+
+# Module to test
+from core import index_store
+from core.index_store import (
+    IndexSegment,
+    compute_file_hash,
+    segment_directory,
+    save_segment,
+    load_segment,
+    PARSER_VERSION,
+    bm25_term_frequencies,
+    chunk_term_frequencies,
+)
+
+INDEX_STORE_LOGGER_PATH = "core.index_store.logger"
+EMBEDDING_MODEL = "test-embed:1b"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(INDEX_STORE_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture(autouse=True)
+def clear_segment_cache():
+    """Segments are cached per process with st.cache_resource; isolate tests."""
+    index_store._open_segment.clear()
+    yield
+    index_store._open_segment.clear()
+
+
+@pytest.fixture
+def sample_segment_data():
+    raw_documents = [
+        LangchainDocument(page_content="Page one text.", metadata={"source": "a.pdf", "page": 0}),
+        LangchainDocument(page_content="Page two — ünïcode.", metadata={"source": "a.pdf", "page": 1}),
+    ]
+    chunks = [
+        LangchainDocument(page_content="Page one", metadata={"source": "a.pdf", "start_index": 0}),
+        LangchainDocument(page_content="text two ünïcode", metadata={"source": "a.pdf", "start_index": 9}),
+        LangchainDocument(page_content="", metadata={"source": "a.pdf", "start_index": 20}),
+    ]
+    embeddings = np.arange(9, dtype=np.float32).reshape(3, 3)
+    term_freqs = chunk_term_frequencies(chunks)
+    return raw_documents, chunks, embeddings, term_freqs
+
+
+def test_compute_file_hash_matches_hashlib(tmp_path):
+    file_path = tmp_path / "sample.bin"
+    content = os.urandom(3 * 1024 * 1024 + 17)  # Spans several hash blocks
+    file_path.write_bytes(content)
+    assert compute_file_hash(str(file_path)) == hashlib.sha256(content).hexdigest()
+
+
+def test_segment_directory_is_model_specific(tmp_path):
+    dir_a = segment_directory("abc", "model:a", str(tmp_path))
+    dir_b = segment_directory("abc", "org/model:b", str(tmp_path))
+    assert dir_a != dir_b
+    assert os.path.dirname(dir_a) == os.path.dirname(dir_b) == os.path.join(str(tmp_path), "abc")
+    assert ":" not in os.path.basename(dir_a) and "/" not in os.path.basename(dir_b)
+
+
+def test_save_and_load_segment_roundtrip(tmp_path, sample_segment_data):
+    raw_documents, chunks, embeddings, term_freqs = sample_segment_data
+
+    assert save_segment("hash1", raw_documents, chunks, embeddings, term_freqs, EMBEDDING_MODEL, str(tmp_path))
+    segment = load_segment("hash1", EMBEDDING_MODEL, str(tmp_path))
+
+    assert segment is not None
+    assert len(segment) == 3
+    assert [doc.page_content for doc in segment.chunks] == [c.page_content for c in chunks]
+    assert segment.chunks[1].metadata == chunks[1].metadata
+    assert segment.chunks[-1].page_content == ""
+    assert [doc.page_content for doc in segment.raw_documents] == [d.page_content for d in raw_documents]
+    assert isinstance(segment.embeddings, np.memmap)
+    assert not segment.embeddings.flags.writeable
+    # Stored unit-length, as the vector store keeps them
+    np.testing.assert_allclose(np.asarray(segment.embeddings), NumpyVectorStore._normalize(embeddings), rtol=1e-6)
+    assert segment.bm25_term_freqs == term_freqs
+    assert segment.meta["embedding_model"] == EMBEDDING_MODEL
+
+
+def test_record_file_bounds_and_slices(tmp_path, sample_segment_data):
+    raw_documents, chunks, embeddings, term_freqs = sample_segment_data
+    save_segment("hash1", raw_documents, chunks, embeddings, term_freqs, EMBEDDING_MODEL, str(tmp_path))
+    segment = load_segment("hash1", EMBEDDING_MODEL, str(tmp_path))
+
+    assert [doc.page_content for doc in segment.chunks[0:2]] == ["Page one", "text two ünïcode"]
+    with pytest.raises(IndexError):
+        segment.chunks[3]
+
+
+def test_record_spans_decode_lazily_and_are_shared(tmp_path, sample_segment_data):
+    raw_documents, chunks, embeddings, term_freqs = sample_segment_data
+    save_segment("hash1", raw_documents, chunks, embeddings, term_freqs, EMBEDDING_MODEL, str(tmp_path))
+    segment = load_segment("hash1", EMBEDDING_MODEL, str(tmp_path))
+
+    spans = segment.chunks.spans
+
+    assert all(isinstance(span, TextSpan) for span in spans)
+    assert [span.to_document() for span in spans] == chunks
+    assert load_segment("hash1", EMBEDDING_MODEL, str(tmp_path)).chunks.spans is spans  # One per process
+    assert text_memory_bytes(spans) == 0  # Mapped, not held by the session
+
+
+def test_segment_with_unnormalized_embeddings_is_normalized_read_only(tmp_path, sample_segment_data):
+    raw_documents, chunks, embeddings, term_freqs = sample_segment_data
+    save_segment("hash1", raw_documents, chunks, embeddings, term_freqs, EMBEDDING_MODEL, str(tmp_path))
+    directory = segment_directory("hash1", EMBEDDING_MODEL, str(tmp_path))
+    np.save(os.path.join(directory, "embeddings.npy"), embeddings)  # As written before normalization
+    meta_path = os.path.join(directory, "meta.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    del meta["normalized"]
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+    segment = IndexSegment(directory)
+
+    np.testing.assert_allclose(segment.embeddings, NumpyVectorStore._normalize(embeddings), rtol=1e-6)
+    assert not segment.embeddings.flags.writeable
+
+
+def test_load_segment_missing_returns_none(tmp_path):
+    assert load_segment("does-not-exist", EMBEDDING_MODEL, str(tmp_path)) is None
+
+
+def test_load_segment_other_model_returns_none(tmp_path, sample_segment_data):
+    save_segment("hash1", *sample_segment_data, EMBEDDING_MODEL, str(tmp_path))
+    assert load_segment("hash1", "another-model", str(tmp_path)) is None
+
+
+def test_load_segment_ignores_old_format(tmp_path, sample_segment_data):
+    save_segment("hash1", *sample_segment_data, EMBEDDING_MODEL, str(tmp_path))
+    meta_path = os.path.join(segment_directory("hash1", EMBEDDING_MODEL, str(tmp_path)), "meta.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["format_version"] = -1
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+    assert load_segment("hash1", EMBEDDING_MODEL, str(tmp_path)) is None
+
+
+def test_segment_of_an_older_parser_is_ignored_then_replaced(tmp_path, sample_segment_data):
+    raw_documents, chunks, embeddings, term_freqs = sample_segment_data
+    assert save_segment("hash1", *sample_segment_data, EMBEDDING_MODEL, str(tmp_path))
+    meta_path = os.path.join(segment_directory("hash1", EMBEDDING_MODEL, str(tmp_path)), "meta.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    del meta["parser_version"]  # Written before the parser version was recorded
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    assert load_segment("hash1", EMBEDDING_MODEL, str(tmp_path)) is None
+
+    reparsed = [LangchainDocument(page_content="Reparsed", metadata={"source": "hash1"})]
+    assert save_segment(
+        "hash1", raw_documents, reparsed * 3, embeddings, term_freqs, EMBEDDING_MODEL, str(tmp_path)
+    )
+
+    segment = load_segment("hash1", EMBEDDING_MODEL, str(tmp_path))
+    assert segment.meta["parser_version"] == PARSER_VERSION
+    assert segment.chunks[0].page_content == "Reparsed"
+    parent = os.path.dirname(segment_directory("hash1", EMBEDDING_MODEL, str(tmp_path)))
+    assert not [name for name in os.listdir(parent) if name.startswith(".")]
+
+
+def test_save_segment_rejects_mismatched_lengths(tmp_path, sample_segment_data, mock_logger_fixture):
+    raw_documents, chunks, embeddings, term_freqs = sample_segment_data
+    assert not save_segment("hash1", raw_documents, chunks, embeddings[:2], term_freqs, EMBEDDING_MODEL, str(tmp_path))
+    mock_logger_fixture.error.assert_called_once()
+    assert not os.path.exists(segment_directory("hash1", EMBEDDING_MODEL, str(tmp_path)))
+
+
+def test_save_segment_is_idempotent(tmp_path, sample_segment_data):
+    assert save_segment("hash1", *sample_segment_data, EMBEDDING_MODEL, str(tmp_path))
+    assert save_segment("hash1", *sample_segment_data, EMBEDDING_MODEL, str(tmp_path))
+    parent = os.path.dirname(segment_directory("hash1", EMBEDDING_MODEL, str(tmp_path)))
+    assert not [name for name in os.listdir(parent) if name.startswith(".tmp-")]
+
+
+def test_chunk_term_frequencies_uses_analyzer():
+    chunks = [LangchainDocument(page_content="The policies,\nthe POLICY.")]
+    assert chunk_term_frequencies(chunks) == [{"policy": 2}]
+
+
+def test_segment_keeps_the_words_behind_stemmed_terms(tmp_path, sample_segment_data):
+    raw_documents, _, embeddings, _ = sample_segment_data
+    chunks = [LangchainDocument(page_content=text) for text in ("data analysis", "policies", "")]
+    surface_forms = {}
+    term_freqs = chunk_term_frequencies(chunks, surface_forms)
+    assert save_segment(
+        "hash1", raw_documents, chunks, embeddings, term_freqs, EMBEDDING_MODEL, str(tmp_path), surface_forms
+    )
+
+    segment = load_segment("hash1", EMBEDDING_MODEL, str(tmp_path))
+
+    assert segment.surface_forms == {"analysi": {"analysis": 1}, "policy": {"policies": 1}}
+
+
+def test_segment_from_other_analyzer_is_retokenized(tmp_path, sample_segment_data):
+    raw_documents, chunks, embeddings, _ = sample_segment_data
+    stale_freqs = bm25_term_frequencies(chunk.page_content.lower().split(" ") for chunk in chunks)
+    assert save_segment("hash1", raw_documents, chunks, embeddings, stale_freqs, EMBEDDING_MODEL, str(tmp_path))
+    meta_path = os.path.join(segment_directory("hash1", EMBEDDING_MODEL, str(tmp_path)), "meta.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["analyzer"] = "lower-split-space"
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+    segment = load_segment("hash1", EMBEDDING_MODEL, str(tmp_path))
+
+    assert segment.bm25_term_freqs == chunk_term_frequencies(chunks)
+    assert segment.surface_forms == {}
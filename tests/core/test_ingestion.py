@@ -0,0 +1,228 @@
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock
+
+from langchain_core.documents import Document as LangchainDocument
+
+# Module to test
+from core import ingestion
+from core.ingestion import ingest_files
+from core.index_store import IndexSegment, save_segment, segment_directory
+
+INGESTION_LOGGER_PATH = "core.ingestion.logger"
+LOAD_DOCUMENT_PATH = "core.ingestion.load_document"
+CHUNK_DOCUMENTS_PATH = "core.ingestion.chunk_documents"
+LOAD_PARSED_DOCUMENTS_PATH = "core.ingestion.load_parsed_documents"
+SAVE_PARSED_DOCUMENTS_PATH = "core.ingestion.save_parsed_documents"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(INGESTION_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture(autouse=True)
+def mock_parse_cache():
+    """Keeps the parse cache out of tests that don't use it: every lookup misses."""
+    with patch(LOAD_PARSED_DOCUMENTS_PATH, return_value=None) as mock_load, \
+         patch(SAVE_PARSED_DOCUMENTS_PATH) as mock_save:
+        yield mock_load, mock_save
+
+
+@pytest.fixture
+def mock_embedding_model():
+    model = MagicMock(name="MockEmbeddingModel")
+    model.embed_documents.side_effect = lambda texts: [[float(len(t)), 1.0] for t in texts]
+    return model
+
+
+def fake_load_document(file_path, file_name=None, file_hash=None):
+    return [LangchainDocument(page_content=f"text of {file_path}", metadata={"source": file_path})]
+
+
+def fake_chunk_documents(raw_documents):
+    text = raw_documents[0].page_content
+    return [LangchainDocument(page_content=text[:n]) for n in range(1, 6)]
+
+
+@patch(CHUNK_DOCUMENTS_PATH, side_effect=fake_chunk_documents)
+@patch(LOAD_DOCUMENT_PATH, side_effect=fake_load_document)
+def test_ingest_files_parses_chunks_and_embeds_in_order(
+    mock_load, mock_chunk, mock_embedding_model
+):
+    files = [("a.txt", "/tmp/a.txt", "hash-a"), ("b.txt", "/tmp/b.txt", "hash-b")]
+    status = MagicMock()
+
+    results = ingest_files(
+        files, mock_embedding_model, status_callback=status, max_workers=1, batch_size=2
+    )
+
+    assert [r.filename for r in results] == ["a.txt", "b.txt"]
+    assert [r.file_hash for r in results] == ["hash-a", "hash-b"]
+    for result in results:
+        assert result.error is None
+        assert len(result.chunks) == 5
+        assert result.embeddings.dtype == np.float32
+        assert result.embeddings[:, 0].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert result.bm25_term_freqs[4] == {"text": 1}
+    status.assert_any_call("a.txt", "✅ Ready (5 chunks)")
+    status.assert_any_call("b.txt", "Parsing...")
+    # Stored paths are content hashes; the loader is given the uploaded names
+    assert [c.args for c in mock_load.call_args_list] == [
+        ("/tmp/a.txt", "a.txt", "hash-a"),
+        ("/tmp/b.txt", "b.txt", "hash-b"),
+    ]
+
+
+@patch(CHUNK_DOCUMENTS_PATH, side_effect=fake_chunk_documents)
+@patch(LOAD_DOCUMENT_PATH, side_effect=fake_load_document)
+def test_ingest_files_reports_embedding_progress(mock_load, mock_chunk, mock_embedding_model):
+    status = MagicMock()
+
+    ingest_files(
+        [("a.txt", "/tmp/a.txt", "hash-a")], mock_embedding_model,
+        status_callback=status, max_workers=1, batch_size=1, embedding_workers=2,
+    )
+
+    # One chunk per batch, so the counts don't depend on which batch finishes first.
+    assert [c.args[1] for c in status.call_args_list][-5:] == [
+        "Embedded 1/5 chunks...",
+        "Embedded 2/5 chunks...",
+        "Embedded 3/5 chunks...",
+        "Embedded 4/5 chunks...",
+        "✅ Ready (5 chunks)",
+    ]
+
+
+@patch(CHUNK_DOCUMENTS_PATH)
+@patch(LOAD_DOCUMENT_PATH, return_value=[])
+def test_ingest_files_reports_unloadable_document(mock_load, mock_chunk, mock_embedding_model):
+    results = ingest_files([("bad.pdf", "/tmp/bad.pdf", "h")], mock_embedding_model)
+
+    assert "Could not load document from 'bad.pdf'" in results[0].error
+    mock_embedding_model.embed_documents.assert_not_called()
+
+
+@patch(CHUNK_DOCUMENTS_PATH, return_value=[])
+@patch(LOAD_DOCUMENT_PATH, side_effect=fake_load_document)
+def test_ingest_files_keeps_documents_without_chunks(mock_load, mock_chunk, mock_embedding_model):
+    results = ingest_files([("blank.txt", "/tmp/blank.txt", "h")], mock_embedding_model)
+
+    assert results[0].error is None
+    assert len(results[0].raw_documents) == 1
+    assert results[0].chunks == []
+    assert results[0].embeddings is None
+
+
+@patch(CHUNK_DOCUMENTS_PATH, side_effect=lambda raw_documents: list(raw_documents))
+@patch(LOAD_DOCUMENT_PATH, side_effect=fake_load_document)
+def test_ingest_files_isolates_embedding_failures(
+    mock_load, mock_chunk, mock_logger_fixture
+):
+    model = MagicMock()
+
+    def embed(texts):
+        if any("bad" in text for text in texts):
+            raise ConnectionError("ollama down")
+        return [[1.0] for _ in texts]
+
+    model.embed_documents.side_effect = embed
+    files = [("good.txt", "/tmp/good.txt", "g"), ("bad.txt", "/tmp/bad.txt", "b")]
+
+    with patch("core.embedding_pipeline.time.sleep"):
+        results = ingest_files(files, model, max_workers=1)
+
+    assert results[0].error is None
+    assert results[0].embeddings.shape == (1, 1)
+    assert results[1].error.startswith("Failed to embed 'bad.txt'")
+    mock_logger_fixture.exception.assert_called_once()
+
+
+@patch(LOAD_DOCUMENT_PATH, side_effect=RuntimeError("parser crashed"))
+def test_ingest_files_reports_parse_exceptions(mock_load, mock_embedding_model):
+    results = ingest_files([("x.docx", "/tmp/x.docx", "h")], mock_embedding_model)
+
+    assert results[0].error == "Failed to parse 'x.docx'. Details: parser crashed"
+
+
+def test_ingested_file_from_segment(tmp_path):
+    raw_documents = [LangchainDocument(page_content="raw word", metadata={"source": "a.txt"})]
+    chunks = [LangchainDocument(page_content="word", metadata={"source": "a.txt", "start_index": 4})]
+    save_segment("h", raw_documents, chunks, np.array([[3.0, 4.0]]), [{"word": 1}], storage_path=str(tmp_path))
+    segment = IndexSegment(segment_directory("h", storage_path=str(tmp_path)))
+
+    restored = ingestion.IngestedFile.from_segment("a.txt", "/tmp/a.txt", "h", segment)
+
+    assert [chunk.to_document() for chunk in restored.chunks] == chunks
+    # The segment's mapped records and embeddings, not per-session copies
+    assert restored.chunks is segment.chunks.spans
+    assert restored.raw_documents is segment.raw_documents.spans
+    assert restored.embeddings is segment.embeddings
+    assert restored.bm25_term_freqs == [{"word": 1}]
+    assert restored.needs_saving is False
+    assert restored.error is None
+
+
+@patch(CHUNK_DOCUMENTS_PATH, side_effect=fake_chunk_documents)
+@patch(LOAD_DOCUMENT_PATH)
+def test_parse_and_chunk_uses_cached_pages(mock_load, mock_chunk, mock_parse_cache):
+    mock_load_parsed, mock_save_parsed = mock_parse_cache
+    cached = fake_load_document("/tmp/a.pdf")
+    mock_load_parsed.return_value = cached
+
+    raw_documents, chunks, _, _ = ingestion.parse_and_chunk("/tmp/a.pdf", "hash-a")
+
+    assert raw_documents == cached
+    assert len(chunks) == 5
+    mock_load_parsed.assert_called_once_with("hash-a", ".pdf")
+    mock_load.assert_not_called()
+    mock_save_parsed.assert_not_called()
+
+
+@patch(CHUNK_DOCUMENTS_PATH, side_effect=fake_chunk_documents)
+@patch(LOAD_DOCUMENT_PATH, side_effect=fake_load_document)
+def test_parse_and_chunk_caches_new_parses(mock_load, mock_chunk, mock_parse_cache):
+    mock_load_parsed, mock_save_parsed = mock_parse_cache
+
+    raw_documents, _, _, _ = ingestion.parse_and_chunk("/tmp/a.txt", "hash-a", "notes.txt")
+
+    mock_load.assert_called_once_with("/tmp/a.txt", "notes.txt", "hash-a")
+    mock_save_parsed.assert_called_once_with("hash-a", ".txt", raw_documents)
+
+
+@patch(CHUNK_DOCUMENTS_PATH)
+@patch(LOAD_DOCUMENT_PATH, return_value=[])
+def test_parse_and_chunk_does_not_cache_failures_or_unhashed_files(mock_load, mock_chunk, mock_parse_cache):
+    mock_load_parsed, mock_save_parsed = mock_parse_cache
+
+    ingestion.parse_and_chunk("/tmp/bad.pdf", "hash-bad")
+    ingestion.parse_and_chunk("/tmp/other.pdf")
+
+    mock_load_parsed.assert_called_once_with("hash-bad", ".pdf")
+    mock_save_parsed.assert_not_called()
+
+
+def test_ingest_files_empty_input(mock_embedding_model):
+    assert ingest_files([], mock_embedding_model) == []
+
+
+def test_ingest_files_parses_in_process_pool(tmp_path, monkeypatch, mock_embedding_model):
+    monkeypatch.setenv("PARSE_CACHE_PATH", str(tmp_path / "parse_cache"))  # Read by the workers
+    files = []
+    for name in ("one.txt", "two.txt"):
+        path = tmp_path / name
+        path.write_text(f"Contents of {name}. " * 20)
+        files.append((name, str(path), name))
+
+    try:
+        results = ingest_files(files, mock_embedding_model, max_workers=2)
+    finally:
+        ingestion._get_parse_pool(2).shutdown()
+        ingestion._get_parse_pool.clear()
+
+    for result in results:
+        assert result.error is None
+        assert result.chunks
+        assert result.embeddings.shape == (len(result.chunks), 2)
@@ -0,0 +1,100 @@
+import pytest
+from unittest.mock import patch
+
+from langchain_core.documents import Document as LangchainDocument
+
+# Module to test
+from core.keywords import extract_keywords
+from core.analyzer import DEFAULT_ANALYZER
+from core.search_pipeline import IncrementalBM25
+
+KEYWORDS_LOGGER_PATH = "core.keywords.logger"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(KEYWORDS_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+def build_index(texts, surface_forms=None):
+    index = IncrementalBM25()
+    term_freqs = []
+    for text in texts:
+        counts = {}
+        for term in DEFAULT_ANALYZER.analyze(text, surface_forms):
+            counts[term] = counts.get(term, 0) + 1
+        term_freqs.append(counts)
+    index.add_documents(
+        [LangchainDocument(page_content=text) for text in texts],
+        term_freqs,
+        [f"id-{i}" for i in range(len(texts))],
+    )
+    return index
+
+
+CORPUS = [
+    "Refunds are issued within 30 days. Refunds need a receipt. Report 2024.",
+    "Refunds for damaged items are issued as store credit. Report 2024.",
+    "Shipping takes five days. Shipping is free over 50 dollars. Report 2024.",
+    "Shipping to islands costs extra. Report 2024.",
+    "Warranty claims need the serial number. Report 2024.",
+]
+
+
+def test_extract_keywords_ranks_frequent_concentrated_terms_first():
+    keywords = extract_keywords(build_index(CORPUS), top_n=3)
+
+    assert keywords[:2] == ["refund", "shipping"]  # Plurals folded by the analyzer
+    assert "report" not in keywords  # In every chunk
+    assert "2024" not in keywords  # Numbers are not keywords
+
+
+def test_extract_keywords_skips_single_mentions():
+    keywords = extract_keywords(build_index(CORPUS), top_n=50)
+
+    assert "warranty" not in keywords
+    assert "islands" not in keywords and "island" not in keywords
+
+
+def test_extract_keywords_ignores_deleted_chunks():
+    index = build_index(CORPUS)
+    index.delete(["id-0", "id-1"])
+
+    keywords = extract_keywords(index, top_n=3)
+
+    assert keywords[0] == "shipping"
+    assert "refund" not in keywords
+
+
+def test_extract_keywords_without_index():
+    assert extract_keywords(None) == []
+    assert extract_keywords(IncrementalBM25()) == []
+
+
+def test_extract_keywords_single_chunk_ranks_by_frequency():
+    keywords = extract_keywords(build_index(["Gamma rays and gamma bursts from pulsars."]), top_n=2)
+
+    assert keywords[0] == "gamma"
+
+
+def test_extract_keywords_shows_words_not_stems():
+    texts = [
+        "The analysis covers a series of tests. The analysis is final.",
+        "Another analysis of the series. Analysis results follow.",
+        "Weather in Texas.",
+    ]
+    surface_forms = {}
+    index = build_index(texts, surface_forms)
+
+    assert extract_keywords(index, top_n=2) == ["analysi", "sery"]  # The stems themselves
+    assert extract_keywords(index, top_n=2, surface_forms=surface_forms) == ["analysis", "series"]
+
+
+def test_extract_keywords_shows_the_most_frequent_word_behind_a_term():
+    surface_forms = {}
+    index = build_index(["Policy and policy.", "Policies and policy.", "Other text."], surface_forms)
+
+    # "policy" three times, "policies" once
+    assert extract_keywords(index, top_n=1, surface_forms=surface_forms) == ["policy"]
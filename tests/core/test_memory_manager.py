@@ -0,0 +1,240 @@
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+
+from langchain_core.documents import Document as LangchainDocument
+
+# Module to test
+from core.memory_manager import SessionTracker, track_session, end_session_run, MEGABYTE
+from core.corpus_registry import Corpus
+
+MEMORY_MANAGER_LOGGER_PATH = "core.memory_manager.logger"
+EVICT_DOCUMENTS_PATH = "core.memory_manager.evict_documents"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(MEMORY_MANAGER_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture
+def mock_evict():
+    with patch(EVICT_DOCUMENTS_PATH) as mock_evict:
+        yield mock_evict
+
+
+def make_corpus(text):
+    """Corpus of one file with a one-chunk text."""
+    corpus = Corpus(MagicMock(name="Embedding"))
+    chunk = LangchainDocument(page_content=text)
+    chunk_ids = corpus.vector_db.add_embeddings([chunk], [[1.0, 0.0]])
+    corpus.add_file(f"hash-{text}", [LangchainDocument(page_content=text)], [chunk], chunk_ids, [{text: 1}])
+    return corpus
+
+
+def make_state(corpus=None, chat=()):
+    return {
+        "corpus": corpus if corpus is not None else Corpus(MagicMock(name="Embedding")),
+        "messages": [{"role": "user", "content": content} for content in chat],
+    }
+
+
+def corpus_bytes(corpus):
+    return sum(corpus.memory_bytes().values())
+
+
+def test_memory_report_counts_a_shared_corpus_once():
+    shared = make_corpus("shared")
+    tracker = SessionTracker(is_open=lambda session_id: True)
+    tracker.touch("a", make_state(shared, chat=["hello"]), now=0)
+    tracker.touch("b", make_state(shared), now=50)
+    tracker.touch("c", make_state(), now=100)
+
+    report = tracker.memory_report(now=100)
+
+    sessions = report["sessions"]
+    assert sessions["a"]["chat"] == len("hello")
+    assert sessions["a"]["text"] == 2 * len("shared")  # Raw document and chunk
+    assert sessions["a"]["total"] == corpus_bytes(shared) + len("hello")
+    assert sessions["a"]["shared_with"] == 1 and sessions["c"]["shared_with"] == 0
+    assert sessions["a"]["idle_seconds"] == 100 and sessions["b"]["idle_seconds"] == 50
+    assert sessions["c"]["total"] == 0
+    assert report["total"] == corpus_bytes(shared) + len("hello")
+
+
+def test_enforce_budget_within_budget_evicts_nothing(mock_evict):
+    tracker = SessionTracker(budget_bytes=MEGABYTE, idle_seconds=10, is_open=lambda session_id: True)
+    tracker.touch("a", make_state(make_corpus("apple")), now=0)
+
+    assert tracker.enforce_budget("b", now=1000) == 0
+    mock_evict.assert_not_called()
+
+
+def test_enforce_budget_evicts_longest_idle_sessions_until_within_budget(mock_evict):
+    corpora = {name: make_corpus(name * 100) for name in ("old", "older", "recent", "current")}
+    states = {name: make_state(corpus) for name, corpus in corpora.items()}
+    tracker = SessionTracker(
+        budget_bytes=sum(corpus_bytes(corpora[name]) for name in ("old", "recent", "current")),
+        idle_seconds=60,
+        is_open=lambda session_id: True,
+    )
+    tracker.touch("older", states["older"], now=0)
+    tracker.touch("old", states["old"], now=10)
+    tracker.touch("recent", states["recent"], now=990)  # Not idle
+    tracker.touch("current", states["current"], now=0)
+
+    assert tracker.enforce_budget("current", now=1000) == 1
+
+    mock_evict.assert_called_once_with(states["older"])
+    assert tracker.evictions == 1
+
+
+def test_enforce_budget_skips_corpus_still_used_by_an_active_session(mock_evict):
+    shared = make_corpus("shared" * 100)
+    private = make_corpus("private" * 100)
+    states = {"idle-shared": make_state(shared), "idle-private": make_state(private)}
+    tracker = SessionTracker(budget_bytes=1, idle_seconds=60, is_open=lambda session_id: True)
+    tracker.touch("idle-shared", states["idle-shared"], now=0)  # Longest idle
+    tracker.touch("idle-private", states["idle-private"], now=10)
+    tracker.touch("active", make_state(shared), now=1000)
+
+    assert tracker.enforce_budget("active", now=1000) == 1
+
+    mock_evict.assert_called_once_with(states["idle-private"])
+
+
+def test_enforce_budget_evicts_every_idle_holder_of_a_shared_corpus(mock_evict):
+    shared = make_corpus("shared" * 100)
+    first, second = make_state(shared), make_state(shared)
+    tracker = SessionTracker(budget_bytes=1, idle_seconds=60, is_open=lambda session_id: True)
+    tracker.touch("first", first, now=0)
+    tracker.touch("second", second, now=10)
+
+    assert tracker.enforce_budget(now=1000) == 2
+
+    assert [call.args[0] for call in mock_evict.call_args_list] == [first, second]
+
+
+def test_enforce_budget_continues_after_a_failed_eviction(mock_evict, mock_logger_fixture):
+    failing, working = make_state(make_corpus("a" * 100)), make_state(make_corpus("b" * 100))
+    mock_evict.side_effect = [RuntimeError("boom"), None]
+    tracker = SessionTracker(budget_bytes=1, idle_seconds=60, is_open=lambda session_id: True)
+    tracker.touch("failing", failing, now=0)
+    tracker.touch("working", working, now=10)
+
+    assert tracker.enforce_budget(now=1000) == 1
+    mock_logger_fixture.exception.assert_called_once()
+
+
+def test_enforce_budget_never_evicts_a_session_with_a_run_in_progress(mock_evict):
+    long_run, idle = make_state(make_corpus("a" * 100)), make_state(make_corpus("b" * 100))
+    tracker = SessionTracker(budget_bytes=1, idle_seconds=60, is_open=lambda session_id: True)
+    started, finish = threading.Event(), threading.Event()
+
+    def run():
+        tracker.begin_run("long-run", long_run, now=0)  # Started long ago, still running
+        started.set()
+        finish.wait()
+        tracker.end_run("long-run", now=2000)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    started.wait()
+    tracker.touch("idle", idle, now=10)
+    try:
+        assert tracker.memory_report(now=1000)["sessions"]["long-run"]["running"] is True
+        assert tracker.enforce_budget("current", now=1000) == 1
+        mock_evict.assert_called_once_with(idle)
+    finally:
+        finish.set()
+        thread.join()
+
+    usage = tracker.memory_report(now=2030)["sessions"]["long-run"]
+    assert usage["running"] is False and usage["idle_seconds"] == 30  # Idle from the end of the run
+    tracker.enforce_budget("current", now=2100)
+    assert long_run in [call.args[0] for call in mock_evict.call_args_list]
+
+
+def test_run_stopped_before_end_run_is_over_when_its_thread_ends(mock_evict):
+    state = make_state(make_corpus("a" * 100))
+    tracker = SessionTracker(budget_bytes=1, idle_seconds=60, is_open=lambda session_id: True)
+    thread = threading.Thread(target=tracker.begin_run, args=("stopped", state), kwargs={"now": 0})
+    thread.start()
+    thread.join()
+
+    assert tracker.enforce_budget("current", now=1000) == 1
+    mock_evict.assert_called_once_with(state)
+
+
+def test_zero_budget_disables_eviction(mock_evict):
+    tracker = SessionTracker(budget_bytes=0, idle_seconds=0, is_open=lambda session_id: True)
+    tracker.touch("a", make_state(make_corpus("apple")), now=0)
+
+    assert tracker.enforce_budget(now=1000) == 0
+    mock_evict.assert_not_called()
+
+
+def test_closed_sessions_are_forgotten():
+    open_sessions = {"a", "b"}
+    tracker = SessionTracker(is_open=lambda session_id: session_id in open_sessions)
+    tracker.touch("a", make_state(), now=0)
+    tracker.touch("b", make_state(), now=0)
+
+    open_sessions.discard("a")
+
+    assert list(tracker.memory_report(now=1)["sessions"]) == ["b"]
+    assert len(tracker) == 1
+
+
+def test_evicted_session_is_reported_without_documents():
+    # Real eviction: the session state is unloaded through session_manager
+    state = make_state(make_corpus("apple" * 100), chat=["question"])
+    state.update(
+        {
+            "corpus_handle": None,
+            "corpus_version": "version",
+            "DOCUMENT_VECTOR_DB": state["corpus"].vector_db,
+        }
+    )
+    tracker = SessionTracker(budget_bytes=1, idle_seconds=60, is_open=lambda session_id: True)
+    tracker.touch("idle", state, now=0)
+
+    assert tracker.enforce_budget(now=1000) == 1
+
+    usage = tracker.memory_report(now=1000)["sessions"]["idle"]
+    assert usage["total"] == usage["chat"] == len("question")
+    assert state["evicted_corpus_version"] == "version"
+
+
+@patch("core.memory_manager.session_tracker")
+@patch("core.memory_manager.get_script_run_ctx")
+def test_track_session_records_the_current_session(mock_get_ctx, mock_tracker):
+    mock_get_ctx.return_value = MagicMock(session_id="session-1", session_state="state")
+
+    track_session()
+
+    mock_tracker.begin_run.assert_called_once_with("session-1", "state")
+    mock_tracker.enforce_budget.assert_called_once_with("session-1")
+
+
+@patch("core.memory_manager.session_tracker")
+@patch("core.memory_manager.get_script_run_ctx")
+def test_end_session_run_records_the_end_of_the_run(mock_get_ctx, mock_tracker):
+    mock_get_ctx.return_value = MagicMock(session_id="session-1", session_state="state")
+
+    end_session_run()
+
+    mock_tracker.end_run.assert_called_once_with("session-1")
+
+
+@patch("core.memory_manager.session_tracker")
+@patch("core.memory_manager.get_script_run_ctx", return_value=None)
+def test_track_session_outside_streamlit_does_nothing(mock_get_ctx, mock_tracker):
+    track_session()
+    end_session_run()
+
+    mock_tracker.begin_run.assert_not_called()
+    mock_tracker.enforce_budget.assert_not_called()
+    mock_tracker.end_run.assert_not_called()
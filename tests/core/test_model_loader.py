@@ -16,8 +16,12 @@ import requests
 
 # Paths for mocking external dependencies as they are seen by 'core.model_loader'
 OLLAMA_EMBEDDINGS_PATH = "core.model_loader.OllamaEmbeddings"
+CACHED_EMBEDDINGS_PATH = "core.model_loader.CachedEmbeddings"
 OLLAMA_LLM_PATH = "core.model_loader.OllamaLLM"
 CROSS_ENCODER_PATH = "core.model_loader.CrossEncoder"
+CACHED_RERANKER_PATH = "core.model_loader.CachedReranker"
+RERANKER_SERVICE_PATH = "core.model_loader.RerankerService"
+LOAD_ONNX_RERANKER_PATH = "core.model_loader.load_onnx_reranker"
 STREAMLIT_ERROR_PATH = (
     "core.model_loader.st.error"  # st.error is used directly in model_loader
 )
@@ -30,28 +34,29 @@ MODEL_LOADER_LOGGER_PATH = (
 # This is important because @st.cache_resource memoizes results.
 @pytest.fixture(autouse=True)
 def clear_model_loader_caches():
+    # st.cache_resource functions expose .clear() (older code probed for .clear_cache).
+    loaders = (get_embedding_model, get_language_model, get_reranker_model)
+    for loader in loaders:
+        loader.clear()
     yield  # Run the test
-    # Check if .clear_cache attribute exists before calling,
-    # as it's added by @st.cache_resource at runtime.
-    if hasattr(get_embedding_model, "clear_cache"):
-        get_embedding_model.clear_cache()
-    if hasattr(get_language_model, "clear_cache"):
-        get_language_model.clear_cache()
-    if hasattr(get_reranker_model, "clear_cache"):
-        get_reranker_model.clear_cache()
+    for loader in loaders:
+        loader.clear()
 
 
 # --- Test for get_embedding_model ---
 
 
+@patch(CACHED_EMBEDDINGS_PATH)
 @patch(OLLAMA_EMBEDDINGS_PATH)
 @patch(STREAMLIT_ERROR_PATH)
 @patch(MODEL_LOADER_LOGGER_PATH)
 def test_get_embedding_model_success(
-    mock_logger, mock_st_error, mock_ollama_embeddings_class
+    mock_logger, mock_st_error, mock_ollama_embeddings_class, mock_cached_embeddings_class
 ):
     mock_embedding_instance = MagicMock()
     mock_ollama_embeddings_class.return_value = mock_embedding_instance
+    mock_cached_instance = MagicMock(name="CachedEmbeddingsInstance")
+    mock_cached_embeddings_class.return_value = mock_cached_instance
 
     # Patch the config variables directly in the model_loader's namespace
     with patch('core.model_loader.OLLAMA_EMBEDDING_MODEL_NAME', "test-embed-model"), \
@@ -65,7 +70,11 @@ def test_get_embedding_model_success(
     mock_ollama_embeddings_class.assert_called_once_with(
         model="test-embed-model", base_url="http://test-host:11434"
     )
-    assert model == mock_embedding_instance
+    # The Ollama model is returned wrapped in the on-disk embedding cache
+    mock_cached_embeddings_class.assert_called_once_with(
+        mock_embedding_instance, "test-embed-model"
+    )
+    assert model == mock_cached_instance
     mock_st_error.assert_not_called()
     mock_logger.info.assert_any_call(
         "Attempting to load Embedding Model: test-embed-model from: http://test-host:11434"
@@ -198,21 +207,36 @@ def test_get_language_model_other_exception(
 # --- Test for get_reranker_model ---
 
 
+@patch(RERANKER_SERVICE_PATH)
+@patch(CACHED_RERANKER_PATH)
 @patch(CROSS_ENCODER_PATH)
 @patch(STREAMLIT_ERROR_PATH)
 @patch(MODEL_LOADER_LOGGER_PATH)
 def test_get_reranker_model_success(
-    mock_logger, mock_st_error, mock_cross_encoder_class
+    mock_logger,
+    mock_st_error,
+    mock_cross_encoder_class,
+    mock_cached_reranker_class,
+    mock_reranker_service_class,
 ):
     mock_reranker_instance = MagicMock()
     mock_cross_encoder_class.return_value = mock_reranker_instance
+    mock_service_instance = MagicMock(name="RerankerServiceInstance")
+    mock_reranker_service_class.return_value = mock_service_instance
+    mock_cached_instance = MagicMock(name="CachedRerankerInstance")
+    mock_cached_reranker_class.return_value = mock_cached_instance
     # Autouse fixture handles cache clearing
 
     with patch('core.model_loader.RERANKER_MODEL_NAME', "test-reranker-model"):
         model = get_reranker_model()
 
     mock_cross_encoder_class.assert_called_once_with("test-reranker-model")
-    assert model == mock_reranker_instance
+    # The CrossEncoder is served by the batching service, behind the score cache
+    mock_reranker_service_class.assert_called_once_with(mock_reranker_instance)
+    mock_cached_reranker_class.assert_called_once_with(
+        mock_service_instance, "test-reranker-model"
+    )
+    assert model == mock_cached_instance
     mock_st_error.assert_not_called()
     mock_logger.info.assert_any_call(
         "Attempting to load CrossEncoder model: test-reranker-model"
@@ -239,3 +263,64 @@ def test_get_reranker_model_exception(
     args, _ = mock_st_error.call_args
     assert "Error loading CrossEncoder model 'failing-reranker-model'" in args[0]
     mock_logger.exception.assert_called_once_with(ANY)
+
+
+@patch(RERANKER_SERVICE_PATH)
+@patch(CACHED_RERANKER_PATH)
+@patch(LOAD_ONNX_RERANKER_PATH)
+@patch(CROSS_ENCODER_PATH)
+@patch(MODEL_LOADER_LOGGER_PATH)
+def test_get_reranker_model_onnx_backend(
+    mock_logger,
+    mock_cross_encoder_class,
+    mock_load_onnx,
+    mock_cached_reranker_class,
+    mock_reranker_service_class,
+):
+    mock_onnx_model = MagicMock(model_name="test-reranker-model")
+    mock_load_onnx.return_value = mock_onnx_model
+
+    with patch("core.model_loader.RERANKER_BACKEND", "onnx"), \
+         patch("core.model_loader.RERANKER_MODEL_NAME", "test-reranker-model"), \
+         patch("core.model_loader.RERANKER_ONNX_MODEL_DIR", "/models/onnx"):
+        model = get_reranker_model()
+
+    mock_load_onnx.assert_called_once_with("/models/onnx")
+    mock_cross_encoder_class.assert_not_called()
+    mock_reranker_service_class.assert_called_once_with(mock_onnx_model)
+    # ONNX scores are cached apart from the PyTorch model's
+    mock_cached_reranker_class.assert_called_once_with(
+        mock_reranker_service_class.return_value, "test-reranker-model:onnx"
+    )
+    assert model == mock_cached_reranker_class.return_value
+    mock_logger.warning.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "load_error", [FileNotFoundError("no export"), ImportError("no onnxruntime")]
+)
+@patch(RERANKER_SERVICE_PATH)
+@patch(CACHED_RERANKER_PATH)
+@patch(LOAD_ONNX_RERANKER_PATH)
+@patch(CROSS_ENCODER_PATH)
+@patch(MODEL_LOADER_LOGGER_PATH)
+def test_get_reranker_model_onnx_backend_falls_back_to_cross_encoder(
+    mock_logger,
+    mock_cross_encoder_class,
+    mock_load_onnx,
+    mock_cached_reranker_class,
+    mock_reranker_service_class,
+    load_error,
+):
+    mock_load_onnx.side_effect = load_error
+
+    with patch("core.model_loader.RERANKER_BACKEND", "onnx"), \
+         patch("core.model_loader.RERANKER_MODEL_NAME", "test-reranker-model"):
+        model = get_reranker_model()
+
+    mock_cross_encoder_class.assert_called_once_with("test-reranker-model")
+    mock_cached_reranker_class.assert_called_once_with(
+        mock_reranker_service_class.return_value, "test-reranker-model"
+    )
+    assert model == mock_cached_reranker_class.return_value
+    mock_logger.warning.assert_called_once()
@@ -0,0 +1,117 @@
+import json
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock
+
+# Module to test
+from core.onnx_reranker import (
+    OnnxCrossEncoder,
+    find_onnx_model,
+    load_onnx_reranker,
+    EXPORT_METADATA_FILENAME,
+)
+
+ONNX_RERANKER_LOGGER_PATH = "core.onnx_reranker.logger"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(ONNX_RERANKER_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+def make_input(name):
+    model_input = MagicMock()
+    model_input.name = name
+    return model_input
+
+
+@pytest.fixture
+def mock_session():
+    session = MagicMock(name="MockInferenceSession")
+    session.get_inputs.return_value = [make_input("input_ids"), make_input("attention_mask")]
+    # One logit per pair: the number of non-padding tokens
+    session.run.side_effect = lambda outputs, inputs: [
+        inputs["attention_mask"].sum(axis=1, keepdims=True).astype(np.float32)
+    ]
+    return session
+
+
+@pytest.fixture
+def mock_tokenizer():
+    def tokenize(queries, texts, **kwargs):
+        lengths = [len(query.split()) + len(text.split()) for query, text in zip(queries, texts)]
+        width = max(lengths)
+        mask = [[1] * n + [0] * (width - n) for n in lengths]
+        return {
+            "input_ids": np.array(mask) * 7,
+            "attention_mask": np.array(mask),
+            "token_type_ids": np.zeros((len(lengths), width)),
+        }
+
+    return MagicMock(side_effect=tokenize)
+
+
+def test_predict_scores_pairs_in_batches(mock_session, mock_tokenizer):
+    encoder = OnnxCrossEncoder(mock_session, mock_tokenizer, batch_size=2)
+
+    scores = encoder.predict(
+        [("q", "one"), ("q", "one two"), ("q", "one two three")], show_progress_bar=False
+    )
+
+    assert scores.dtype == np.float32
+    assert scores.tolist() == [2.0, 3.0, 4.0]
+    assert mock_session.run.call_count == 2
+    # Only inputs the exported graph declares are fed to it, as int64
+    fed = mock_session.run.call_args.args[1]
+    assert set(fed) == {"input_ids", "attention_mask"}
+    assert fed["input_ids"].dtype == np.int64
+    assert mock_tokenizer.call_args.kwargs["truncation"] is True
+
+
+def test_predict_applies_recorded_sigmoid(mock_session, mock_tokenizer):
+    encoder = OnnxCrossEncoder(mock_session, mock_tokenizer, activation="sigmoid")
+
+    scores = encoder.predict([("q", "one")])
+
+    assert scores[0] == pytest.approx(1 / (1 + np.exp(-2.0)))
+
+
+def test_predict_empty_pairs(mock_session, mock_tokenizer):
+    encoder = OnnxCrossEncoder(mock_session, mock_tokenizer)
+
+    assert encoder.predict([]).shape == (0,)
+    mock_session.run.assert_not_called()
+
+
+def test_find_onnx_model_prefers_quantized(tmp_path):
+    assert find_onnx_model(str(tmp_path)) is None
+    (tmp_path / "model.onnx").write_bytes(b"")
+    assert find_onnx_model(str(tmp_path)).endswith("model.onnx")
+    (tmp_path / "model_quantized.onnx").write_bytes(b"")
+    assert find_onnx_model(str(tmp_path)).endswith("model_quantized.onnx")
+
+
+def test_load_onnx_reranker_without_export_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_onnx_reranker(str(tmp_path / "missing"))
+
+
+def test_load_onnx_reranker_reads_export_metadata(tmp_path, mock_session):
+    (tmp_path / "model_quantized.onnx").write_bytes(b"")
+    (tmp_path / EXPORT_METADATA_FILENAME).write_text(
+        json.dumps({"model_name": "reranker-a", "activation": "sigmoid", "max_length": 256})
+    )
+    onnxruntime = pytest.importorskip("onnxruntime")
+
+    with patch.object(onnxruntime, "InferenceSession", return_value=mock_session) as session_class, \
+         patch("transformers.AutoTokenizer.from_pretrained") as from_pretrained:
+        encoder = load_onnx_reranker(str(tmp_path))
+
+    assert session_class.call_args.args[0].endswith("model_quantized.onnx")
+    assert session_class.call_args.kwargs["providers"] == ["CPUExecutionProvider"]
+    from_pretrained.assert_called_once_with(str(tmp_path), local_files_only=True)
+    assert encoder.activation == "sigmoid"
+    assert encoder.max_length == 256
+    assert encoder.model_name == "reranker-a"
@@ -0,0 +1,105 @@
+import datetime
+import gzip
+import os
+import pytest
+from unittest.mock import patch
+
+from langchain_core.documents import Document as LangchainDocument
+
+# Module to test
+from core.parse_cache import (
+    PARSER_VERSION,
+    parse_cache_file,
+    load_parsed_documents,
+    save_parsed_documents,
+    evict_parse_cache,
+)
+
+PARSE_CACHE_LOGGER_PATH = "core.parse_cache.logger"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(PARSE_CACHE_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture
+def pages():
+    return [
+        LangchainDocument(page_content="First page", metadata={"source": "a.pdf", "page": 0}),
+        LangchainDocument(page_content="Zweite Seite – ü", metadata={"source": "a.pdf", "page": 1}),
+    ]
+
+
+def test_round_trip_keeps_text_and_metadata(tmp_path, pages):
+    storage = str(tmp_path)
+
+    assert load_parsed_documents("hash-a", ".pdf", storage) is None
+    assert save_parsed_documents("hash-a", ".pdf", pages, storage) is True
+
+    assert load_parsed_documents("hash-a", ".PDF", storage) == pages
+    with gzip.open(parse_cache_file("hash-a", "pdf", storage), "rt", encoding="utf-8") as f:
+        assert len(f.readlines()) == 2  # One JSON line per page
+    assert [name for name in os.listdir(storage) if name.startswith(".tmp-")] == []
+
+
+def test_non_json_metadata_is_stored_as_text(tmp_path):
+    created = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    page = LangchainDocument(page_content="text", metadata={"created": created})
+
+    save_parsed_documents("hash-a", ".pdf", [page], str(tmp_path))
+
+    assert load_parsed_documents("hash-a", ".pdf", str(tmp_path))[0].metadata == {"created": str(created)}
+
+
+def test_key_includes_extension_and_parser_version(tmp_path, pages):
+    storage = str(tmp_path)
+    save_parsed_documents("hash-a", ".pdf", pages, storage)
+
+    assert load_parsed_documents("hash-a", ".txt", storage) is None
+    with patch("core.parse_cache.PARSER_VERSION", PARSER_VERSION + 1):
+        assert load_parsed_documents("hash-a", ".pdf", storage) is None
+
+
+def test_unreadable_entry_is_discarded(tmp_path, mock_logger_fixture):
+    path = parse_cache_file("hash-a", ".pdf", str(tmp_path))
+    with open(path, "wb") as f:
+        f.write(b"not gzip")
+
+    assert load_parsed_documents("hash-a", ".pdf", str(tmp_path)) is None
+    assert not os.path.exists(path)
+    mock_logger_fixture.warning.assert_called_once()
+
+
+def test_empty_parses_and_disabled_cache_store_nothing(tmp_path, pages):
+    assert save_parsed_documents("hash-a", ".pdf", [], str(tmp_path)) is False
+    assert save_parsed_documents("hash-a", ".pdf", pages, str(tmp_path), max_bytes=0) is False
+    assert os.listdir(tmp_path) == []
+
+
+def test_least_recently_used_entries_are_evicted_beyond_the_size_limit(tmp_path, pages):
+    storage = str(tmp_path)
+    for age, file_hash in enumerate(["old", "used", "new"]):
+        save_parsed_documents(file_hash, ".pdf", pages, storage)
+        os.utime(parse_cache_file(file_hash, ".pdf", storage), (1000 + age, 1000 + age))
+    entry_size = os.path.getsize(parse_cache_file("old", ".pdf", storage))
+    load_parsed_documents("old", ".pdf", storage)  # Used last now
+
+    assert evict_parse_cache(storage, max_bytes=2 * entry_size) == 1
+
+    assert load_parsed_documents("used", ".pdf", storage) is None
+    assert load_parsed_documents("old", ".pdf", storage) == pages
+    assert load_parsed_documents("new", ".pdf", storage) == pages
+
+
+def test_saving_evicts_to_the_size_limit(tmp_path, pages):
+    storage = str(tmp_path)
+    save_parsed_documents("first", ".pdf", pages, storage)
+    os.utime(parse_cache_file("first", ".pdf", storage), (1000, 1000))
+    entry_size = os.path.getsize(parse_cache_file("first", ".pdf", storage))
+
+    save_parsed_documents("second", ".pdf", pages, storage, max_bytes=entry_size + 1)
+
+    assert sorted(os.listdir(storage)) == [os.path.basename(parse_cache_file("second", ".pdf", storage))]
@@ -0,0 +1,111 @@
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock
+
+# Module to test
+from core.reranker_cache import CachedReranker
+
+RERANKER_CACHE_LOGGER_PATH = "core.reranker_cache.logger"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(RERANKER_CACHE_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture
+def mock_cross_encoder():
+    model = MagicMock(name="MockCrossEncoder")
+    # Score derived from the chunk text so results are checkable
+    model.predict.side_effect = lambda pairs, **kwargs: np.array(
+        [float(len(text)) for _, text in pairs], dtype=np.float32
+    )
+    model.tokenizer.do_lower_case = False
+    return model
+
+
+def test_cached_pairs_are_not_scored_again(mock_cross_encoder):
+    reranker = CachedReranker(mock_cross_encoder, "reranker-a")
+
+    first = reranker.predict([("q", "alpha"), ("q", "be")], show_progress_bar=False)
+    second = reranker.predict([("q", "be"), ("q", "alpha")], show_progress_bar=False)
+
+    mock_cross_encoder.predict.assert_called_once_with(
+        [("q", "alpha"), ("q", "be")], show_progress_bar=False
+    )
+    assert first.tolist() == [5.0, 2.0]
+    assert second.tolist() == [2.0, 5.0]
+
+
+def test_only_uncached_pairs_are_sent_to_model(mock_cross_encoder):
+    reranker = CachedReranker(mock_cross_encoder, "reranker-a")
+    reranker.predict([("q", "alpha")])
+
+    scores = reranker.predict([("q", "alpha"), ("q", "gamma!"), ("q", "gamma!")])
+
+    assert mock_cross_encoder.predict.call_args.args[0] == [("q", "gamma!")]
+    assert scores.tolist() == [5.0, 6.0, 6.0]
+
+
+def test_query_whitespace_is_normalized(mock_cross_encoder):
+    reranker = CachedReranker(mock_cross_encoder, "reranker-a")
+
+    reranker.predict([("what is  RAG?", "chunk")])
+    reranker.predict([(" what is RAG? ", "chunk")])
+    reranker.predict([("What is rag?", "chunk")])
+
+    # Case matters for a cased model, so only the last query is scored again
+    assert mock_cross_encoder.predict.call_count == 2
+
+
+def test_query_case_is_normalized_for_uncased_models(mock_cross_encoder):
+    mock_cross_encoder.tokenizer.do_lower_case = True
+    reranker = CachedReranker(mock_cross_encoder, "reranker-a")
+
+    reranker.predict([("What is RAG?", "chunk")])
+    reranker.predict([("what is rag?", "chunk")])
+
+    mock_cross_encoder.predict.assert_called_once()
+
+
+def test_cache_is_keyed_by_model_and_chunk_content(mock_cross_encoder):
+    reranker_a = CachedReranker(mock_cross_encoder, "reranker-a")
+    reranker_a.predict([("q", "alpha")])
+    reranker_a.predict([("q", "alpha, edited")])
+
+    reranker_b = CachedReranker(mock_cross_encoder, "reranker-b")
+    reranker_b.score_cache = reranker_a.score_cache
+    reranker_b.predict([("q", "alpha")])
+
+    assert mock_cross_encoder.predict.call_count == 3
+
+
+def test_stats_report_saved_inference(mock_cross_encoder):
+    reranker = CachedReranker(mock_cross_encoder, "reranker-a")
+
+    reranker.predict([("q", "alpha"), ("q", "beta")])
+    reranker.predict([("q", "alpha"), ("q", "beta"), ("q", "gamma")])
+
+    stats = reranker.stats()
+    assert stats["pairs_requested"] == 5
+    assert stats["pairs_scored"] == 3
+    assert stats["pairs_saved"] == 2
+    assert stats["hits"] == 2
+    assert stats["entries"] == 3
+
+
+def test_zero_size_disables_caching(mock_cross_encoder):
+    reranker = CachedReranker(mock_cross_encoder, "reranker-a", max_entries=0)
+
+    reranker.predict([("q", "alpha")])
+    reranker.predict([("q", "alpha")])
+
+    assert mock_cross_encoder.predict.call_count == 2
+
+
+def test_other_attributes_come_from_model(mock_cross_encoder):
+    reranker = CachedReranker(mock_cross_encoder, "reranker-a")
+
+    assert reranker.tokenizer is mock_cross_encoder.tokenizer
@@ -0,0 +1,197 @@
+import threading
+import time
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock
+
+# Module to test
+from core.reranker_service import RerankerService
+
+RERANKER_SERVICE_LOGGER_PATH = "core.reranker_service.logger"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(RERANKER_SERVICE_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+def score_by_length(pairs, **kwargs):
+    return np.array([float(len(text)) for _, text in pairs], dtype=np.float32)
+
+
+@pytest.fixture
+def mock_cross_encoder():
+    model = MagicMock(name="MockCrossEncoder")
+    model.predict.side_effect = score_by_length
+    return model
+
+
+@pytest.fixture
+def make_service():
+    services = []
+
+    def make(model, **kwargs):
+        service = RerankerService(model, **kwargs)
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        service.close()
+
+
+def wait_for_queue(service, size, timeout=5):
+    deadline = time.monotonic() + timeout
+    while service._queue.qsize() < size:
+        assert time.monotonic() < deadline, "requests were not queued"
+        time.sleep(0.001)
+
+
+def test_single_request_returns_its_scores(mock_cross_encoder, make_service):
+    service = make_service(mock_cross_encoder, batch_window_ms=0)
+
+    scores = service.predict([("q", "a"), ("q", "abc")], show_progress_bar=False)
+
+    assert scores.tolist() == [1.0, 3.0]
+    mock_cross_encoder.predict.assert_called_once_with(
+        [("q", "a"), ("q", "abc")], show_progress_bar=False
+    )
+
+
+def test_requests_queued_while_busy_share_one_forward_pass(mock_cross_encoder, make_service):
+    release = threading.Event()
+    calls = []
+
+    def blocking_predict(pairs, **kwargs):
+        calls.append(list(pairs))
+        if len(calls) == 1:
+            release.wait(5)
+        return score_by_length(pairs)
+
+    mock_cross_encoder.predict.side_effect = blocking_predict
+    service = make_service(mock_cross_encoder, batch_window_ms=0)
+    results = {}
+
+    def ask(name, texts):
+        results[name] = service.predict([(name, text) for text in texts]).tolist()
+
+    first = threading.Thread(target=ask, args=("first", ["x"]))
+    first.start()
+    while not calls:
+        time.sleep(0.001)
+    others = [
+        threading.Thread(target=ask, args=(name, texts))
+        for name, texts in (("b", ["bb", "b"]), ("c", ["ccc"]), ("d", ["dddd", "d", "dd"]))
+    ]
+    for thread in others:
+        thread.start()
+    wait_for_queue(service, 3)
+    release.set()
+    for thread in [first, *others]:
+        thread.join(5)
+
+    assert len(calls) == 2
+    assert len(calls[1]) == 6
+    assert results == {
+        "first": [1.0],
+        "b": [2.0, 1.0],
+        "c": [3.0],
+        "d": [4.0, 1.0, 2.0],
+    }
+    assert service.stats()["batches"] == 2
+    assert service.stats()["requests"] == 4
+
+
+def test_batches_are_capped_at_max_pairs(mock_cross_encoder, make_service):
+    release = threading.Event()
+    calls = []
+
+    def blocking_predict(pairs, **kwargs):
+        calls.append(len(pairs))
+        if len(calls) == 1:
+            release.wait(5)
+        return score_by_length(pairs)
+
+    mock_cross_encoder.predict.side_effect = blocking_predict
+    service = make_service(mock_cross_encoder, batch_window_ms=0, max_batch_pairs=4)
+    threads = [
+        threading.Thread(target=service.predict, args=([("q", "t")] * 3,)) for _ in range(3)
+    ]
+    threads[0].start()
+    while not calls:
+        time.sleep(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    wait_for_queue(service, 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    # A request is never split, so 3 + 3 pairs don't fit in one batch of 4
+    assert calls == [3, 3, 3]
+
+
+def test_model_errors_reach_every_caller_in_the_batch(mock_cross_encoder, make_service):
+    mock_cross_encoder.predict.side_effect = RuntimeError("out of memory")
+    service = make_service(mock_cross_encoder, batch_window_ms=0)
+
+    with pytest.raises(RuntimeError, match="out of memory"):
+        service.predict([("q", "text")])
+    # The worker keeps serving after a failed batch
+    mock_cross_encoder.predict.side_effect = score_by_length
+    assert service.predict([("q", "text")]).tolist() == [4.0]
+
+
+def test_empty_request_skips_model(mock_cross_encoder, make_service):
+    service = make_service(mock_cross_encoder)
+
+    assert service.predict([]).shape == (0,)
+    mock_cross_encoder.predict.assert_not_called()
+
+
+def test_custom_predict_options_bypass_batching(mock_cross_encoder, make_service):
+    service = make_service(mock_cross_encoder)
+
+    service.predict([("q", "text")], batch_size=2)
+
+    mock_cross_encoder.predict.assert_called_once_with(
+        [("q", "text")], show_progress_bar=False, batch_size=2
+    )
+
+
+def test_other_attributes_come_from_model(mock_cross_encoder, make_service):
+    service = make_service(mock_cross_encoder)
+
+    assert service.tokenizer is mock_cross_encoder.tokenizer
+
+
+def test_requests_after_close_are_scored_directly(mock_cross_encoder, make_service):
+    service = make_service(mock_cross_encoder, batch_window_ms=0)
+    service.close()
+
+    assert service.predict([("q", "text")]).tolist() == [4.0]
+    assert service.stats()["requests"] == 0
+
+
+def test_caller_does_not_hang_when_the_worker_dies(mock_cross_encoder, make_service):
+    release = threading.Event()
+
+    def crash():
+        release.wait()
+        raise RuntimeError("worker crashed")
+
+    with patch.object(RerankerService, "_next_batch", side_effect=crash), patch(
+        "core.reranker_service.WORKER_CHECK_SECONDS", 0.01
+    ), patch("threading.excepthook"):
+        service = make_service(mock_cross_encoder, batch_window_ms=0)
+        results = []
+        caller = threading.Thread(target=lambda: results.append(service.predict([("q", "text")])))
+        caller.start()
+        wait_for_queue(service, 1)
+        release.set()  # The worker dies with the request still queued
+        caller.join(timeout=5)
+
+    assert not caller.is_alive()
+    assert results[0].tolist() == [4.0]
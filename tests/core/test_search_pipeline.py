@@ -1,4 +1,7 @@
 import pytest
+import random
+import threading
+import numpy as np
 from unittest.mock import patch, MagicMock, ANY
 
 # Import LangchainDocument for creating test data
@@ -11,9 +14,15 @@ from sentence_transformers import CrossEncoder
 
 # Modules to test
 from core.search_pipeline import (
+    IncrementalBM25,
+    top_positive_indices,
     find_related_documents,
     combine_results_rrf,
     rerank_documents,
+    reciprocal_rank_scores,
+    prune_rerank_candidates,
+    cascade_rerank_documents,
+    CascadeStats,
 )
 
 # Import config to use/mock its values, and logger for mocking
@@ -202,6 +211,274 @@ def test_find_related_documents_bm25_error(
     mock_logger_fixture.exception.assert_called_once()
 
 
+def test_find_related_documents_bm25_top_k_order(
+    mock_doc_factory, mock_vector_db, mock_bm25_index
+):
+    chunks = [mock_doc_factory(f"doc{i}") for i in range(6)]
+    mock_bm25_index.get_scores.return_value = np.array([0.2, 0.0, 0.9, 0.2, -0.1, 0.5])
+
+    with patch('core.search_pipeline.K_BM25', 3):
+        results = find_related_documents("query", mock_vector_db, mock_bm25_index, chunks, True)
+
+    assert [doc.page_content for doc in results["bm25_results"]] == ["doc2", "doc5", "doc0"]
+
+
+def test_find_related_documents_runs_retrievers_concurrently(
+    mock_doc_factory, mock_vector_db, mock_bm25_index
+):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def semantic(query, k):
+        barrier.wait()  # Times out unless BM25 runs at the same time
+        return [mock_doc_factory("semantic")]
+
+    def bm25_scores(tokens):
+        barrier.wait()
+        return [1.0]
+
+    mock_vector_db.similarity_search.side_effect = semantic
+    mock_bm25_index.get_scores.side_effect = bm25_scores
+
+    results = find_related_documents(
+        "query", mock_vector_db, mock_bm25_index, [mock_doc_factory("bm25")], True
+    )
+
+    assert [doc.page_content for doc in results["semantic_results"]] == ["semantic"]
+    assert [doc.page_content for doc in results["bm25_results"]] == ["bm25"]
+
+
+def test_find_related_documents_semantic_timeout_falls_back_to_bm25(
+    mock_doc_factory, mock_vector_db, mock_bm25_index, mock_logger_fixture
+):
+    release = threading.Event()
+
+    def slow_semantic(query, k):
+        release.wait(5)  # Simulates a stalled Ollama embedding call
+        return [mock_doc_factory("late")]
+
+    mock_vector_db.similarity_search.side_effect = slow_semantic
+    mock_bm25_index.get_scores.return_value = [0.7]
+
+    try:
+        with patch("core.search_pipeline.SEMANTIC_SEARCH_TIMEOUT_SECONDS", 0.05), \
+             patch(STREAMLIT_WARNING_PATH) as mock_st_warning:
+            results = find_related_documents(
+                "query", mock_vector_db, mock_bm25_index, [mock_doc_factory("bm25")], True
+            )
+    finally:
+        release.set()
+
+    assert results["semantic_results"] == []
+    assert [doc.page_content for doc in results["bm25_results"]] == ["bm25"]
+    mock_st_warning.assert_called_once_with(
+        "The semantic search timed out; using the other search results only."
+    )
+
+
+def test_top_positive_indices_matches_full_sort():
+    rng = random.Random(3)
+    for _ in range(50):
+        scores = [rng.choice([0.0, -1.0, 0.5, 1.0, rng.random()]) for _ in range(30)]
+        k = rng.randint(0, 10)
+        expected = sorted(
+            [i for i, score in enumerate(scores) if score > 0],
+            key=lambda i: scores[i],
+            reverse=True,
+        )[:k]
+        assert top_positive_indices(scores, k) == expected
+
+
+# --- Tests for IncrementalBM25 ---
+
+
+def term_counts(tokens):
+    counts = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+def assert_matches_fresh_bm25okapi(index, live_tokenized, queries):
+    """Scores of live slots must equal a BM25Okapi built from scratch over the live documents."""
+    live_slots = [slot for slot, doc in enumerate(index.documents) if doc is not None]
+    reference = BM25Okapi(live_tokenized)
+    for query in queries:
+        scores = index.get_scores(query)
+        np.testing.assert_allclose(
+            scores[live_slots], reference.get_scores(query), rtol=1e-12, atol=1e-12
+        )
+        dead = np.ones(len(scores), dtype=bool)
+        dead[live_slots] = False
+        assert not scores[dead].any()
+
+
+BM25_CORPUS = [
+    "the quick brown fox",
+    "the lazy dog sleeps",
+    "quick quick fox jumps over the dog",
+    "an unrelated sentence",
+    "the the the",
+]
+
+
+def compacted_index(tokenized):
+    index = IncrementalBM25()
+    index.add_documents(tokenized, [term_counts(tokens) for tokens in tokenized], list(range(len(tokenized))))
+    index.compact()
+    return index
+
+
+@pytest.mark.parametrize(
+    "query",
+    [["quick", "fox"], ["the"], ["missing"], ["dog", "sleeps"], ["quick", "quick", "the"], []],
+)
+def test_incremental_bm25_compacted_scores_match_bm25okapi(query):
+    tokenized = [text.lower().split(" ") for text in BM25_CORPUS]
+
+    np.testing.assert_allclose(
+        compacted_index(tokenized).get_scores(query),
+        BM25Okapi(tokenized).get_scores(query),
+        rtol=1e-12,
+        atol=1e-12,
+    )
+
+
+def test_incremental_bm25_compacted_scores_match_bm25okapi_on_random_corpus():
+    rng = random.Random(7)
+    vocabulary = [f"w{i}" for i in range(40)]
+    tokenized = [
+        [rng.choice(vocabulary) for _ in range(rng.randint(1, 30))] for _ in range(200)
+    ]
+    index = compacted_index(tokenized)
+    reference = BM25Okapi(tokenized)
+
+    for _ in range(20):
+        query = [rng.choice(vocabulary + ["unknown"]) for _ in range(rng.randint(1, 5))]
+        np.testing.assert_allclose(
+            index.get_scores(query), reference.get_scores(query), rtol=1e-12, atol=1e-12
+        )
+    assert index.corpus_size == reference.corpus_size
+    assert index.avgdl == pytest.approx(reference.avgdl)
+
+
+def test_incremental_bm25_scores_merged_and_pending_postings_together():
+    tokenized = [text.split(" ") for text in BM25_CORPUS]
+    index = compacted_index(tokenized[:3])
+    index.add_documents(tokenized[3:], [term_counts(tokens) for tokens in tokenized[3:]], [3, 4])  # Pending
+
+    assert_matches_fresh_bm25okapi(index, tokenized, [["quick", "the"], ["sentence"], ["dog", "the", "the"]])
+
+
+def test_incremental_bm25_append_and_delete_match_full_rebuild():
+    rng = random.Random(11)
+    vocabulary = [f"w{i}" for i in range(30)]
+    queries = [[rng.choice(vocabulary) for _ in range(3)] for _ in range(10)]
+    index = IncrementalBM25(compaction_ratio=10.0)  # Never compacts on its own
+    live = {}  # id -> tokens
+
+    for batch in range(5):
+        ids = [f"{batch}-{i}" for i in range(20)]
+        tokenized = [[rng.choice(vocabulary) for _ in range(rng.randint(1, 15))] for _ in ids]
+        index.add_documents(tokenized, [term_counts(tokens) for tokens in tokenized], ids)
+        live.update(zip(ids, tokenized))
+        doomed = rng.sample(sorted(live), 7)
+        assert index.delete(doomed)
+        for doc_id in doomed:
+            del live[doc_id]
+
+        live_in_slot_order = [doc for doc in index.documents if doc is not None]
+        assert len(index) == len(live)
+        assert index.avgdl == pytest.approx(sum(map(len, live.values())) / len(live))
+        assert_matches_fresh_bm25okapi(index, live_in_slot_order, queries)
+
+    index.compact()
+    assert len(index.documents) == len(live)
+    assert_matches_fresh_bm25okapi(index, index.documents, queries)
+
+
+def test_incremental_bm25_compacts_after_enough_deletes():
+    index = IncrementalBM25(compaction_ratio=0.5)
+    index.add_documents(["a", "b", "c", "d"], [{"x": 1}, {"y": 1}, {"x": 2}, {"z": 1}], ["1", "2", "3", "4"])
+
+    index.delete(["1", "2"])  # 2 of 4 slots: at the ratio, still tombstoned
+    assert index.documents == [None, None, "c", "d"]
+
+    index.delete(["4"])
+    assert index.documents == ["c"]
+    assert index.get_scores(["x"]).shape == (1,)
+    assert index.get_scores(["y"]).tolist() == [0.0]
+
+
+def test_incremental_bm25_re_added_id_replaces_the_previous_document():
+    index = IncrementalBM25(compaction_ratio=10.0)
+    index.add_documents(["old", "other"], [{"x": 3}, {"y": 1}], ["1", "2"])
+
+    index.add_documents(["new"], [{"z": 1}], ["1"])
+
+    assert index.documents == [None, "other", "new"]
+    assert len(index) == 2 and index.avgdl == 1.0
+    assert index.get_scores(["x"]).tolist() == [0.0, 0.0, 0.0]
+    assert index.term_frequencies(["1"]) == [{"z": 1}]
+    assert_matches_fresh_bm25okapi(index, [["y"], ["z"]], [["x"], ["y", "z"]])
+    index.compact()
+    assert index.documents == ["other", "new"]
+    assert_matches_fresh_bm25okapi(index, [["y"], ["z"]], [["x"], ["y", "z"]])
+
+
+def test_incremental_bm25_delete_unknown_ids():
+    index = IncrementalBM25()
+    index.add_documents(["a"], [{"x": 1}], ["1"])
+    assert index.delete(["missing"]) is False
+    assert index.delete([]) is False
+    assert len(index) == 1
+
+
+def test_incremental_bm25_empty_index_scores_nothing():
+    index = IncrementalBM25()
+    assert not index
+    assert index.get_scores(["x"]).shape == (0,)
+    index.add_documents(["a"], [{"x": 1}], ["1"])
+    index.delete(["1"])  # Deleting everything compacts the index
+    assert len(index) == 0
+    assert index.documents == []
+    assert index.get_scores(["x"]).tolist() == []
+
+
+def test_incremental_bm25_length_mismatch_raises():
+    with pytest.raises(ValueError):
+        IncrementalBM25().add_documents(["a", "b"], [{"x": 1}], ["1", "2"])
+
+
+def test_incremental_bm25_term_statistics_cover_merged_and_pending_live_documents():
+    index = IncrementalBM25(compaction_ratio=10.0)
+    index.add_documents(["a", "b"], [{"x": 2, "y": 1}, {"x": 1}], ["1", "2"])
+    index.compact()
+    index.add_documents(["c"], [{"x": 3, "z": 4}], ["3"])  # Pending postings
+    index.delete(["2"])  # Tombstoned, not compacted
+
+    terms, counts, document_frequencies = index.term_statistics()
+    by_term = {
+        term: (counts[i], document_frequencies[i]) for i, term in enumerate(terms)
+    }
+
+    assert by_term == {"x": (5.0, 2.0), "y": (1.0, 1.0), "z": (4.0, 1.0)}
+
+
+
+def test_incremental_bm25_memory_bytes_grows_with_documents_and_shrinks_on_compaction():
+    index = IncrementalBM25(compaction_ratio=10.0)
+    empty = index.memory_bytes()
+    index.add_documents(["a", "b"], [{"x": 2, "y": 1}, {"x": 1}], ["1", "2"])
+    pending = index.memory_bytes()
+    index.compact()
+    merged = index.memory_bytes()
+    index.delete(["1", "2"])
+    index.compact()
+
+    assert empty < merged
+    assert pending > empty
+    assert index.memory_bytes() < merged
+
 # --- Tests for combine_results_rrf (incorporating tests from test_rag_deep.py) ---
 
 
@@ -396,3 +673,105 @@ def test_rerank_documents_empty_input(mock_cross_encoder, mock_logger_fixture):
     mock_logger_fixture.debug.assert_called_with(
         "rerank_documents called with no documents."
     )
+
+
+# --- Tests for cascade re-ranking ---
+
+
+@pytest.fixture
+def overlapping_search_results(mock_doc_factory):
+    """a, b and c are found by both retrievers; d, e, x and y by one only."""
+    semantic = [mock_doc_factory(content) for content in ["a", "b", "c", "d", "e"]]
+    bm25 = [mock_doc_factory(content) for content in ["a", "b", "c", "x", "y"]]
+    return {"semantic_results": semantic, "bm25_results": bm25}
+
+
+@pytest.fixture
+def fresh_cascade_stats():
+    with patch("core.search_pipeline.cascade_stats", CascadeStats()) as stats:
+        yield stats
+
+
+def test_reciprocal_rank_scores_sum_over_retrievers(overlapping_search_results):
+    with patch("core.search_pipeline.K_RRF_PARAM", 60):
+        scores = reciprocal_rank_scores(overlapping_search_results)
+
+    assert list(scores) == ["a", "b", "c", "d", "e", "x", "y"]
+    assert scores["a"] == pytest.approx(2 / 61)
+    assert scores["x"] == pytest.approx(1 / 64)
+
+
+def test_prune_rerank_candidates_keeps_top_n_and_close_scores(mock_doc_factory):
+    documents = [mock_doc_factory(content) for content in "abcdef"]
+    scores = {"a": 1.0, "b": 0.9, "c": 0.8, "d": 0.5, "e": 0.39, "f": 0.1}
+
+    kept, pruned = prune_rerank_candidates(documents, scores, top_n=3, score_ratio=0.5)
+
+    assert [doc.page_content for doc in kept] == ["a", "b", "c", "d"]
+    assert [doc.page_content for doc in pruned] == ["e", "f"]
+    # A ratio of 0 disables pruning
+    kept, pruned = prune_rerank_candidates(documents, scores, top_n=3, score_ratio=0)
+    assert len(kept) == 6 and pruned == []
+
+
+def test_cascade_rerank_scores_only_survivors(
+    overlapping_search_results, mock_cross_encoder, fresh_cascade_stats
+):
+    candidates = combine_results_rrf(overlapping_search_results)
+    mock_cross_encoder.predict.side_effect = lambda pairs, **kwargs: [
+        float(ord(text)) for _, text in pairs
+    ]
+
+    with patch("core.search_pipeline.K_RRF_PARAM", 60):
+        reranked = cascade_rerank_documents(
+            "q", candidates, overlapping_search_results, mock_cross_encoder, top_n=3,
+            score_ratio=0.5, audit_rate=0,
+        )
+
+    scored_pairs = mock_cross_encoder.predict.call_args.args[0]
+    assert [text for _, text in scored_pairs] == ["a", "b", "c"]
+    assert [doc.page_content for doc in reranked] == ["c", "b", "a"]
+    stats = fresh_cascade_stats.stats()
+    assert stats["candidates"] == 7
+    assert stats["pruned"] == 4
+    assert stats["audited_queries"] == 0
+
+
+def test_cascade_rerank_audit_measures_recall(
+    overlapping_search_results, mock_cross_encoder, fresh_cascade_stats
+):
+    candidates = combine_results_rrf(overlapping_search_results)
+    # "y" was pruned but would have been the best match
+    mock_cross_encoder.predict.side_effect = lambda pairs, **kwargs: [
+        float(ord(text)) for _, text in pairs
+    ]
+
+    with patch("core.search_pipeline.K_RRF_PARAM", 60):
+        reranked = cascade_rerank_documents(
+            "q", candidates, overlapping_search_results, mock_cross_encoder, top_n=3,
+            score_ratio=0.5, audit_rate=1.0,
+        )
+
+    assert [doc.page_content for doc in reranked] == ["c", "b", "a"]
+    assert mock_cross_encoder.predict.call_count == 2
+    assert len(mock_cross_encoder.predict.call_args.args[0]) == 7
+    stats = fresh_cascade_stats.stats()
+    assert stats["audited_queries"] == 1
+    assert stats["audited_recall"] == pytest.approx(0.0)
+
+
+def test_cascade_rerank_disabled_scores_all_candidates(
+    overlapping_search_results, mock_cross_encoder, fresh_cascade_stats
+):
+    candidates = combine_results_rrf(overlapping_search_results)
+    mock_cross_encoder.predict.return_value = list(range(len(candidates)))
+
+    reranked = cascade_rerank_documents(
+        "q", candidates, overlapping_search_results, mock_cross_encoder, top_n=3,
+        score_ratio=0,
+    )
+
+    assert len(mock_cross_encoder.predict.call_args.args[0]) == 7
+    assert len(reranked) == 3
+    assert fresh_cascade_stats.stats()["queries"] == 0
+
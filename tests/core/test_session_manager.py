@@ -1,16 +1,28 @@
+import gc
 import pytest
 from unittest.mock import patch, MagicMock
 
 # Modules to test
+from langchain_core.documents import Document as LangchainDocument
+
 from core.session_manager import (
     initialize_session_state,
     reset_document_states,
-    reset_file_uploader
+    reset_file_uploader,
+    add_indexed_file,
+    link_indexed_file,
+    remove_indexed_files,
+    refresh_document_views,
+    use_shared_corpus,
+    make_corpus_private,
+    evict_documents,
 )
+from core.corpus_registry import CorpusRegistry
+from core.answer_cache import corpus_version
 
 # Path to the logger instance in session_manager.py
 SESSION_MANAGER_LOGGER_PATH = 'core.session_manager.logger'
-IN_MEMORY_VECTOR_STORE_PATH = 'core.session_manager.InMemoryVectorStore'
+NUMPY_VECTOR_STORE_PATH = 'core.corpus_registry.NumpyVectorStore'
 GET_EMBEDDING_MODEL_PATH = 'core.session_manager.get_embedding_model'
 
 
@@ -27,7 +39,7 @@ def mock_logger_fixture():
 # --- Tests for initialize_session_state ---
 
 @patch(GET_EMBEDDING_MODEL_PATH)
-@patch(IN_MEMORY_VECTOR_STORE_PATH)
+@patch(NUMPY_VECTOR_STORE_PATH)
 def test_initialize_session_state_initial_call(
     mock_vector_store_class,
     mock_get_embedding,
@@ -64,9 +76,12 @@ def test_initialize_session_state_initial_call(
         assert mock_session_state.document_keywords is None
         assert mock_session_state.bm25_index is None
         assert mock_session_state.bm25_corpus_chunks == []
+        assert mock_session_state.indexed_files == {}
+        assert mock_session_state.failed_uploads == []
+        assert mock_session_state.corpus_version is None
 
 @patch(GET_EMBEDDING_MODEL_PATH)
-@patch(IN_MEMORY_VECTOR_STORE_PATH)
+@patch(NUMPY_VECTOR_STORE_PATH)
 def test_initialize_session_state_idempotency(
     mock_vector_store_class,
     mock_get_embedding,
@@ -118,7 +133,7 @@ def test_initialize_session_state_idempotency(
 # --- Tests for reset_document_states ---
 
 @patch(GET_EMBEDDING_MODEL_PATH)
-@patch(IN_MEMORY_VECTOR_STORE_PATH)
+@patch(NUMPY_VECTOR_STORE_PATH)
 def test_reset_document_states_clears_all_with_chat(
     mock_vector_store_class,
     mock_get_embedding,
@@ -153,10 +168,11 @@ def test_reset_document_states_clears_all_with_chat(
         assert mock_session_state.document_keywords is None
         assert mock_session_state.bm25_index is None
         assert mock_session_state.bm25_corpus_chunks == []
+        assert mock_session_state.indexed_files == {}
         mock_logger_fixture.info.assert_called_with("Document states reset.")
 
 @patch(GET_EMBEDDING_MODEL_PATH)
-@patch(IN_MEMORY_VECTOR_STORE_PATH)
+@patch(NUMPY_VECTOR_STORE_PATH)
 def test_reset_document_states_preserves_chat(
     mock_vector_store_class,
     mock_get_embedding,
@@ -198,3 +214,226 @@ def test_reset_file_uploader_from_initial_state(mock_logger_fixture):
         mock_session_state.uploaded_file_key = 0
         reset_file_uploader()
         assert mock_session_state.uploaded_file_key == 1
+
+# --- Tests for incremental file tracking and shared corpora ---
+
+class FakeSessionState(dict):
+    """Key and attribute access, like st.session_state."""
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+@pytest.fixture
+def registry():
+    gc.collect()  # Release handles of earlier tests' sessions before answer_cache is mocked
+    with patch(GET_EMBEDDING_MODEL_PATH), \
+         patch("core.session_manager.corpus_registry", CorpusRegistry()) as registry, \
+         patch("core.corpus_registry.answer_cache") as mock_answer_cache:
+        registry.answer_cache = mock_answer_cache
+        yield registry
+
+
+@pytest.fixture
+def new_session(registry):
+    """Returns a function that creates a session state and makes it current."""
+    patchers = []
+
+    def start():
+        state = FakeSessionState()
+        patcher = patch("core.session_manager.st.session_state", state)
+        patcher.start()
+        patchers.append(patcher)
+        initialize_session_state()
+        return state
+
+    yield start
+    for patcher in reversed(patchers):
+        patcher.stop()
+
+
+def index_file(state, filename, file_hash, term, vector):
+    """Indexes a one-chunk file the way rag_deep.py does."""
+    chunk = LangchainDocument(page_content=f"{term} text")
+    make_corpus_private()
+    chunk_ids = state.DOCUMENT_VECTOR_DB.add_embeddings([chunk], [vector])
+    add_indexed_file(filename, file_hash, [f"raw-{filename}"], [chunk], chunk_ids, [{term: 1}])
+
+
+def make_session_with_files(new_session):
+    state = new_session()
+    index_file(state, "a.txt", "hash-a", "apple", [1.0, 0.0])
+    index_file(state, "b.txt", "hash-b", "banana", [0.0, 1.0])
+    refresh_document_views()
+    return state
+
+
+def test_refresh_document_views_combines_files(new_session, registry):
+    state = make_session_with_files(new_session)
+
+    assert state.uploaded_filenames == ["a.txt", "b.txt"]
+    assert state.raw_documents == ["raw-a.txt", "raw-b.txt"]
+    assert [chunk.page_content for chunk in state.bm25_corpus_chunks] == ["apple text", "banana text"]
+    assert state.bm25_index.corpus_size == 2
+    assert state.document_processed is True
+    assert state.document_summary is None
+    assert state.corpus_version == corpus_version(["hash-a", "hash-b"])
+    assert registry.stats() == {"corpora": 1, "handles": 1, "chunks": 2}
+
+
+def test_remove_indexed_files_deletes_only_their_chunks(new_session, registry):
+    state = make_session_with_files(new_session)
+    corpus = state.corpus
+
+    remove_indexed_files(["a.txt", "unknown.txt"])
+    refresh_document_views()
+
+    assert state.corpus is corpus  # Nobody else used it, so it was changed in place
+    assert state.uploaded_filenames == ["b.txt"]
+    assert state.bm25_index.corpus_size == 1
+    assert state.bm25_index.get_scores(["apple"]).tolist() == [0.0]
+    assert len(state.DOCUMENT_VECTOR_DB) == 1
+    assert state.corpus_version == corpus_version(["hash-b"])
+    assert registry.stats()["corpora"] == 1
+
+
+def test_refresh_document_views_with_no_files(new_session, registry):
+    state = new_session()
+    state.messages = [{"role": "user", "content": "Kept"}]
+
+    refresh_document_views()
+
+    assert state.uploaded_filenames == []
+    assert state.bm25_index is None
+    assert state.document_processed is False
+    assert state.corpus_version is None
+    assert state.messages == [{"role": "user", "content": "Kept"}]
+    assert len(registry) == 0
+
+
+def test_session_with_same_files_shares_the_corpus(new_session, registry):
+    first = make_session_with_files(new_session)
+    second = new_session()
+
+    # Other names, same content
+    assert use_shared_corpus({"policy.txt": "hash-b", "faq.txt": "hash-a"}) is True
+    refresh_document_views()
+
+    assert second.corpus is first.corpus
+    assert second.DOCUMENT_VECTOR_DB is first.DOCUMENT_VECTOR_DB
+    assert second.uploaded_filenames == ["policy.txt", "faq.txt"]
+    assert second.indexed_files["faq.txt"]["chunks"][0].page_content == "apple text"
+    assert registry.stats() == {"corpora": 1, "handles": 2, "chunks": 2}
+    assert use_shared_corpus({"other.txt": "hash-c"}) is False
+
+
+def test_changing_a_shared_corpus_copies_it_without_reembedding(new_session, registry):
+    first = make_session_with_files(new_session)
+    second = new_session()
+    use_shared_corpus({"a.txt": "hash-a", "b.txt": "hash-b"})
+    refresh_document_views()
+
+    remove_indexed_files(["a.txt"])
+    index_file(second, "c.txt", "hash-c", "cherry", [1.0, 1.0])
+    refresh_document_views()
+
+    assert second.corpus is not first.corpus
+    assert len(first.DOCUMENT_VECTOR_DB) == 2 and first.bm25_index.corpus_size == 2
+    assert len(second.DOCUMENT_VECTOR_DB) == 2
+    assert [chunk.page_content for chunk in second.bm25_corpus_chunks if chunk] == [
+        "banana text",
+        "cherry text",
+    ]
+    second.DOCUMENT_VECTOR_DB.embedding.embed_documents.assert_not_called()
+    assert registry.stats() == {"corpora": 2, "handles": 2, "chunks": 4}
+
+
+def test_reset_releases_corpus_and_invalidates_its_answers(new_session, registry):
+    state = make_session_with_files(new_session)
+    version = state.corpus_version
+
+    reset_document_states()
+
+    assert len(registry) == 0
+    registry.answer_cache.invalidate.assert_called_once_with(version)
+    assert state.corpus_handle is None
+    assert len(state.DOCUMENT_VECTOR_DB) == 0
+
+
+def test_same_content_under_another_name_is_linked_not_reindexed(new_session, registry):
+    state = make_session_with_files(new_session)
+
+    assert link_indexed_file("copy-of-a.txt", "hash-a") is True
+    assert link_indexed_file("new.txt", "hash-new") is False
+    remove_indexed_files(["a.txt"])
+    refresh_document_views()
+
+    assert state.uploaded_filenames == ["b.txt", "copy-of-a.txt"]
+    assert len(state.DOCUMENT_VECTOR_DB) == 2  # Still loaded under the other name
+
+
+def test_evict_documents_unloads_and_reload_keeps_summary(new_session, registry):
+    state = make_session_with_files(new_session)
+    version = state.corpus_version
+    state.messages = [{"role": "user", "content": "Hi"}]
+    state.document_summary = "Summary"
+
+    evict_documents(state)
+
+    assert len(registry) == 0  # It was the only session using the corpus
+    registry.answer_cache.invalidate.assert_called_once_with(version)
+    assert state.indexed_files == {} and state.raw_documents == []
+    assert len(state.DOCUMENT_VECTOR_DB) == 0 and state.bm25_index is None
+    assert state.document_processed is False and state.corpus_handle is None
+    assert state.evicted_corpus_version == version
+    assert state.messages == [{"role": "user", "content": "Hi"}]
+    assert state.document_summary == "Summary"
+
+    # Reloaded the way rag_deep.py adds the files still in the uploader
+    index_file(state, "a.txt", "hash-a", "apple", [1.0, 0.0])
+    index_file(state, "b.txt", "hash-b", "banana", [0.0, 1.0])
+    refresh_document_views()
+
+    assert state.corpus_version == version
+    assert state.document_processed is True
+    assert state.document_summary == "Summary"  # Same documents, so still valid
+    assert state.evicted_corpus_version is None
+
+
+def test_evicted_session_reloads_a_corpus_still_shared_by_another(new_session, registry):
+    first = make_session_with_files(new_session)
+    second = new_session()
+    files = {"a.txt": "hash-a", "b.txt": "hash-b"}
+    assert use_shared_corpus(files) is True
+    refresh_document_views()
+    second.document_keywords = "apple, banana"
+
+    evict_documents(second)
+
+    assert registry.stats() == {"corpora": 1, "handles": 1, "chunks": 2}
+    registry.answer_cache.invalidate.assert_not_called()
+
+    assert use_shared_corpus(files) is True
+    refresh_document_views()
+
+    assert second.corpus is first.corpus
+    assert second.document_keywords == "apple, banana"
+    assert registry.stats() == {"corpora": 1, "handles": 2, "chunks": 2}
+
+
+def test_changed_documents_after_eviction_clear_summary(new_session, registry):
+    state = make_session_with_files(new_session)
+    state.document_summary = "Summary"
+    evict_documents(state)
+
+    index_file(state, "a.txt", "hash-a", "apple", [1.0, 0.0])
+    refresh_document_views()
+
+    assert state.document_summary is None
+    assert state.evicted_corpus_version is None
@@ -0,0 +1,136 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from langchain_core.documents import Document as LangchainDocument
+from langchain_core.runnables import RunnableLambda
+
+# Module to test
+from core import summarization
+from core.summarization import summarize_documents, group_texts
+
+SUMMARIZATION_LOGGER_PATH = "core.summarization.logger"
+STREAMLIT_ERROR_PATH = "core.summarization.st.error"
+STREAMLIT_WARNING_PATH = "core.summarization.st.warning"
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(SUMMARIZATION_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture(autouse=True)
+def empty_summary_cache():
+    summarization.file_summary_cache.clear()
+    yield
+    summarization.file_summary_cache.clear()
+
+
+class FakeLLM:
+    """Summarizes a prompt as the number of characters of its document text."""
+
+    def __init__(self, delay=0.0):
+        self.prompts = []
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt_value):
+        text = prompt_value.to_string()
+        with self._lock:
+            self.prompts.append(text)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        kind = "reduce" if "Partial summaries:" in text else "map"
+        return f"<think>scratch</think>{kind} summary {len(text)}"
+
+    @property
+    def runnable(self):
+        return RunnableLambda(self)
+
+
+def chunks_of(*texts):
+    return [LangchainDocument(page_content=text) for text in texts]
+
+
+def test_group_texts_respects_character_budget():
+    groups = group_texts(["a" * 40, "b" * 40, "c" * 40, "d" * 200], max_chars=100)
+
+    assert groups == [["a" * 40, "b" * 40], ["c" * 40], ["d" * 200]]
+
+
+def test_small_document_is_summarized_in_one_prompt():
+    llm = FakeLLM()
+
+    summary = summarize_documents(llm.runnable, [("h1", chunks_of("short text"))], max_chars=1000)
+
+    assert len(llm.prompts) == 1
+    assert summary.startswith("map summary")
+    assert "<think>" not in summary
+
+
+def test_large_document_is_mapped_then_reduced_with_bounded_concurrency():
+    llm = FakeLLM(delay=0.02)
+    chunks = chunks_of(*[f"chunk {i} " + "x" * 90 for i in range(20)])
+
+    summary = summarize_documents(
+        llm.runnable, [("h1", chunks)], max_chars=250, max_workers=3
+    )
+
+    map_prompts = [p for p in llm.prompts if "Partial summaries:" not in p]
+    reduce_prompts = [p for p in llm.prompts if "Partial summaries:" in p]
+    assert len(map_prompts) == 10  # Two ~100-character chunks per prompt
+    assert reduce_prompts
+    assert summary.startswith("reduce summary")
+    assert 1 < llm.max_active <= 3
+    # Each level's partial summaries are passed on without the model's reasoning
+    assert all("<think>" not in p for p in reduce_prompts)
+
+
+def test_file_summaries_are_cached_so_new_files_only_summarize_new_content():
+    llm = FakeLLM()
+    first = ("h1", chunks_of("first file"))
+    second = ("h2", chunks_of("second file"))
+
+    summarize_documents(llm.runnable, [first], max_chars=1000)
+    llm.prompts.clear()
+    summary = summarize_documents(llm.runnable, [first, second], max_chars=1000)
+
+    map_prompts = [p for p in llm.prompts if "Partial summaries:" not in p]
+    assert len(map_prompts) == 1 and "second file" in map_prompts[0]
+    assert len(llm.prompts) == 2  # The new file's map plus merging the two file summaries
+    assert summary.startswith("reduce summary")
+
+
+def test_llm_error_returns_failure_message(mock_logger_fixture):
+    def failing_llm(prompt_value):
+        raise ConnectionError("ollama down")
+
+    with patch(STREAMLIT_ERROR_PATH) as mock_st_error:
+        summary = summarize_documents(
+            RunnableLambda(failing_llm), [("h1", chunks_of("text"))]
+        )
+
+    assert summary.startswith("Failed to generate summary due to an AI model error.")
+    assert "ollama down" in summary
+    mock_st_error.assert_called_once()
+    mock_logger_fixture.exception.assert_called_once()
+    assert len(summarization.file_summary_cache) == 0
+
+
+def test_no_text_returns_none():
+    llm = FakeLLM()
+
+    with patch(STREAMLIT_WARNING_PATH) as mock_st_warning:
+        summary = summarize_documents(llm.runnable, [("h1", chunks_of("   ")), ("h2", [])])
+
+    assert summary is None
+    assert llm.prompts == []
+    mock_st_warning.assert_called_once()
@@ -0,0 +1,261 @@
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock
+
+from langchain_core.documents import Document as LangchainDocument
+
+# Module to test
+from core.vector_store import NumpyVectorStore
+
+VECTOR_STORE_LOGGER_PATH = "core.vector_store.logger"
+
+# Tiny fixed vocabulary so embeddings are predictable in tests
+EMBEDDING_TABLE = {
+    "apple": [1.0, 0.0, 0.0],
+    "banana": [0.0, 2.0, 0.0],  # Not unit length on purpose
+    "cherry": [0.0, 0.0, 1.0],
+    "apple banana": [1.0, 1.0, 0.0],
+}
+
+
+@pytest.fixture(autouse=True)
+def mock_logger_fixture():
+    """Automatically mock the logger for all tests in this file."""
+    with patch(VECTOR_STORE_LOGGER_PATH) as mock_log:
+        yield mock_log
+
+
+@pytest.fixture
+def mock_embedding_model():
+    model = MagicMock(name="MockEmbeddingModel")
+    model.embed_documents.side_effect = lambda texts: [EMBEDDING_TABLE[t] for t in texts]
+    model.embed_query.side_effect = lambda text: EMBEDDING_TABLE[text]
+    return model
+
+
+@pytest.fixture
+def populated_store(mock_embedding_model):
+    store = NumpyVectorStore(mock_embedding_model)
+    store.add_documents(
+        [
+            LangchainDocument(page_content="apple", metadata={"source": "a.txt"}),
+            LangchainDocument(page_content="banana", metadata={"source": "b.txt"}),
+            LangchainDocument(page_content="cherry", metadata={"source": "c.txt"}),
+        ]
+    )
+    return store
+
+
+def test_add_documents_embeds_and_returns_ids(mock_embedding_model):
+    store = NumpyVectorStore(mock_embedding_model)
+    docs = [LangchainDocument(page_content="apple"), LangchainDocument(page_content="cherry")]
+
+    ids = store.add_documents(docs)
+
+    mock_embedding_model.embed_documents.assert_called_once_with(["apple", "cherry"])
+    assert len(ids) == 2 and len(set(ids)) == 2
+    assert len(store) == 2
+    assert store.dimension == 3
+
+
+def test_add_documents_empty_list_is_noop(mock_embedding_model):
+    store = NumpyVectorStore(mock_embedding_model)
+    assert store.add_documents([]) == []
+    mock_embedding_model.embed_documents.assert_not_called()
+    assert len(store) == 0
+
+
+def test_vectors_are_normalized_and_contiguous(populated_store):
+    matrix = populated_store._matrix[: len(populated_store)]
+    assert matrix.dtype == np.float32
+    assert matrix.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-6)
+
+
+def test_similarity_search_returns_best_match_first(populated_store):
+    results = populated_store.similarity_search("banana", k=2)
+    assert [doc.page_content for doc in results][0] == "banana"
+    assert results[0].metadata == {"source": "b.txt"}
+
+
+def test_similarity_search_with_score_orders_by_cosine(populated_store):
+    results = populated_store.similarity_search_with_score("apple banana", k=3)
+    contents = [doc.page_content for doc, _ in results]
+    scores = [score for _, score in results]
+
+    assert set(contents[:2]) == {"apple", "banana"}
+    assert contents[2] == "cherry"
+    assert scores[0] == pytest.approx(1 / np.sqrt(2), rel=1e-5)
+    assert scores[2] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_similarity_search_k_larger_than_store(populated_store):
+    results = populated_store.similarity_search("cherry", k=10)
+    assert len(results) == 3
+    assert results[0].page_content == "cherry"
+
+
+def test_similarity_search_on_empty_store(mock_embedding_model):
+    store = NumpyVectorStore(mock_embedding_model)
+    assert store.similarity_search("apple", k=5) == []
+    mock_embedding_model.embed_query.assert_not_called()
+
+
+def test_add_embeddings_grows_capacity(mock_embedding_model):
+    store = NumpyVectorStore(mock_embedding_model)
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        vectors = rng.normal(size=(10, 4))
+        docs = [LangchainDocument(page_content=f"doc {i}") for i in range(10)]
+        store.add_embeddings(docs, vectors)
+
+    assert len(store) == 50
+    assert store._matrix.shape[0] >= 50
+    target = store._matrix[42].copy()
+    assert store.similarity_search_by_vector(target, k=1)[0].page_content == "doc 2"
+
+
+def test_add_embeddings_dimension_mismatch_raises(populated_store):
+    with pytest.raises(ValueError):
+        populated_store.add_embeddings(
+            [LangchainDocument(page_content="bad")], [[1.0, 0.0]]
+        )
+
+
+def test_add_embeddings_length_mismatch_raises(mock_embedding_model):
+    store = NumpyVectorStore(mock_embedding_model)
+    with pytest.raises(ValueError):
+        store.add_embeddings([LangchainDocument(page_content="x")], [[1.0], [2.0]])
+
+
+def test_get_vectors_returns_normalized_rows_in_id_order(mock_embedding_model):
+    store = NumpyVectorStore(mock_embedding_model)
+    ids = store.add_documents(
+        [LangchainDocument(page_content="banana"), LangchainDocument(page_content="apple")]
+    )
+
+    vectors = store.get_vectors([ids[1], ids[0]])
+
+    np.testing.assert_allclose(vectors, [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+
+
+def test_delete_hides_documents_from_search(populated_store):
+    apple_id = populated_store._ids[0]
+
+    assert populated_store.delete([apple_id]) is True
+
+    assert len(populated_store) == 2
+    results = populated_store.similarity_search("apple", k=3)
+    assert [doc.page_content for doc in results] == ["banana", "cherry"]
+
+
+def test_delete_unknown_ids_returns_false(populated_store):
+    assert populated_store.delete(["missing"]) is False
+    assert populated_store.delete([]) is False
+    assert len(populated_store) == 3
+
+
+def test_delete_tombstones_until_compaction_ratio(mock_embedding_model):
+    store = NumpyVectorStore(mock_embedding_model, compaction_ratio=0.5)
+    ids = store.add_embeddings(
+        [LangchainDocument(page_content=str(i)) for i in range(4)], [[1.0, float(i)] for i in range(4)]
+    )
+
+    store.delete(ids[:2])  # 2 of 4 rows: at the ratio, not over it
+    assert store._size == 4 and len(store) == 2
+
+    store.delete(ids[2:3])  # Over the ratio: compacted
+    assert store._size == 1 and len(store) == 1
+    assert store._ids == [ids[3]]
+    np.testing.assert_allclose(store.get_vectors([ids[3]]), NumpyVectorStore._normalize([[1.0, 3.0]]))
+
+
+def test_add_after_compaction_keeps_ids_consistent(populated_store):
+    banana_id, cherry_id = populated_store._ids[1], populated_store._ids[2]
+    populated_store.delete([populated_store._ids[0]])
+    populated_store.compact()
+
+    new_id = populated_store.add_documents([LangchainDocument(page_content="apple")])[0]
+
+    assert populated_store._ids == [banana_id, cherry_id, new_id]
+    assert populated_store.similarity_search("apple", k=1)[0].page_content == "apple"
+
+
+def test_add_existing_id_replaces_previous_row(populated_store):
+    apple_id = populated_store._ids[0]
+
+    populated_store.add_embeddings([LangchainDocument(page_content="cherry too")], [[0.0, 0.0, 1.0]], ids=[apple_id])
+
+    assert len(populated_store) == 3
+    results = populated_store.similarity_search("apple", k=3)
+    assert "apple" not in [doc.page_content for doc in results]
+    np.testing.assert_allclose(populated_store.get_vectors([apple_id]), [[0.0, 0.0, 1.0]])
+
+    assert populated_store.delete([apple_id]) is True
+    assert len(populated_store) == 2
+    assert [doc.page_content for doc in populated_store.similarity_search("apple", k=3)] == ["banana", "cherry"]
+
+
+def shared_matrix(vectors):
+    """Read-only unit-length rows, like the mapped embeddings of an index segment."""
+    matrix = NumpyVectorStore._normalize(vectors)
+    matrix.flags.writeable = False
+    return matrix
+
+
+def test_read_only_normalized_embeddings_are_shared_not_copied(mock_embedding_model):
+    segment = shared_matrix([[0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+    first, second = NumpyVectorStore(mock_embedding_model), NumpyVectorStore(mock_embedding_model)
+    first.add_documents([LangchainDocument(page_content="apple")])
+
+    for store in (first, second):
+        store.add_embeddings(
+            [LangchainDocument(page_content="banana"), LangchainDocument(page_content="cherry")], segment
+        )
+
+    assert first._blocks[-1][0] is segment and second._blocks[-1][0] is segment
+    assert first.memory_bytes() == first._blocks[0][0].nbytes + first._deleted.nbytes  # The block isn't counted
+    first.add_documents([LangchainDocument(page_content="apple banana")])
+    results = first.similarity_search_with_score("cherry", k=4)
+    assert [doc.page_content for doc, _ in results][:1] == ["cherry"] and len(results) == 4
+    assert first.get_vectors(first._ids[1:3]).base is not None  # A view of the block
+    np.testing.assert_allclose(
+        first.get_vectors([first._ids[3], first._ids[0]]),
+        [[1 / np.sqrt(2), 1 / np.sqrt(2), 0.0], [1.0, 0.0, 0.0]],
+        rtol=1e-6,
+    )
+
+
+def test_writable_or_unnormalized_embeddings_are_copied(mock_embedding_model):
+    store = NumpyVectorStore(mock_embedding_model)
+    writable = NumpyVectorStore._normalize([[1.0, 0.0]])
+    unnormalized = np.array([[2.0, 0.0]], dtype=np.float32)
+    unnormalized.flags.writeable = False
+
+    store.add_embeddings([LangchainDocument(page_content="a")], writable)
+    store.add_embeddings([LangchainDocument(page_content="b")], unnormalized)
+
+    assert store._blocks == [] and store._size == 2
+
+
+def test_compaction_keeps_live_shared_blocks_and_packs_the_rest(mock_embedding_model):
+    store = NumpyVectorStore(mock_embedding_model, compaction_ratio=0.0)
+    kept = shared_matrix([[1.0, 0.0], [0.0, 1.0]])
+    partial = shared_matrix([[1.0, 1.0], [1.0, -1.0]])
+    own_ids = store.add_embeddings([LangchainDocument(page_content="own")], [[3.0, 4.0]])
+    kept_ids = store.add_embeddings([LangchainDocument(page_content=t) for t in ("x", "y")], kept)
+    partial_ids = store.add_embeddings([LangchainDocument(page_content=t) for t in ("p", "q")], partial)
+
+    store.delete(own_ids + partial_ids[:1])
+
+    assert store._deleted_count == 0 and len(store) == 3
+    assert [block for block, _ in store._blocks] == [kept]
+    assert store._ids == kept_ids + partial_ids[1:]
+    np.testing.assert_allclose(store.get_vectors(partial_ids[1:]), partial[1:])
+    assert store.similarity_search_by_vector([0.0, 1.0], k=1)[0].page_content == "y"
+
+
+def test_memory_bytes_counts_matrix_capacity(mock_embedding_model, populated_store):
+    assert NumpyVectorStore(mock_embedding_model).memory_bytes() == 0
+    capacity = populated_store._matrix.shape[0]  # Allocated rows, not just the used ones
+    assert populated_store.memory_bytes() == capacity * 3 * 4 + capacity
@@ -11,8 +11,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from rag_deep import (
     find_related_documents,
     combine_results_rrf,
-    rerank_documents,
-    generate_answer,
+    cascade_rerank_documents,
+    stream_answer,
     LANGUAGE_MODEL, # Global in rag_deep.py
     RERANKER_MODEL  # Global in rag_deep.py
 )
@@ -56,26 +56,25 @@ def mock_streamlit_ui(mocker):
 
 
 @patch('rag_deep.index_documents')
-@patch('rag_deep.chunk_documents', return_value=[LangchainDocument(page_content="chunk")])
-@patch('rag_deep.load_document', return_value=[LangchainDocument(page_content="doc")])
-@patch('rag_deep.save_uploaded_file', return_value="dummy_path.pdf")
+@patch('rag_deep.ingest_files', return_value=[MagicMock(error=None, chunks=[LangchainDocument(page_content="chunk")])])
+@patch('rag_deep.save_uploaded_file', return_value=("dummy_path.pdf", "dummy-hash"))
 @patch('rag_deep.reset_document_states')
 def test_rag_deep_file_processing_flow_bm25_creation(
-    mock_reset_document_states, mock_save_uploaded_file, mock_load_document,
-    mock_chunk_documents, mock_index_documents,
+    mock_reset_document_states, mock_save_uploaded_file, mock_ingest_files,
+    mock_index_documents,
     mock_streamlit_ui
 ):
     mock_uploaded_file = MagicMock(); mock_uploaded_file.name = "test.pdf"
     mock_streamlit_ui['uploaded_file_key'] = 0
 
     # This test simulates the BM25 creation block *within* rag_deep.py
-    # It assumes previous steps (saving, loading, chunking, vector indexing) are mocked
+    # It assumes previous steps (saving, ingestion, vector indexing) are mocked
     # and now we test the BM25 specific logic that uses st.session_state and processed_chunks
 
     mock_streamlit_ui["document_processed"] = True
     mock_streamlit_ui["uploaded_filenames"] = ["test.pdf"]
     # This is the 'processed_chunks' variable as it would be in rag_deep.py's scope
-    processed_chunks_in_rag_deep_scope = mock_chunk_documents.return_value
+    processed_chunks_in_rag_deep_scope = mock_ingest_files.return_value[0].chunks
 
     # --- Logic block from rag_deep.py related to BM25 ---
     if mock_streamlit_ui["document_processed"]: # This will be true
@@ -94,9 +93,9 @@ def test_rag_deep_file_processing_flow_bm25_creation(
 
 
 # Patch targets should be where rag_deep.py looks them up.
-# If rag_deep.py has "from core.generation import generate_answer", then patch "rag_deep.generate_answer"
-@patch('rag_deep.generate_answer')
-@patch('rag_deep.rerank_documents')
+# If rag_deep.py has "from core.generation import stream_answer", then patch "rag_deep.stream_answer"
+@patch('rag_deep.stream_answer')
+@patch('rag_deep.cascade_rerank_documents')
 @patch('rag_deep.combine_results_rrf')
 @patch('rag_deep.find_related_documents')
 @patch('rag_deep.RERANKER_MODEL', new_callable=MagicMock) # Patch the global RERANKER_MODEL in rag_deep.py
@@ -106,8 +105,8 @@ def test_rag_deep_chat_logic_reranking_successful(
     mock_reranker_model, # From @patch('rag_deep.RERANKER_MODEL')
     mock_find_related_documents,
     mock_combine_results_rrf,
-    mock_rerank_documents,
-    mock_generate_answer,
+    mock_cascade_rerank_documents,
+    mock_stream_answer,
     mock_streamlit_ui
 ):
     mock_streamlit_ui["document_processed"] = True
@@ -120,8 +119,8 @@ def test_rag_deep_chat_logic_reranking_successful(
     assert mock_reranker_model is not None # Check the patched global RERANKER_MODEL
 
     reranked_final_docs = [LangchainDocument(f"reranked_doc_{i}") for i in range(core_config.FINAL_TOP_N_FOR_CONTEXT)]
-    mock_rerank_documents.return_value = reranked_final_docs
-    mock_generate_answer.return_value = "Final AI Answer from Orchestration"
+    mock_cascade_rerank_documents.return_value = reranked_final_docs
+    mock_stream_answer.return_value = iter(["Final AI Answer ", "from Orchestration"])
 
     user_input_sim = "test user query"
     mock_streamlit_ui["messages"].append({"role": "user", "content": user_input_sim})
@@ -142,8 +141,8 @@ def test_rag_deep_chat_logic_reranking_successful(
         docs_for_reranking = combined_hybrid_docs_val[:core_config.TOP_K_FOR_RERANKER]
         # RERANKER_MODEL here refers to the global variable in rag_deep.py, which is patched.
         if RERANKER_MODEL:
-             final_context_docs_for_llm = rerank_documents( # Calls mock_rerank_documents
-                 user_input_sim, docs_for_reranking, RERANKER_MODEL,
+             final_context_docs_for_llm = cascade_rerank_documents( # Calls mock_cascade_rerank_documents
+                 user_input_sim, docs_for_reranking, retrieved_results_dict_val, RERANKER_MODEL,
                  top_n=core_config.FINAL_TOP_N_FOR_CONTEXT
              )
         else:
@@ -153,23 +152,23 @@ def test_rag_deep_chat_logic_reranking_successful(
         ai_response = "No relevant sections found."
     else:
         # LANGUAGE_MODEL here refers to the global variable in rag_deep.py, which is patched.
-        ai_response = generate_answer( # Calls mock_generate_answer
+        ai_response = "".join(stream_answer( # Calls mock_stream_answer
             LANGUAGE_MODEL,
             user_query=user_input_sim,
             context_documents=final_context_docs_for_llm,
             conversation_history=""
-        )
+        ))
     mock_streamlit_ui["messages"].append({"role": "assistant", "content": ai_response})
     # --- End of simulated block ---
 
     mock_find_related_documents.assert_called_once_with(user_input_sim, ANY, ANY, ANY, True)
     mock_combine_results_rrf.assert_called_once_with(mock_find_related_documents.return_value)
-    mock_rerank_documents.assert_called_once_with(
-        user_input_sim, hybrid_docs[:core_config.TOP_K_FOR_RERANKER],
+    mock_cascade_rerank_documents.assert_called_once_with(
+        user_input_sim, hybrid_docs[:core_config.TOP_K_FOR_RERANKER], mock_find_related_documents.return_value,
         mock_reranker_model, # Assert it was called with the (mocked) RERANKER_MODEL global
         top_n=core_config.FINAL_TOP_N_FOR_CONTEXT
     )
-    mock_generate_answer.assert_called_once_with(
+    mock_stream_answer.assert_called_once_with(
         mock_language_model, # Assert it was called with the (mocked) LANGUAGE_MODEL global
         user_query=user_input_sim,
         context_documents=reranked_final_docs, conversation_history=""
@@ -177,8 +176,8 @@ def test_rag_deep_chat_logic_reranking_successful(
     assert mock_streamlit_ui["messages"][-1]["content"] == "Final AI Answer from Orchestration"
 
 
-@patch('rag_deep.generate_answer')
-@patch('rag_deep.rerank_documents')
+@patch('rag_deep.stream_answer')
+@patch('rag_deep.cascade_rerank_documents')
 @patch('rag_deep.combine_results_rrf')
 @patch('rag_deep.find_related_documents')
 @patch('rag_deep.RERANKER_MODEL', None) # Patch the global RERANKER_MODEL in rag_deep.py to be None
@@ -190,8 +189,8 @@ def test_rag_deep_chat_logic_reranker_model_none(
     mock_reranker_model_is_none, # From @patch('rag_deep.RERANKER_MODEL', None) - value is None
     mock_find_related_documents,
     mock_combine_results_rrf,
-    mock_rerank_documents,
-    mock_generate_answer,
+    mock_cascade_rerank_documents,
+    mock_stream_answer,
     mock_streamlit_ui
 ):
     mock_streamlit_ui["document_processed"] = True
@@ -200,7 +199,7 @@ def test_rag_deep_chat_logic_reranker_model_none(
     mock_find_related_documents.return_value = {"semantic_results": [LangchainDocument("sem1")], "bm25_results": [LangchainDocument("bm25_1")]}
     hybrid_docs = [LangchainDocument(f"hybrid_doc_{i}") for i in range(core_config.TOP_K_FOR_RERANKER)]
     mock_combine_results_rrf.return_value = hybrid_docs
-    mock_generate_answer.return_value = "Fallback AI Answer"
+    mock_stream_answer.return_value = iter(["Fallback ", "AI Answer"])
 
     user_input_sim = "test user query"
     mock_streamlit_ui["messages"].append({"role": "user", "content": user_input_sim})
@@ -217,8 +216,8 @@ def test_rag_deep_chat_logic_reranker_model_none(
         docs_for_reranking = combined_hybrid_docs_val[:core_config.TOP_K_FOR_RERANKER]
         # RERANKER_MODEL here is the global in rag_deep.py, patched to None for this test
         if RERANKER_MODEL:
-             final_context_docs_for_llm = rerank_documents(
-                 user_input_sim, docs_for_reranking, RERANKER_MODEL,
+             final_context_docs_for_llm = cascade_rerank_documents(
+                 user_input_sim, docs_for_reranking, retrieved_results_dict_val, RERANKER_MODEL,
                  top_n=core_config.FINAL_TOP_N_FOR_CONTEXT
              )
         else:
@@ -229,25 +228,25 @@ def test_rag_deep_chat_logic_reranker_model_none(
     if not final_context_docs_for_llm:
         ai_response = "No relevant sections found."
     else:
-        ai_response = generate_answer( # Calls mock_generate_answer
+        ai_response = "".join(stream_answer( # Calls mock_stream_answer
             LANGUAGE_MODEL, # This is the global LANGUAGE_MODEL from rag_deep.py
             user_query=user_input_sim,
             context_documents=final_context_docs_for_llm,
             conversation_history=""
-        )
+        ))
     mock_streamlit_ui["messages"].append({"role": "assistant", "content": ai_response})
     # --- End of simulated block ---
 
     mock_find_related_documents.assert_called_once()
     mock_combine_results_rrf.assert_called_once()
-    mock_rerank_documents.assert_not_called()
+    mock_cascade_rerank_documents.assert_not_called()
 
     mock_st_info.assert_called_once_with(
         "Re-ranker model not loaded. Using documents from hybrid search directly (top results)."
     )
 
     expected_context_docs = hybrid_docs[:core_config.FINAL_TOP_N_FOR_CONTEXT]
-    mock_generate_answer.assert_called_once_with(
+    mock_stream_answer.assert_called_once_with(
         mock_language_model, # Assert it was called with the (mocked) LANGUAGE_MODEL global
         user_query=user_input_sim,
         context_documents=expected_context_docs, conversation_history=""